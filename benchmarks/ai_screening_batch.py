@@ -0,0 +1,162 @@
+"""
+AI 初筛批量请求基准测试
+
+在本地启动一个模拟 OpenAI 兼容接口的服务（/v1/chat/completions，每次请求带有固定延迟，
+另按 prompt 长度增加少量延迟，返回的 usage 按 prompt 字符数估算 token），对比两种初筛方式：
+  1. per-item: 每个商品一次 screen_listing 请求（按 --concurrency 并发）
+  2. batched:  screen_listings_batch，每 --batch-size 个商品合并为一次请求
+
+输出每秒完成的商品数、请求数以及每个商品平均消耗的 prompt token。
+
+用法:
+  python benchmarks/ai_screening_batch.py --items 40 --batch-size 10 --latency 0.4
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openai import AsyncOpenAI
+
+from src.ai_payload import estimate_tokens
+from src.ai_screening import screen_listing, screen_listings_batch
+
+
+class FakeOpenAIServer:
+    """模拟 OpenAI 兼容接口：批量请求逐个返回 verdict，标题含“批发”的商品被淘汰。"""
+
+    def __init__(self, latency: float):
+        self.calls = 0
+        self.prompt_tokens = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = "".join(message["content"] for message in body["messages"])
+                prompt_tokens = estimate_tokens(prompt)
+                with lock:
+                    server.calls += 1
+                    server.prompt_tokens += prompt_tokens
+                time.sleep(latency + prompt_tokens / 20000)
+
+                user = body["messages"][-1]["content"]
+                ids = re.findall(r'\{"id":"([^"]+)"', user)
+                if ids:
+                    items = user.split('{"id":')[1:]
+                    content = {"verdicts": [
+                        {"id": item_id, "reject": "批发" in item, "category": "dealer" if "批发" in item else "none",
+                         "reason": ""}
+                        for item_id, item in zip(ids, items)
+                    ]}
+                else:
+                    content = {"reject": "批发" in user, "category": "dealer" if "批发" in user else "none", "reason": ""}
+                response = json.dumps({
+                    "id": "bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20,
+                              "total_tokens": prompt_tokens + 20},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset(self):
+        self.calls, self.prompt_tokens = 0, 0
+
+
+def _records(count: int) -> dict:
+    return {
+        str(1000 + i): {"商品信息": {
+            "商品ID": str(1000 + i),
+            "商品标题": f"MacBook Air M1 8+256 {'批发 量大从优' if i % 3 == 0 else '个人自用 九成新'} #{i}",
+            "当前售价": str(2500 + i * 10),
+            "商品标签": ["包邮"],
+            "发货地区": "上海",
+            "卖家昵称": f"seller{i}",
+        }}
+        for i in range(count)
+    }
+
+
+async def _per_item(records, criteria, client, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(record):
+        async with semaphore:
+            return await screen_listing(record, criteria, client, "bench-model")
+
+    return await asyncio.gather(*(one(record) for record in records.values()))
+
+
+async def _batched(records, criteria, client, batch_size):
+    return list((await screen_listings_batch(records, criteria, batch_size, client, "bench-model")).values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐个商品初筛与批量初筛的吞吐量和 token 消耗")
+    parser.add_argument("--items", type=int, default=40, help="商品数")
+    parser.add_argument("--batch-size", type=int, default=10, help="批量模式下每次请求的商品数")
+    parser.add_argument("--concurrency", type=int, default=2, help="逐个模式下的并发请求数（对应 AI_CONCURRENCY）")
+    parser.add_argument("--latency", type=float, default=0.4, help="模拟接口每次请求的固定延迟（秒）")
+    args = parser.parse_args()
+
+    records = _records(args.items)
+    criteria = "搜索关键字: macbook air m1\n价格范围: 2000 - 3500\n只要个人闲置，不要商家"
+    with FakeOpenAIServer(args.latency) as server:
+        for name, run in (
+            ("per-item", lambda client: _per_item(records, criteria, client, args.concurrency)),
+            ("batched", lambda client: _batched(records, criteria, client, args.batch_size)),
+        ):
+            server.reset()
+
+            async def timed():
+                client = AsyncOpenAI(api_key="bench", base_url=server.base_url)
+                try:
+                    started = time.perf_counter()
+                    verdicts = await run(client)
+                    return verdicts, time.perf_counter() - started
+                finally:
+                    await client.close()
+
+            verdicts, elapsed = asyncio.run(timed())
+            rejected = sum(1 for verdict in verdicts if verdict and verdict["reject"])
+            print(
+                f"{name:<9} items={args.items} calls={server.calls} elapsed={elapsed:.2f}s "
+                f"items/s={args.items / elapsed:.1f} calls/s={server.calls / elapsed:.2f} "
+                f"prompt_tokens/item={server.prompt_tokens / args.items:.0f} rejected={rejected}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+浏览器启动耗时基准测试
+
+对比两种方式获取一个可用 BrowserContext 的耗时：
+  1. cold:   每次运行都 chromium.launch() 冷启动（当前默认行为）
+  2. shared: 连接常驻 Chromium（CDP）后只创建 BrowserContext（共享浏览器池）
+
+用法:
+  python benchmarks/browser_startup.py --runs 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from playwright.async_api import async_playwright
+
+from src.browser import CONTEXT_OPTIONS, STEALTH_INIT_SCRIPT, build_launch_kwargs, open_browser
+
+
+async def _cold_run(p) -> float:
+    started = time.perf_counter()
+    browser = await p.chromium.launch(**build_launch_kwargs())
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await context.add_init_script(STEALTH_INIT_SCRIPT)
+    page = await context.new_page()
+    await page.goto("about:blank")
+    elapsed = time.perf_counter() - started
+    await browser.close()
+    return elapsed
+
+
+async def _shared_run(p, endpoint: str) -> float:
+    started = time.perf_counter()
+    browser, _ = await open_browser(p, cdp_endpoint=endpoint)
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await context.add_init_script(STEALTH_INIT_SCRIPT)
+    page = await context.new_page()
+    await page.goto("about:blank")
+    elapsed = time.perf_counter() - started
+    await context.close()
+    await browser.close()
+    return elapsed
+
+
+def _summary(name: str, samples: list) -> float:
+    mean = statistics.mean(samples)
+    print(f"{name:<7} runs={len(samples)} mean={mean:.3f}s min={min(samples):.3f}s max={max(samples):.3f}s")
+    return mean
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比冷启动与共享浏览器池获取 BrowserContext 的耗时")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=9333, help="基准测试中常驻浏览器使用的调试端口")
+    args = parser.parse_args()
+
+    async with async_playwright() as p:
+        cold = [await _cold_run(p) for _ in range(args.runs)]
+
+        resident = await p.chromium.launch(**build_launch_kwargs(extra_args=[f"--remote-debugging-port={args.port}"]))
+        try:
+            endpoint = f"http://127.0.0.1:{args.port}"
+            shared = [await _shared_run(p, endpoint) for _ in range(args.runs)]
+        finally:
+            await resident.close()
+
+    cold_mean = _summary("cold", cold)
+    shared_mean = _summary("shared", shared)
+    print(f"每次运行节省约 {cold_mean - shared_mean:.3f}s ({(1 - shared_mean / cold_mean) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
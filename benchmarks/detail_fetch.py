@@ -0,0 +1,171 @@
+"""
+商品详情获取方式基准测试
+
+在本地启动一个模拟闲鱼商品详情页的 HTTP 服务（页面带有大量 DOM、样式脚本和图片，
+页面脚本请求详情 API，API 带有人为延迟），对比三种获取详情 JSON 的方式：
+  1. page:    每个商品新开页面、完整加载后关闭（默认行为）
+  2. reuse:   复用一个常驻页面，在原页面内跳转到下一个商品
+  3. request: 通过 context.request 直接请求详情 API，不打开页面
+
+输出每个商品的平均耗时、完成的请求数与下载量，以及页面的 JS 堆和 DOM 节点数（通过 CDP 采样）。
+
+用法:
+  python benchmarks/detail_fetch.py --items 20 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from playwright.async_api import async_playwright
+
+from src.browser import build_launch_kwargs
+from src.mtop_client import DETAIL_API, call_mtop_in_context
+from src.network_filter import ResourceBlockProfile, install_resource_blocking
+
+ITEM_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>item</title>
+<style>.card{margin:4px;padding:8px;border:1px solid #ccc;box-shadow:0 0 4px #999}</style></head>
+<body>
+<div id="root"></div>
+<script>
+const root = document.getElementById("root");
+for (let i = 0; i < 3000; i++) {
+  const div = document.createElement("div");
+  div.className = "card";
+  div.textContent = "recommend item " + i;
+  root.appendChild(div);
+}
+window.__cache = new Array(200000).fill(0).map((_, i) => ({i, s: "x" + i}));
+for (let i = 0; i < 6; i++) {
+  const img = document.createElement("img");
+  img.src = "/img/" + ITEM_ID + "-" + i + ".jpg";
+  root.appendChild(img);
+}
+fetch("/h5/mtop.taobao.idle.pc.detail/1.0/?itemId=" + ITEM_ID, {method: "POST"});
+</script>
+</body></html>
+"""
+
+
+def _make_handler(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, body: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith("/item"):
+                item_id = parse_qs(url.query).get("id", ["0"])[0]
+                html = ITEM_HTML.replace("ITEM_ID", json.dumps(item_id), 2)
+                self._send(html.encode("utf-8"), "text/html; charset=utf-8")
+            elif url.path.startswith("/img/"):
+                self._send(os.urandom(64 * 1024), "image/jpeg")
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            if length:
+                self.rfile.read(length)
+            if DETAIL_API not in self.path:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            payload = {"ret": ["SUCCESS::调用成功"], "data": {"itemDO": {"wantCnt": 1}, "sellerDO": {"sellerId": 1}}}
+            self._send(json.dumps(payload).encode("utf-8"), "application/json")
+
+    return Handler
+
+
+def _is_detail(response) -> bool:
+    return DETAIL_API in response.url
+
+
+async def _page_metrics(context, page) -> dict:
+    session = await context.new_cdp_session(page)
+    try:
+        await session.send("Performance.enable")
+        metrics = {m["name"]: m["value"] for m in (await session.send("Performance.getMetrics"))["metrics"]}
+    finally:
+        await session.detach()
+    return {"heap": metrics.get("JSHeapUsedSize", 0), "nodes": metrics.get("Nodes", 0)}
+
+
+async def _run_mode(browser, base_url: str, mode: str, items: int) -> dict:
+    context = await browser.new_context()
+    stats = await install_resource_blocking(context, ResourceBlockProfile.from_env())
+    timings, samples = [], []
+    reused_page = await context.new_page() if mode == "reuse" else None
+    try:
+        for item_id in range(items):
+            started = time.perf_counter()
+            if mode == "request":
+                await call_mtop_in_context(context, DETAIL_API, {"itemId": str(item_id)}, base_url=base_url)
+            else:
+                page = reused_page or await context.new_page()
+                async with page.expect_response(_is_detail, timeout=25000) as detail_info:
+                    await page.goto(f"{base_url}/item?id={item_id}", wait_until="domcontentloaded")
+                await (await detail_info.value).json()
+                samples.append(await _page_metrics(context, page))
+                if page is not reused_page:
+                    await page.close()
+            timings.append(time.perf_counter() - started)
+    finally:
+        await context.close()
+    return {
+        "mean": statistics.mean(timings),
+        "requests": stats.requests_finished,
+        "mb": stats.bytes_loaded / 1024 / 1024,
+        "heap_mb": statistics.mean(s["heap"] for s in samples) / 1024 / 1024 if samples else 0.0,
+        "nodes": statistics.mean(s["nodes"] for s in samples) if samples else 0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比三种获取商品详情 JSON 的方式的耗时、流量和页面内存")
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="详情 API 的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(**build_launch_kwargs())
+            try:
+                results = {mode: await _run_mode(browser, base_url, mode, args.items) for mode in ("page", "reuse", "request")}
+            finally:
+                await browser.close()
+    finally:
+        server.shutdown()
+
+    for mode, result in results.items():
+        print(
+            f"{mode:<8} items={args.items} mean={result['mean']:.3f}s/item requests={result['requests']} "
+            f"downloaded={result['mb']:.2f}MB js_heap={result['heap_mb']:.1f}MB dom_nodes={result['nodes']:.0f}"
+        )
+    baseline = results["page"]["mean"]
+    for mode in ("reuse", "request"):
+        print(f"{mode} 相比 page 每个商品节省 {(1 - results[mode]['mean'] / baseline) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
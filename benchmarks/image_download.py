@@ -0,0 +1,104 @@
+"""
+图片下载吞吐量基准测试
+
+在本地启动一个静态图片服务（每个请求带有人为延迟），对比两种下载方式的吞吐量（张/秒）：
+  1. legacy: 原实现——逐张下载，每张图片在线程池中执行一次独立的 requests.get
+  2. pooled: ImageDownloader——共享 httpx 连接池，按域名限制并发
+
+用法:
+  python benchmarks/image_download.py --items 10 --images 8 --latency 0.1 --size 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import requests
+
+from src.config import IMAGE_DOWNLOAD_HEADERS
+from src.image_downloader import ImageDownloader
+
+
+def _make_handler(latency: float, body: bytes):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+async def _legacy(urls_per_item, out_dir):
+    loop = asyncio.get_running_loop()
+    for item, urls in enumerate(urls_per_item):
+        for i, url in enumerate(urls):
+            response = await loop.run_in_executor(
+                None, lambda: requests.get(url, headers=IMAGE_DOWNLOAD_HEADERS, timeout=20, stream=True)
+            )
+            response.raise_for_status()
+            with open(os.path.join(out_dir, f"legacy_{item}_{i}.jpg"), "wb") as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+
+
+async def _pooled(urls_per_item, out_dir, per_host):
+    downloader = ImageDownloader(per_host=per_host)
+    try:
+        for item, urls in enumerate(urls_per_item):
+            await asyncio.gather(
+                *(downloader.fetch(url, os.path.join(out_dir, f"pooled_{item}_{i}.jpg")) for i, url in enumerate(urls))
+            )
+    finally:
+        await downloader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比逐张 requests 下载与共享连接池并发下载的吞吐量")
+    parser.add_argument("--items", type=int, default=10, help="商品数")
+    parser.add_argument("--images", type=int, default=8, help="每个商品的图片数")
+    parser.add_argument("--latency", type=float, default=0.1, help="每个图片请求的模拟延迟（秒）")
+    parser.add_argument("--size", type=int, default=200, help="图片大小（KB）")
+    parser.add_argument("--per-host", type=int, default=4, help="pooled 模式下每个域名的并发数")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args.latency, os.urandom(args.size * 1024)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    urls_per_item = [[f"{base_url}/{item}/{i}.jpg" for i in range(args.images)] for item in range(args.items)]
+    total = args.items * args.images
+
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            results = {}
+            for name, run in (
+                ("legacy", lambda: _legacy(urls_per_item, out_dir)),
+                ("pooled", lambda: _pooled(urls_per_item, out_dir, args.per_host)),
+            ):
+                started = time.perf_counter()
+                asyncio.run(run())
+                elapsed = time.perf_counter() - started
+                results[name] = total / elapsed
+                print(f"{name:<8} images={total} elapsed={elapsed:.2f}s throughput={results[name]:.1f} images/s")
+    finally:
+        server.shutdown()
+
+    print(f"pooled 吞吐量为 legacy 的 {results['pooled'] / results['legacy']:.1f} 倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+卖家主页采集耗时基准测试
+
+在本地启动一个模拟闲鱼个人主页的 HTTP 服务（头部、商品列表、评价列表 API 均带有人为延迟，
+滚动到底部时加载下一页，点击「信用及评价」切换到评价列表），对比两种采集方式的耗时：
+  1. sequential: 同一页面中先滚动商品列表，再切换选项卡滚动评价列表（默认行为）
+  2. parallel:   商品列表和评价列表在同一 context 的两个页面中同时采集
+
+用法:
+  python benchmarks/seller_profile.py --runs 3 --pages 5 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from playwright.async_api import async_playwright
+
+from src import scraper
+from src.browser import build_launch_kwargs
+
+PERSONAL_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>personal</title></head>
+<body>
+<ul><li><div>宝贝</div></li><li id="rate-tab"><div>信用及评价</div></li></ul>
+<div id="list"></div>
+<script>
+let view = "items";
+const next = {items: 1, ratings: 1};
+let loading = false;
+async function load() {
+  if (loading || next[view] === null) return;
+  loading = true;
+  const api = view === "items" ? "mtop.idle.web.xyh.item.list" : "mtop.idle.web.trade.rate.list";
+  const resp = await fetch(`/h5/${api}/1.0/?page=${next[view]}`);
+  const data = await resp.json();
+  next[view] = data.data.nextPage ? next[view] + 1 : null;
+  const block = document.createElement("div");
+  block.style.height = "2000px";
+  document.getElementById("list").appendChild(block);
+  loading = false;
+}
+fetch("/h5/mtop.idle.web.user.page.head/1.0/");
+load();
+window.addEventListener("scroll", load);
+document.getElementById("rate-tab").addEventListener("click", () => { view = "ratings"; load(); });
+</script>
+</body></html>
+"""
+
+
+def _make_handler(pages: int, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, body: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith("/personal"):
+                self._send(PERSONAL_HTML.encode("utf-8"), "text/html; charset=utf-8")
+                return
+            time.sleep(latency)
+            page_no = int(parse_qs(url.query).get("page", ["1"])[0])
+            if "mtop.idle.web.user.page.head" in url.path:
+                payload = {"data": {"module": {"base": {"displayName": "bench_seller"}}}}
+            elif "mtop.idle.web.xyh.item.list" in url.path:
+                cards = [{"cardData": {"id": f"{page_no}-{i}", "itemStatus": 0}} for i in range(20)]
+                payload = {"data": {"cardList": cards, "nextPage": page_no < pages}}
+            elif "mtop.idle.web.trade.rate.list" in url.path:
+                cards = [
+                    {"cardData": {"rateId": f"{page_no}-{i}", "rate": 1, "rateTagList": [{"text": "卖家"}]}}
+                    for i in range(20)
+                ]
+                payload = {"data": {"cardList": cards, "nextPage": page_no < pages}}
+            else:
+                self.send_error(404)
+                return
+            self._send(json.dumps(payload).encode("utf-8"), "application/json")
+
+    return Handler
+
+
+async def _run_once(context, parallel: bool) -> float:
+    started = time.perf_counter()
+    profile = await scraper.scrape_user_profile(context, "bench", parallel_pages=parallel)
+    elapsed = time.perf_counter() - started
+    if not profile.get("卖家收到的评价列表"):
+        raise RuntimeError("评价列表采集失败，基准测试结果无效")
+    return elapsed
+
+
+def _summary(name: str, samples: list) -> float:
+    mean = statistics.mean(samples)
+    print(f"{name:<10} runs={len(samples)} mean={mean:.2f}s min={min(samples):.2f}s max={max(samples):.2f}s")
+    return mean
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="对比顺序采集与双页面并行采集卖家主页的耗时")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=5, help="商品列表和评价列表各自的分页数")
+    parser.add_argument("--latency", type=float, default=0.5, help="每次 API 请求的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args.pages, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scraper.PERSONAL_PAGE_URL = f"http://127.0.0.1:{server.server_port}/personal?userId={{user_id}}"
+
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(**build_launch_kwargs())
+            context = await browser.new_context()
+            try:
+                sequential = [await _run_once(context, parallel=False) for _ in range(args.runs)]
+                parallel = [await _run_once(context, parallel=True) for _ in range(args.runs)]
+            finally:
+                await browser.close()
+    finally:
+        server.shutdown()
+
+    sequential_mean = _summary("sequential", sequential)
+    parallel_mean = _summary("parallel", parallel)
+    print(f"每个卖家节省约 {sequential_mean - parallel_mean:.2f}s ({(1 - parallel_mean / sequential_mean) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
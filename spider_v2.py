@@ -4,8 +4,13 @@ import os
 import argparse
 import json
 
+from src.ai_handler import log_ai_usage_stats
+from src.ai_rate_limit import log_ai_rate_limit_stats
+from src.ai_screening import log_tier_stats
 from src.config import STATE_FILE
+from src.image_store import log_image_store_stats
 from src.scraper import scrape_xianyu
+from src.utils import log_time
 
 
 async def main():
@@ -142,5 +147,11 @@ async def main():
         else:
             print(f"任务 '{task_name}' 正常结束，本次运行共处理了 {result} 个新商品。")
 
+    # 以下统计是所有任务共用的进程级计数，在全部任务结束后输出一次
+    log_image_store_stats()
+    log_ai_usage_stats()
+    log_tier_stats(log_time)
+    log_ai_rate_limit_stats(log_time)
+
 if __name__ == "__main__":
     asyncio.run(main())
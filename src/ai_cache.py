@@ -0,0 +1,185 @@
+"""
+AI 分析结果缓存
+重新上架的商品、换了商品ID的同一商品、被多次运行重复发现的商品，其 AI 结论可以直接复用。
+缓存键由两部分组成:
+  - 商品指纹: 归一化后的标题与描述、价格区间、卖家ID、图片 dHash（见 src/image_select.py）
+  - 提示词指纹: 最终 prompt 文本、模型名与消息布局
+结果保存在本地 SQLite（WAL 模式，所有爬虫进程共享），超过 AI_CACHE_TTL_HOURS 的条目失效，
+条目数超过 AI_CACHE_MAX_ENTRIES 时按最近使用时间淘汰。
+"""
+import hashlib
+import json
+import math
+import re
+import time
+from typing import List, Optional
+
+from src.config import AI_CACHE_DB, AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL_HOURS, AI_PROMPT_LAYOUT, MODEL_NAME
+from src.utils import connect_sqlite
+
+# 价格按约 10% 的对数区间分档，小幅改价不影响命中
+PRICE_BAND_RATIO = 1.1
+
+
+def _normalize_text(text) -> str:
+    return re.sub(r"[\W_]+", "", str(text or "")).lower()
+
+
+def _parse_price(price) -> Optional[float]:
+    text = str(price or "").replace(",", "").replace("¥", "").strip()
+    match = re.search(r"\d+(?:\.\d+)?", text)
+    if not match:
+        return None
+    value = float(match.group())
+    if "万" in text:
+        value *= 10000
+    return value
+
+
+def price_band(price) -> str:
+    value = _parse_price(price)
+    if value is None:
+        return "?"
+    if value <= 1:
+        return "0"
+    return str(int(math.log(value) / math.log(PRICE_BAND_RATIO)))
+
+
+def listing_fingerprint(item_info: dict, seller_id: Optional[str], image_hashes: List[str]) -> str:
+    """商品内容指纹，与商品ID和链接无关；图片顺序不影响结果。"""
+    parts = {
+        "title": _normalize_text(item_info.get("商品标题")),
+        "desc": _normalize_text(item_info.get("商品描述")),
+        "price": price_band(item_info.get("当前售价")),
+        "seller": str(seller_id or ""),
+        "images": sorted(image_hashes or []),
+    }
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def prompt_fingerprint(prompt_text: str, model: str = MODEL_NAME, layout: str = AI_PROMPT_LAYOUT) -> str:
+    return hashlib.sha256(f"{model}\n{layout}\n{prompt_text or ''}".encode("utf-8")).hexdigest()
+
+
+class AIVerdictCache:
+    """基于 SQLite 的 AI 分析结果缓存"""
+
+    def __init__(
+        self,
+        db_path: str = AI_CACHE_DB,
+        ttl_seconds: float = AI_CACHE_TTL_HOURS * 3600,
+        max_entries: int = AI_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self.max_entries = max(0, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+        self._conn = connect_sqlite(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS ai_verdicts (
+                cache_key TEXT PRIMARY KEY,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                seconds REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_ai_verdicts_last_used ON ai_verdicts(last_used);
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        self.purge_expired()
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def make_key(listing_fp: str, prompt_fp: str) -> str:
+        return f"{listing_fp}:{prompt_fp}"
+
+    def _bump(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "INSERT INTO cache_stats(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, int(amount)),
+        )
+
+    def get(self, cache_key: str) -> Optional[dict]:
+        """读取未过期的结果，并记录命中/未命中及节省的 token 与耗时。"""
+        row = self._conn.execute(
+            "SELECT result_json, created_at, tokens, seconds FROM ai_verdicts WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        result = None
+        if row and time.time() - row[1] <= self.ttl_seconds:
+            try:
+                result = json.loads(row[0])
+            except json.JSONDecodeError:
+                result = None
+        if result is None:
+            self.misses += 1
+            self._bump("misses")
+            return None
+        self._conn.execute("UPDATE ai_verdicts SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+        self.hits += 1
+        self.tokens_saved += row[2]
+        self.seconds_saved += row[3]
+        self._bump("hits")
+        self._bump("tokens_saved", row[2])
+        self._bump("ms_saved", row[3] * 1000)
+        return result
+
+    def put(self, cache_key: str, result: dict, tokens: int = 0, seconds: float = 0.0):
+        """保存一次 AI 分析结果；tokens/seconds 为该次调用的消耗，命中时计为节省量。"""
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO ai_verdicts(cache_key, result_json, created_at, last_used, tokens, seconds) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(cache_key) DO UPDATE SET result_json = excluded.result_json, "
+            "created_at = excluded.created_at, last_used = excluded.last_used, "
+            "tokens = excluded.tokens, seconds = excluded.seconds",
+            (cache_key, json.dumps(result, ensure_ascii=False), now, now, int(tokens), float(seconds)),
+        )
+        self.evict()
+
+    def purge_expired(self) -> int:
+        cursor = self._conn.execute("DELETE FROM ai_verdicts WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        return cursor.rowcount
+
+    def evict(self) -> int:
+        """条目数超过上限时淘汰最久未使用的条目，返回淘汰数。"""
+        if not self.max_entries:
+            return 0
+        count = self._conn.execute("SELECT COUNT(*) FROM ai_verdicts").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM ai_verdicts WHERE cache_key IN "
+            "(SELECT cache_key FROM ai_verdicts ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        return excess
+
+    def stats(self) -> dict:
+        """当前进程及所有进程累计的命中与节省统计。"""
+        totals = dict(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+        size = self._conn.execute("SELECT COUNT(*) FROM ai_verdicts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "seconds_saved": round(self.seconds_saved, 1),
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+            "total_tokens_saved": totals.get("tokens_saved", 0),
+            "total_seconds_saved": round(totals.get("ms_saved", 0) / 1000, 1),
+            "entries": size,
+        }
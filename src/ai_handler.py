@@ -5,6 +5,7 @@ import os
 import re
 import sys
 import shutil
+import time
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, urlparse, urlunparse, parse_qsl
 
@@ -18,7 +19,13 @@ if sys.platform.startswith('win'):
 
 from src.config import (
     AI_DEBUG_MODE,
-    IMAGE_DOWNLOAD_HEADERS,
+    AI_IMAGE_BUDGET,
+    AI_PAYLOAD_COMPACT,
+    AI_PAYLOAD_TOKEN_BUDGET,
+    AI_PROMPT_LAYOUT,
+    BASE_URL,
+    IMAGE_DOWNLOAD_BUDGET_SECONDS,
+    IMAGE_MEMORY_MAX_BYTES_PER_ITEM,
     IMAGE_SAVE_DIR,
     TASK_IMAGE_DIR_PREFIX,
     MODEL_NAME,
@@ -39,6 +46,14 @@ from src.config import (
     ENABLE_RESPONSE_FORMAT,
     client,
 )
+from src.ai_payload import build_ai_payload, estimate_tokens
+from src.ai_rate_limit import AIRateLimited, get_ai_rate_limiter, limited_completion
+from src.ai_screening import record_tier, screen_listing, screening_enabled, screening_rejection
+from src.image_capture import captured_image
+from src.image_downloader import ByteBudget, get_image_downloader
+from src.image_preprocess import prepare_images, summarize as summarize_prepared_images
+from src.image_select import select_images
+from src.image_store import get_image_store
 from src.utils import convert_goofish_link, retry_on_failure
 
 
@@ -55,24 +70,28 @@ def safe_print(text):
             print("[输出包含无法显示的字符]")
 
 
-@retry_on_failure(retries=2, delay=3)
-async def _download_single_image(url, save_path):
-    """一个带重试的内部函数，用于异步下载单个图片。"""
-    loop = asyncio.get_running_loop()
-    # 使用 run_in_executor 运行同步的 requests 代码，避免阻塞事件循环
-    response = await loop.run_in_executor(
-        None,
-        lambda: requests.get(url, headers=IMAGE_DOWNLOAD_HEADERS, timeout=20, stream=True)
-    )
-    response.raise_for_status()
-    with open(save_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
-    return save_path
+async def _download_single_image(url, save_path, deadline=None):
+    """下载单个图片：使用共享连接池，失败时按图片单独重试。"""
+    return await get_image_downloader().fetch(url, save_path, deadline=deadline)
+
+
+async def _add_to_image_store(store, url, path):
+    if store is None:
+        return
+    try:
+        # 计算哈希、写索引和淘汰都是阻塞操作，放到线程中执行
+        await asyncio.to_thread(store.adopt, url, path)
+    except Exception as e:
+        safe_print(f"   [图片库] 收入图片 {os.path.basename(path)} 失败: {e}")
 
 
-async def download_all_images(product_id, image_urls, task_name="default"):
-    """异步下载一个商品的所有图片。如果图片已存在则跳过。支持任务隔离。"""
+async def download_all_images(product_id, image_urls, task_name="default", captured=None):
+    """
+    异步并发下载一个商品的所有图片。如果图片已存在则跳过。支持任务隔离。
+    已在图片库（见 src/image_store.py）中的图片直接链接到任务目录；
+    captured 为详情页已加载的图片内容（见 src/image_capture.py），命中时直接写入文件，不再下载。
+    所有图片共享 IMAGE_DOWNLOAD_BUDGET_SECONDS 的下载时限，新获取的图片收入图片库。
+    """
     if not image_urls:
         return []
 
@@ -84,7 +103,9 @@ async def download_all_images(product_id, image_urls, task_name="default"):
     if not urls:
         return []
 
-    saved_paths = []
+    store = get_image_store()
+    saved_paths = [None] * len(urls)
+    pending = []
     total_images = len(urls)
     for i, url in enumerate(urls):
         try:
@@ -99,17 +120,92 @@ async def download_all_images(product_id, image_urls, task_name="default"):
 
             if os.path.exists(save_path):
                 safe_print(f"   [图片] 图片 {i + 1}/{total_images} 已存在，跳过下载: {os.path.basename(save_path)}")
-                saved_paths.append(save_path)
+                saved_paths[i] = save_path
                 continue
 
-            safe_print(f"   [图片] 正在下载图片 {i + 1}/{total_images}: {url}")
-            if await _download_single_image(url, save_path):
-                safe_print(f"   [图片] 图片 {i + 1}/{total_images} 已成功下载到: {os.path.basename(save_path)}")
-                saved_paths.append(save_path)
+            if store and await asyncio.to_thread(store.materialize, url, save_path):
+                safe_print(f"   [图片] 图片 {i + 1}/{total_images} 已在图片库中，直接复用: {os.path.basename(save_path)}")
+                saved_paths[i] = save_path
+                continue
+
+            body = captured_image(captured, url)
+            if body:
+                with open(save_path, 'wb') as f:
+                    f.write(body)
+                safe_print(f"   [图片] 图片 {i + 1}/{total_images} 已从详情页捕获: {os.path.basename(save_path)}")
+                await _add_to_image_store(store, url, save_path)
+                saved_paths[i] = save_path
+                continue
+
+            pending.append((i, url, save_path))
         except Exception as e:
             safe_print(f"   [图片] 处理图片 {url} 时发生错误，已跳过此图: {e}")
 
-    return saved_paths
+    if pending:
+        started = time.monotonic()
+        deadline = started + IMAGE_DOWNLOAD_BUDGET_SECONDS if IMAGE_DOWNLOAD_BUDGET_SECONDS > 0 else None
+        safe_print(f"   [图片] 正在并发下载 {len(pending)} 张图片...")
+        results = await asyncio.gather(
+            *(_download_single_image(url, save_path, deadline) for _, url, save_path in pending),
+            return_exceptions=True,
+        )
+        for (i, url, save_path), result in zip(pending, results):
+            if isinstance(result, BaseException):
+                safe_print(f"   [图片] 下载图片 {url} 失败，已跳过此图: {type(result).__name__} - {result}")
+            elif result:
+                safe_print(f"   [图片] 图片 {i + 1}/{total_images} 已成功下载到: {os.path.basename(save_path)}")
+                await _add_to_image_store(store, url, save_path)
+                saved_paths[i] = save_path
+        safe_print(f"   [图片] 下载完成，耗时 {time.monotonic() - started:.2f} 秒。")
+
+    return [path for path in saved_paths if path]
+
+
+async def download_images_to_memory(product_id, image_urls, captured=None, max_bytes=IMAGE_MEMORY_MAX_BYTES_PER_ITEM):
+    """
+    把一个商品的图片下载到内存中（不写入任务目录），按原顺序返回图片内容列表。
+    图片库中已有或详情页已捕获的图片直接使用；所有图片合计不超过 max_bytes 字节，超出的图片被跳过。
+    """
+    urls = [url.strip() for url in image_urls or [] if url.strip().startswith('http')]
+    if not urls:
+        return []
+
+    store = get_image_store()
+    budget = ByteBudget(max_bytes)
+    images = [None] * len(urls)
+    pending = []
+    for i, url in enumerate(urls):
+        try:
+            body = captured_image(captured, url)
+            if not body and store:
+                body = await asyncio.to_thread(store.read, url)
+            if not body:
+                pending.append((i, url))
+                continue
+            budget.take(len(body))
+            images[i] = body
+        except Exception as e:
+            safe_print(f"   [图片] 商品 #{product_id} 的图片 {i + 1}/{len(urls)} 已跳过: {e}")
+
+    if pending:
+        started = time.monotonic()
+        deadline = started + IMAGE_DOWNLOAD_BUDGET_SECONDS if IMAGE_DOWNLOAD_BUDGET_SECONDS > 0 else None
+        downloader = get_image_downloader()
+        results = await asyncio.gather(
+            *(downloader.fetch_bytes(url, deadline=deadline, budget=budget) for _, url in pending),
+            return_exceptions=True,
+        )
+        for (i, url), result in zip(pending, results):
+            if isinstance(result, BaseException):
+                safe_print(f"   [图片] 下载图片 {url} 失败，已跳过此图: {type(result).__name__} - {result}")
+            else:
+                images[i] = result
+        safe_print(
+            f"   [图片] 已在内存中获取 {len(pending)} 张图片中的 {sum(1 for i, _ in pending if images[i])} 张，"
+            f"耗时 {time.monotonic() - started:.2f} 秒。"
+        )
+
+    return [body for body in images if body]
 
 
 def cleanup_task_images(task_name):
@@ -509,9 +605,119 @@ async def send_ntfy_notification(product_data, reason):
             safe_print(f"   -> 发送 Webhook 通知时发生未知错误: {e}")
 
 
-@retry_on_failure(retries=3, delay=5)
-async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
-    """将完整的商品JSON数据和所有图片发送给 AI 进行分析（异步）。"""
+def _usage_field(obj, name):
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def _response_token_usage(response) -> dict:
+    """
+    从响应的 usage 中读取 token 消耗。命中提示词缓存的 token 数各服务商字段不同:
+    OpenAI/Gemini 为 prompt_tokens_details.cached_tokens，DeepSeek 为 prompt_cache_hit_tokens。
+    """
+    response_usage = _usage_field(response, "usage")
+    cached = _usage_field(_usage_field(response_usage, "prompt_tokens_details"), "cached_tokens")
+    if cached is None:
+        cached = _usage_field(response_usage, "prompt_cache_hit_tokens")
+    return {
+        "prompt_tokens": _usage_field(response_usage, "prompt_tokens") or 0,
+        "completion_tokens": _usage_field(response_usage, "completion_tokens") or 0,
+        "cached_tokens": cached or 0,
+    }
+
+
+# 按 (服务地址, 模型, 消息布局) 累计的 AI 调用统计，用于对比不同服务商的缓存命中与耗时
+_usage_stats = {}
+
+
+def _record_usage_stats(token_usage: dict, seconds: float):
+    key = (urlparse(BASE_URL or "").netloc or "unknown", MODEL_NAME, AI_PROMPT_LAYOUT)
+    stats = _usage_stats.setdefault(key, {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "seconds": 0.0})
+    stats["requests"] += 1
+    stats["prompt_tokens"] += token_usage["prompt_tokens"]
+    stats["cached_tokens"] += token_usage["cached_tokens"]
+    stats["seconds"] += seconds
+
+
+def log_ai_usage_stats():
+    """输出本次运行各服务商的 prompt token、缓存命中比例与平均耗时（本进程未调用 AI 时不输出）。"""
+    for (host, model, layout), stats in _usage_stats.items():
+        ratio = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        safe_print(
+            f"[AI用量] {host} / {model} / {layout} 布局: {stats['requests']} 次请求，"
+            f"prompt {stats['prompt_tokens']} tokens，缓存命中 {stats['cached_tokens']} ({ratio * 100:.1f}%)，"
+            f"平均耗时 {stats['seconds'] / stats['requests']:.1f} 秒。"
+        )
+
+
+AI_ITEM_INSTRUCTION = "请基于你的专业知识和我的要求，分析以下完整的商品JSON数据："
+
+
+def build_ai_messages(product_details_json, prompt_text, image_urls, layout="prefix"):
+    """
+    组装发送给 AI 的消息。
+      - prefix: 不变的分析标准（base_prompt + 任务标准）作为第一条 system 消息，
+        商品数据和图片放在其后的 user 消息中，所有请求共享同一前缀，可命中服务商的提示词缓存；
+      - legacy: 原布局，图片在前、商品数据在中间、分析标准在最后，全部放在一条 user 消息中。
+    """
+    item_text = f"{AI_ITEM_INSTRUCTION}\n\n```json\n    {product_details_json}\n```\n"
+    image_parts = [{"type": "image_url", "image_url": {"url": url}} for url in image_urls]
+    if layout == "legacy":
+        return [{"role": "user", "content": image_parts + [{"type": "text", "text": f"{item_text}\n{prompt_text}\n"}]}]
+    return [
+        {"role": "system", "content": prompt_text},
+        {"role": "user", "content": [{"type": "text", "text": item_text}] + image_parts},
+    ]
+
+
+async def get_ai_analysis(
+    product_data,
+    image_paths=None,
+    prompt_text="",
+    image_budget=None,
+    usage=None,
+    payload_token_budget=None,
+    screening_criteria=None,
+    screening_verdict=None,
+):
+    """
+    将完整的商品JSON数据和图片发送给 AI 进行分析（异步）。
+    image_paths 中的每一项可以是图片文件路径，也可以是内存中的图片内容（见 download_images_to_memory）。
+    近似重复的图片会被去掉；image_budget 为单次请求最多发送的图片数，默认取 AI_IMAGE_BUDGET。
+    传入 usage 字典时，累计写入所有尝试消耗的 prompt_tokens、completion_tokens 与 seconds。
+    商品数据按 AI_PAYLOAD_COMPACT 精简（见 src/ai_payload.py），payload_token_budget 默认取 AI_PAYLOAD_TOKEN_BUDGET。
+    传入 screening_criteria 时先用纯文本模型初筛（见 src/ai_screening.py），明显不符合的商品不再进行多模态分析；
+    screening_verdict 为已批量得到的初筛结果，传入时不再单独初筛。
+    初筛只进行一次，失败重试只针对完整分析，避免重复消耗初筛 token 和重复计入分级统计。
+    """
+    if screening_criteria and (screening_verdict or screening_enabled()):
+        verdict = screening_verdict or await screen_listing(product_data, screening_criteria)
+        if verdict:
+            if usage is not None:
+                usage["screening_tokens"] = usage.get("screening_tokens", 0) + verdict["tokens"]
+                usage["seconds"] = usage.get("seconds", 0.0) + verdict["seconds"]
+            product_id = product_data.get('商品信息', {}).get('商品ID', 'N/A')
+            if verdict["reject"]:
+                safe_print(
+                    f"   [AI初筛] 商品 #{product_id} 被淘汰（{verdict['category']}，{verdict['seconds']:.1f} 秒）: "
+                    f"{verdict['reason']}"
+                )
+                return screening_rejection(verdict)
+            safe_print(f"   [AI初筛] 商品 #{product_id} 通过初筛（{verdict['seconds']:.1f} 秒），进入完整分析。")
+
+    started = time.monotonic()
+    result = await _full_ai_analysis(product_data, image_paths, prompt_text, image_budget, usage, payload_token_budget)
+    if result is not None:
+        record_tier("full", bool(result.get("is_recommended")), time.monotonic() - started)
+    return result
+
+
+@retry_on_failure(retries=3, delay=5, give_up_on=(AIRateLimited,))
+async def _full_ai_analysis(product_data, image_paths, prompt_text, image_budget, usage, payload_token_budget):
+    """多模态完整分析（参数见 get_ai_analysis）。"""
     if not client:
         safe_print("   [AI分析] 错误：AI客户端未初始化，跳过分析。")
         return None
@@ -526,7 +732,14 @@ async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
         safe_print("   [AI分析] 错误：未提供AI分析所需的prompt文本。")
         return None
 
-    product_details_json = json.dumps(product_data, ensure_ascii=False, indent=2)
+    original_json = json.dumps(product_data, ensure_ascii=False, indent=2)
+    original_tokens = estimate_tokens(original_json)
+    if AI_PAYLOAD_COMPACT:
+        budget = AI_PAYLOAD_TOKEN_BUDGET if payload_token_budget is None else max(0, payload_token_budget)
+        product_details_json, payload_tokens = build_ai_payload(product_data, budget)
+    else:
+        product_details_json, payload_tokens = original_json, original_tokens
+    safe_print(f"   [AI分析] 商品数据估算 {payload_tokens} tokens（完整记录约 {original_tokens} tokens）")
     system_prompt = prompt_text
 
     if AI_DEBUG_MODE:
@@ -537,28 +750,25 @@ async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
         safe_print(prompt_text)
         safe_print("-------------------\n")
 
-    combined_text_prompt = f"""请基于你的专业知识和我的要求，分析以下完整的商品JSON数据：
-
-```json
-    {product_details_json}
-```
-
-{system_prompt}
-"""
-    user_content_list = []
-
-    # 先添加图片内容
+    # 先处理图片（缩小并重新压缩后发送，见 src/image_preprocess.py）
+    prepared_images, dropped_images = [], []
     if image_paths:
-        for path in image_paths:
-            base64_image = encode_image_to_base64(path)
-            if base64_image:
-                user_content_list.append(
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}})
-
-    # 再添加文本内容
-    user_content_list.append({"type": "text", "text": combined_text_prompt})
-
-    messages = [{"role": "user", "content": user_content_list}]
+        budget = AI_IMAGE_BUDGET if image_budget is None else max(0, image_budget)
+        all_prepared = await asyncio.get_running_loop().run_in_executor(None, prepare_images, image_paths)
+        prepared_images, dropped_images = await asyncio.get_running_loop().run_in_executor(
+            None, select_images, all_prepared, budget
+        )
+        if dropped_images:
+            reasons = "，".join(f"第{item.index + 1}张{item.reason}" for item in dropped_images)
+            safe_print(f"   [AI图片] {len(all_prepared)} 张图片中跳过 {len(dropped_images)} 张: {reasons}")
+        if prepared_images:
+            safe_print(f"   [AI图片] {summarize_prepared_images(prepared_images)}")
+
+    messages = build_ai_messages(
+        product_details_json, system_prompt, [image.data_url for image in prepared_images], AI_PROMPT_LAYOUT
+    )
+    text_bytes = len(product_details_json.encode("utf-8")) + len(system_prompt.encode("utf-8"))
+    request_kb = (sum(len(image.data_url) for image in prepared_images) + text_bytes) / 1024
 
     # 保存最终传输内容到日志文件
     try:
@@ -578,7 +788,15 @@ async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
             "task_name": task_name,
             "product_id": product_id,
             "title": item_info.get("商品标题", "无"),
+            "payload_tokens_estimated": payload_tokens,
+            "payload_tokens_original": original_tokens,
             "image_count": len(image_paths or []),
+            "image_sent_count": len(prepared_images),
+            "images_dropped": [{"index": item.index, "reason": item.reason} for item in dropped_images],
+            "image_bytes_original": sum(image.original_bytes for image in prepared_images),
+            "image_bytes_sent": sum(len(image.data) for image in prepared_images),
+            "image_tokens_estimated": sum(image.tokens for image in prepared_images),
+            "image_tokens_saved": sum(image.original_tokens - image.tokens for image in prepared_images),
         }
         log_content = json.dumps(log_payload, ensure_ascii=False)
 
@@ -591,6 +809,11 @@ async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
     except Exception as e:
         safe_print(f"   [日志] 保存AI分析日志时出错: {e}")
 
+    # 限流器按估算的输入 token 登记，请求完成后按实际用量修正
+    estimated_tokens = (
+        payload_tokens + estimate_tokens(system_prompt) + sum(image.tokens for image in prepared_images)
+    )
+
     # 增强的AI调用，包含更严格的格式控制和重试机制
     max_retries = 3
     for attempt in range(max_retries):
@@ -612,9 +835,22 @@ async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
             if ENABLE_RESPONSE_FORMAT:
                 request_params["response_format"] = {"type": "json_object"}
             
-            response = await client.chat.completions.create(
-                **get_ai_request_params(**request_params)
+            request_started = time.monotonic()
+            # 经过跨进程限流器发送，429 在限流器内按 Retry-After 等待，不再叠加下面的重试
+            response = await limited_completion(
+                get_ai_rate_limiter(), client, estimated_tokens, **get_ai_request_params(**request_params)
+            )
+            request_seconds = time.monotonic() - request_started
+            token_usage = _response_token_usage(response)
+            _record_usage_stats(token_usage, request_seconds)
+            safe_print(
+                f"   [AI分析] 第{attempt + 1}次请求耗时 {request_seconds:.1f} 秒（请求体约 {request_kb:.0f} KB，"
+                f"prompt {token_usage['prompt_tokens']} tokens，其中缓存命中 {token_usage['cached_tokens']}）"
             )
+            if usage is not None:
+                for key, value in token_usage.items():
+                    usage[key] = usage.get(key, 0) + value
+                usage["seconds"] = usage.get("seconds", 0.0) + request_seconds
 
             # 兼容不同API响应格式，检查response是否为字符串
             if hasattr(response, 'choices'):
@@ -692,6 +928,9 @@ async def get_ai_analysis(product_data, image_paths=None, prompt_text=""):
                     else:
                         raise json.JSONDecodeError("No valid JSON object found", ai_response_content, 0)
 
+        except AIRateLimited as e:
+            safe_print(f"   [AI分析] 限流等待超时，放弃本次分析: {e}")
+            raise
         except Exception as e:
             safe_print(f"   [AI分析] 第{attempt + 1}次尝试AI调用失败: {e}")
             if attempt < max_retries - 1:
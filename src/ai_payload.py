@@ -0,0 +1,129 @@
+"""
+发送给 AI 的商品数据精简
+完整记录中的卖家商品列表和评价列表可能有上千条，按 indent=2 序列化后大部分 token 都花在空白和历史记录上。
+这里生成一个紧凑视图:
+  - 商品信息: 去掉已单独发送的图片链接，长文本截断
+  - 卖家商品: 总数、在售/已售数、价格统计，以及最近 N 条商品的标题/价格/状态
+  - 卖家评价: 按类型与角色的计数，以及最近 N 条评价的时间/类型/角色/内容
+以最小化 JSON 输出；超过 token 预算时逐步减少 N 和文本长度。
+"""
+import json
+import math
+import re
+import statistics
+from typing import Optional, Tuple
+
+ITEM_LIST_KEY = "卖家发布的商品列表"
+RATING_LIST_KEY = "卖家收到的评价列表"
+# 图片已作为 image_url 单独发送，链接本身对分析没有帮助
+DROPPED_ITEM_KEYS = {"商品图片列表", "商品主图链接"}
+DROPPED_SELLER_KEYS = {"卖家头像链接"}
+DROPPED_RECORD_KEYS = {"爬取时间"}
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 个计，其余字符按 3 个一组计。"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 3)
+
+
+def _truncate(value, limit: int):
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + "…"
+    return value
+
+
+def _parse_price(price) -> Optional[float]:
+    match = re.search(r"\d+(?:\.\d+)?", str(price or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def _summarize_items(items: list, top_n: int, text_limit: int) -> dict:
+    prices = [price for price in (_parse_price(item.get("商品价格")) for item in items) if price is not None]
+    status_counts = {}
+    for item in items:
+        status = item.get("商品状态") or "未知"
+        status_counts[status] = status_counts.get(status, 0) + 1
+    summary = {"总数": len(items), "状态统计": status_counts}
+    if prices:
+        summary["价格统计"] = {
+            "最低": min(prices),
+            "中位数": round(statistics.median(prices), 2),
+            "最高": max(prices),
+        }
+    summary["最近商品"] = [
+        {"标题": _truncate(item.get("商品标题"), text_limit), "价格": item.get("商品价格"), "状态": item.get("商品状态")}
+        for item in items[:top_n]
+    ]
+    return summary
+
+
+def _summarize_ratings(ratings: list, top_n: int, text_limit: int) -> dict:
+    counts = {}
+    for rating in ratings:
+        key = f"{rating.get('评价来源角色') or '未知'}-{rating.get('评价类型') or '未知'}"
+        counts[key] = counts.get(key, 0) + 1
+    recent = sorted(ratings, key=lambda rating: str(rating.get("评价时间") or ""), reverse=True)[:top_n]
+    return {
+        "总数": len(ratings),
+        "分类统计": counts,
+        "最近评价": [
+            {
+                "时间": rating.get("评价时间"),
+                "类型": rating.get("评价类型"),
+                "角色": rating.get("评价来源角色"),
+                "内容": _truncate(rating.get("评价内容"), text_limit),
+            }
+            for rating in recent
+        ],
+    }
+
+
+def compact_record(record: dict, top_n: int = 20, text_limit: int = 300) -> dict:
+    """生成发送给 AI 的紧凑视图，不修改原记录。"""
+    compact = {key: value for key, value in record.items() if key not in DROPPED_RECORD_KEYS}
+
+    item_info = record.get("商品信息")
+    if isinstance(item_info, dict):
+        compact["商品信息"] = {
+            key: _truncate(value, text_limit * 4) for key, value in item_info.items() if key not in DROPPED_ITEM_KEYS
+        }
+
+    seller_info = record.get("卖家信息")
+    if isinstance(seller_info, dict):
+        seller = {
+            key: _truncate(value, text_limit)
+            for key, value in seller_info.items()
+            if key not in DROPPED_SELLER_KEYS and key not in (ITEM_LIST_KEY, RATING_LIST_KEY)
+        }
+        if isinstance(seller_info.get(ITEM_LIST_KEY), list):
+            seller["卖家商品概况"] = _summarize_items(seller_info[ITEM_LIST_KEY], top_n, text_limit)
+        if isinstance(seller_info.get(RATING_LIST_KEY), list):
+            seller["卖家评价概况"] = _summarize_ratings(seller_info[RATING_LIST_KEY], top_n, text_limit)
+        compact["卖家信息"] = seller
+    return compact
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_ai_payload(record: dict, token_budget: int = 0) -> Tuple[str, int]:
+    """
+    返回 (紧凑 JSON, 估算 token 数)。token_budget 大于 0 时逐步减少列表条数和文本长度，
+    直到估算 token 不超过预算或已无法继续精简。
+    """
+    top_n, text_limit = 20, 300
+    while True:
+        payload = _dumps(compact_record(record, top_n, text_limit))
+        tokens = estimate_tokens(payload)
+        if token_budget <= 0 or tokens <= token_budget or (top_n == 0 and text_limit <= 60):
+            return payload, tokens
+        if top_n > 0:
+            top_n //= 2
+        else:
+            text_limit = max(60, text_limit // 2)
@@ -0,0 +1,320 @@
+"""
+跨进程的 AI 请求限流
+多个爬虫进程同时调用同一个 AI 服务时，限流状态保存在共享的 SQLite（WAL 模式）中，所有进程共同遵守:
+  - 每分钟请求数（AI_RATE_LIMIT_RPM）与每分钟 token 数（AI_RATE_LIMIT_TPM），按最近 60 秒的滑动窗口计算
+  - 同时进行中的请求数（AI_MAX_INFLIGHT）；请求进行中每 LEASE_TTL_SECONDS/3 秒续期一次租约，
+    进程被 SIGTERM 等方式终止、来不及释放时，租约在 LEASE_TTL_SECONDS 后自动失效
+  - 服务返回 429 时按 Retry-After（没有时为 AI_RATE_LIMIT_DEFAULT_BACKOFF 秒）暂停该服务的所有请求
+限制按服务（OpenAI 兼容接口的域名）分别计算。排队等待时间在本进程和数据库中累计，运行结束时输出。
+SQLite 操作在线程池中执行（同一连接用锁串行化），等待其他进程的写锁时不会阻塞所有任务共用的事件循环。
+"""
+import asyncio
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from openai import APIStatusError
+
+from src.config import (
+    AI_MAX_INFLIGHT,
+    AI_RATE_LIMIT_DB,
+    AI_RATE_LIMIT_DEFAULT_BACKOFF,
+    AI_RATE_LIMIT_ENABLED,
+    AI_RATE_LIMIT_MAX_WAIT_SECONDS,
+    AI_RATE_LIMIT_RPM,
+    AI_RATE_LIMIT_TPM,
+)
+from src.utils import connect_sqlite
+
+WINDOW_SECONDS = 60.0
+# 远小于 AI_RATE_LIMIT_MAX_WAIT_SECONDS，被终止进程遗留的租约不会让其他进程等待超时
+LEASE_TTL_SECONDS = 30.0
+POLL_SECONDS = 0.5
+
+
+class AIRateLimited(Exception):
+    """等待限流超过 AI_RATE_LIMIT_MAX_WAIT_SECONDS，或 429 后重试仍被限流"""
+
+
+def provider_key(base_url) -> str:
+    return urlparse(str(base_url or "")).netloc or "default"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """从 429 响应的 Retry-After / retry-after-ms 头读取需要等待的秒数。"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return isinstance(error, APIStatusError) and error.status_code == 429
+
+
+class AIRateLimiter:
+    """基于 SQLite 的跨进程 AI 请求限流器"""
+
+    def __init__(
+        self,
+        db_path: str = AI_RATE_LIMIT_DB,
+        rpm: int = AI_RATE_LIMIT_RPM,
+        tpm: int = AI_RATE_LIMIT_TPM,
+        max_inflight: int = AI_MAX_INFLIGHT,
+        max_wait: float = AI_RATE_LIMIT_MAX_WAIT_SECONDS,
+        default_backoff: float = AI_RATE_LIMIT_DEFAULT_BACKOFF,
+        lease_ttl: float = LEASE_TTL_SECONDS,
+    ):
+        self.rpm = max(0, rpm)
+        self.tpm = max(0, tpm)
+        self.max_inflight = max(0, max_inflight)
+        self.max_wait = max_wait
+        self.default_backoff = default_backoff
+        self.lease_ttl = lease_ttl
+        self.requests = 0
+        self.waited_seconds = 0.0
+        self.max_waited_seconds = 0.0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS ai_requests (
+                request_id TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_ai_requests_provider ON ai_requests(provider, started_at);
+            CREATE TABLE IF NOT EXISTS ai_inflight (
+                request_id TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ai_backoff (
+                provider TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS limiter_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def close(self):
+        self._conn.close()
+
+    async def _in_thread(self, func, *args):
+        """在线程池中执行数据库操作，等待写锁（busy_timeout）期间事件循环可以继续调度其他任务。"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _bump(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "INSERT INTO limiter_stats(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, int(amount)),
+        )
+
+    def _try_acquire(self, provider: str, tokens: int) -> Tuple[float, Optional[str]]:
+        """尝试登记一次请求；成功返回 (0, 租约 ID)，否则返回 (建议等待的秒数, None)。"""
+        with self._lock:
+            return self._try_acquire_locked(provider, tokens)
+
+    def _try_acquire_locked(self, provider: str, tokens: int) -> Tuple[float, Optional[str]]:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            conn.execute("DELETE FROM ai_requests WHERE started_at < ?", (now - WINDOW_SECONDS,))
+            conn.execute("DELETE FROM ai_inflight WHERE expires_at < ?", (now,))
+            row = conn.execute("SELECT until FROM ai_backoff WHERE provider = ?", (provider,)).fetchone()
+            if row and row[0] > now:
+                return row[0] - now, None
+            if self.max_inflight:
+                inflight = conn.execute(
+                    "SELECT COUNT(*) FROM ai_inflight WHERE provider = ?", (provider,)
+                ).fetchone()[0]
+                if inflight >= self.max_inflight:
+                    return POLL_SECONDS, None
+            if self.rpm or self.tpm:
+                count, used, oldest = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(tokens), 0), MIN(started_at) FROM ai_requests WHERE provider = ?",
+                    (provider,),
+                ).fetchone()
+                over_rpm = self.rpm and count >= self.rpm
+                # 单个请求超过 TPM 上限时，只要窗口为空就放行，避免永远等待
+                over_tpm = self.tpm and count and used + tokens > self.tpm
+                if over_rpm or over_tpm:
+                    return max(POLL_SECONDS, oldest + WINDOW_SECONDS - now), None
+            request_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO ai_requests(request_id, provider, started_at, tokens) VALUES (?, ?, ?, ?)",
+                (request_id, provider, now, int(tokens)),
+            )
+            conn.execute(
+                "INSERT INTO ai_inflight(request_id, provider, expires_at) VALUES (?, ?, ?)",
+                (request_id, provider, now + self.lease_ttl),
+            )
+            return 0.0, request_id
+        finally:
+            conn.execute("COMMIT")
+
+    async def acquire(self, provider: str, tokens: int = 0) -> str:
+        """等待直到可以发出请求，返回租约 ID；等待超过 max_wait 时抛出 AIRateLimited。"""
+        started = time.monotonic()
+        while True:
+            wait, lease = await self._in_thread(self._try_acquire, provider, tokens)
+            if lease:
+                break
+            waited = time.monotonic() - started
+            if self.max_wait and waited + wait > self.max_wait:
+                raise AIRateLimited(f"{provider} 限流等待超过 {self.max_wait:.0f} 秒")
+            await asyncio.sleep(min(wait, 5.0))
+        waited = time.monotonic() - started
+        self.requests += 1
+        self.waited_seconds += waited
+        self.max_waited_seconds = max(self.max_waited_seconds, waited)
+        await self._in_thread(self._record_wait, waited)
+        if waited >= 1:
+            print(f"   [AI限流] {provider} 排队等待 {waited:.1f} 秒。")
+        return lease
+
+    def _record_wait(self, waited: float):
+        with self._lock:
+            self._bump("requests")
+            self._bump("wait_ms", waited * 1000)
+
+    def release(self, lease: str, tokens: Optional[int] = None):
+        """释放租约；tokens 为实际消耗，用于修正每分钟 token 统计。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ai_inflight WHERE request_id = ?", (lease,))
+            if tokens is not None:
+                self._conn.execute("UPDATE ai_requests SET tokens = ? WHERE request_id = ?", (int(tokens), lease))
+
+    def renew(self, lease: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ai_inflight SET expires_at = ? WHERE request_id = ?", (time.time() + self.lease_ttl, lease)
+            )
+
+    async def _keep_alive(self, lease: str):
+        """请求进行中定期续期租约。"""
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self._in_thread(self.renew, lease)
+            except Exception as e:
+                print(f"   [AI限流] 续期租约失败: {e}")
+
+    def back_off(self, provider: str, seconds: Optional[float]):
+        """服务返回 429 后，让所有进程暂停向该服务发请求。"""
+        seconds = self.default_backoff if seconds is None else seconds
+        self.rate_limited += 1
+        with self._lock:
+            self._bump("rate_limited")
+            self._conn.execute(
+                "INSERT INTO ai_backoff(provider, until) VALUES (?, ?) "
+                "ON CONFLICT(provider) DO UPDATE SET until = MAX(until, excluded.until)",
+                (provider, time.time() + seconds),
+            )
+        print(f"   [AI限流] {provider} 返回 429，所有进程暂停请求 {seconds:.1f} 秒。")
+
+    @asynccontextmanager
+    async def slot(self, provider: str, tokens: int = 0):
+        lease = await self.acquire(provider, tokens)
+        keep_alive = asyncio.create_task(self._keep_alive(lease))
+        usage = {}
+        try:
+            yield usage
+        finally:
+            keep_alive.cancel()
+            await self._in_thread(self.release, lease, usage.get("tokens"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            totals = dict(self._conn.execute("SELECT name, value FROM limiter_stats").fetchall())
+        return {
+            "requests": self.requests,
+            "waited_seconds": round(self.waited_seconds, 1),
+            "avg_wait_seconds": round(self.waited_seconds / self.requests, 2) if self.requests else 0.0,
+            "max_wait_seconds": round(self.max_waited_seconds, 1),
+            "rate_limited": self.rate_limited,
+            "total_requests": totals.get("requests", 0),
+            "total_wait_seconds": round(totals.get("wait_ms", 0) / 1000, 1),
+            "total_rate_limited": totals.get("rate_limited", 0),
+        }
+
+
+async def limited_completion(limiter: Optional["AIRateLimiter"], client, estimated_tokens: int, **params):
+    """
+    在限流器中调用 client.chat.completions.create。429 时记录 Retry-After 并在限流器中重新排队，
+    直到成功或等待超过上限（抛出 AIRateLimited），不再叠加外层重试。未启用限流时直接调用。
+    """
+    if limiter is None:
+        return await client.chat.completions.create(**params)
+    provider = provider_key(getattr(client, "base_url", None))
+    started = time.monotonic()
+    while True:
+        async with limiter.slot(provider, estimated_tokens) as usage:
+            try:
+                response = await client.chat.completions.create(**params)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                await limiter._in_thread(limiter.back_off, provider, retry_after_seconds(e))
+                if limiter.max_wait and time.monotonic() - started > limiter.max_wait:
+                    raise AIRateLimited(f"{provider} 持续返回 429") from e
+                continue
+            response_usage = getattr(response, "usage", None)
+            total = getattr(response_usage, "total_tokens", None)
+            usage["tokens"] = total if total is not None else estimated_tokens
+            return response
+
+
+_shared_limiter: Optional[AIRateLimiter] = None
+
+
+def get_ai_rate_limiter() -> Optional[AIRateLimiter]:
+    """获取进程内共享的限流器；未启用或打开失败时返回 None。"""
+    global _shared_limiter
+    if not AI_RATE_LIMIT_ENABLED:
+        return None
+    if _shared_limiter is None:
+        try:
+            _shared_limiter = AIRateLimiter()
+        except Exception as e:
+            print(f"   [警告] 打开AI限流数据库失败，将不进行跨进程限流: {e}")
+            return None
+    return _shared_limiter
+
+
+def log_ai_rate_limit_stats(log=print):
+    """输出本次运行的 AI 请求排队情况（本进程未发出 AI 请求时不输出）。"""
+    if _shared_limiter is None or not _shared_limiter.requests:
+        return
+    stats = _shared_limiter.stats()
+    log(
+        f"[AI限流] 本次 {stats['requests']} 次请求，排队共 {stats['waited_seconds']} 秒"
+        f"（平均 {stats['avg_wait_seconds']} 秒，最长 {stats['max_wait_seconds']} 秒），429 共 {stats['rate_limited']} 次；"
+        f"所有进程累计 {stats['total_requests']} 次请求，排队 {stats['total_wait_seconds']} 秒。"
+    )
@@ -0,0 +1,253 @@
+"""
+AI 两级分析的第一级：纯文本初筛
+用便宜、快速的纯文本模型（AI_SCREENING_MODEL_NAME）和简短的标准先判断商品是否明显不符合需求，
+例如商家/贩子、价格超出范围、型号不对。只有通过初筛的商品才进入完整的多模态分析。
+模型无法确定时一律放行；初筛请求失败时同样放行，不影响原有流程。
+screen_listings_batch 把一页搜索结果中的多个商品合并为一次请求，批量结果无法解析时退回逐个初筛。
+"""
+import json
+import re
+import time
+from typing import Dict, List, Optional
+
+from src.ai_payload import build_ai_payload, estimate_tokens
+from src.ai_rate_limit import get_ai_rate_limiter, limited_completion
+from src.config import (
+    AI_SCREENING_BATCH_SIZE,
+    AI_SCREENING_MODEL_NAME,
+    AI_SCREENING_TOKEN_BUDGET,
+    ENABLE_RESPONSE_FORMAT,
+    get_ai_request_params,
+    screening_client,
+)
+
+SCREENING_SYSTEM_PROMPT = """你是闲鱼二手商品的初筛助手。根据【购买需求】判断下面的商品是否【明显】不符合需求。
+只在有明确证据时淘汰，例如：
+- dealer: 卖家明显是商家/贩子（批量出货、“同行”“拿货”“量大从优”等）
+- price: 价格明显超出需求的价格范围
+- model: 型号、规格或品类明显不对
+- other: 其他明确违反需求硬性条件的情况
+信息不足或无法确定时必须放行（reject 为 false）。
+只输出 JSON：{"reject": true 或 false, "category": "dealer|price|model|other|none", "reason": "一句话理由"}"""
+
+
+def build_screening_criteria(task_config: dict) -> str:
+    """根据任务配置生成简短的购买需求描述，作为初筛标准。"""
+    lines = [f"搜索关键字: {task_config.get('keyword', '')}"]
+    if task_config.get("description"):
+        lines.append(f"需求描述: {task_config['description']}")
+    min_price, max_price = task_config.get("min_price"), task_config.get("max_price")
+    if min_price or max_price:
+        lines.append(f"价格范围: {min_price or '不限'} - {max_price or '不限'}")
+    if task_config.get("personal_only"):
+        lines.append("只要个人闲置，不要商家")
+    return "\n".join(lines)
+
+
+def _parse_verdict(content: str) -> Optional[dict]:
+    match = re.search(r"\{.*\}", content or "", re.S)
+    if not match:
+        return None
+    try:
+        verdict = json.loads(match.group())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(verdict.get("reject"), bool):
+        return None
+    return verdict
+
+
+def _estimate_message_tokens(messages: List[dict]) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+# 各级的调用次数、通过数与耗时
+_tier_stats = {}
+
+
+def record_tier(tier: str, passed: bool, seconds: float):
+    stats = _tier_stats.setdefault(tier, {"count": 0, "passed": 0, "seconds": 0.0})
+    stats["count"] += 1
+    stats["passed"] += int(passed)
+    stats["seconds"] += seconds
+
+
+def tier_stats() -> dict:
+    return {
+        tier: {
+            **stats,
+            "pass_rate": round(stats["passed"] / stats["count"], 4) if stats["count"] else 0.0,
+            "avg_seconds": round(stats["seconds"] / stats["count"], 2) if stats["count"] else 0.0,
+        }
+        for tier, stats in _tier_stats.items()
+    }
+
+
+def log_tier_stats(log=print):
+    """输出本次运行各级分析的通过率与平均耗时（未启用初筛时不输出）。"""
+    stats = tier_stats()
+    if "screening" not in stats:
+        return
+    labels = {"screening": "初筛", "full": "完整分析"}
+    parts = [
+        f"{labels.get(tier, tier)} {item['count']} 个、通过 {item['passed']} 个 ({item['pass_rate'] * 100:.1f}%)、"
+        f"平均耗时 {item['avg_seconds']:.1f} 秒"
+        for tier, item in stats.items()
+    ]
+    log(f"[AI分级] {'；'.join(parts)}。")
+
+
+def screening_enabled() -> bool:
+    """是否配置了初筛模型。"""
+    return screening_client is not None and bool(AI_SCREENING_MODEL_NAME)
+
+
+async def screen_listing(product_data: dict, criteria: str, client=None, model: str = None) -> Optional[dict]:
+    """
+    用初筛模型判断商品是否明显不符合需求。返回 {"reject", "category", "reason", "seconds", "tokens"}；
+    未配置初筛模型、请求失败或无法解析时返回 None（视为放行）。
+    """
+    client = client or screening_client
+    model = model or AI_SCREENING_MODEL_NAME
+    if client is None or not model:
+        return None
+    payload, _ = build_ai_payload(product_data, AI_SCREENING_TOKEN_BUDGET)
+    messages = [
+        {"role": "system", "content": SCREENING_SYSTEM_PROMPT},
+        {"role": "user", "content": f"【购买需求】\n{criteria}\n\n【商品数据】\n{payload}"},
+    ]
+    request_params = {"model": model, "messages": messages, "temperature": 0, "max_tokens": 200}
+    if ENABLE_RESPONSE_FORMAT:
+        request_params["response_format"] = {"type": "json_object"}
+
+    started = time.monotonic()
+    try:
+        response = await limited_completion(
+            get_ai_rate_limiter(), client, _estimate_message_tokens(messages),
+            **get_ai_request_params(**request_params),
+        )
+        content = response.choices[0].message.content if hasattr(response, "choices") else response
+    except Exception as e:
+        print(f"   [AI初筛] 请求失败，直接进入完整分析: {type(e).__name__} - {e}")
+        return None
+    seconds = time.monotonic() - started
+
+    verdict = _parse_verdict(content)
+    if verdict is None:
+        print("   [AI初筛] 无法解析初筛结果，直接进入完整分析。")
+        return None
+    record_tier("screening", not verdict["reject"], seconds)
+    usage = getattr(response, "usage", None)
+    return {
+        "reject": verdict["reject"],
+        "category": verdict.get("category") or "other",
+        "reason": verdict.get("reason") or "",
+        "seconds": seconds,
+        "tokens": (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0),
+    }
+
+
+BATCH_SYSTEM_PROMPT = SCREENING_SYSTEM_PROMPT.rsplit("\n", 1)[0] + """
+下面会给出多个商品，每个商品带有 id。逐个判断，只输出 JSON：
+{"verdicts": [{"id": "商品 id", "reject": true 或 false, "category": "dealer|price|model|other|none", "reason": "一句话理由"}]}"""
+
+
+def _parse_batch_verdicts(content: str, ids: List[str]) -> Dict[str, dict]:
+    """解析批量初筛结果，只返回 id 属于本批且格式正确的条目。"""
+    match = re.search(r"[\[{].*[\]}]", content or "", re.S)
+    if not match:
+        return {}
+    try:
+        parsed = json.loads(match.group())
+    except json.JSONDecodeError:
+        return {}
+    entries = parsed.get("verdicts") if isinstance(parsed, dict) else parsed
+    verdicts = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if isinstance(entry, dict) and str(entry.get("id")) in ids and isinstance(entry.get("reject"), bool):
+            verdicts[str(entry["id"])] = entry
+    return verdicts
+
+
+async def _screen_batch(records: Dict[str, dict], criteria: str, client, model: str) -> Dict[str, dict]:
+    ids = list(records)
+    items = []
+    for key in ids:
+        payload, _ = build_ai_payload(records[key], AI_SCREENING_TOKEN_BUDGET // 4)
+        items.append(f'{{"id":{json.dumps(key)},"data":{payload}}}')
+    messages = [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": f"【购买需求】\n{criteria}\n\n【商品列表】\n[{','.join(items)}]"},
+    ]
+    request_params = {"model": model, "messages": messages, "temperature": 0, "max_tokens": 120 * len(ids)}
+    if ENABLE_RESPONSE_FORMAT:
+        request_params["response_format"] = {"type": "json_object"}
+
+    started = time.monotonic()
+    try:
+        response = await limited_completion(
+            get_ai_rate_limiter(), client, _estimate_message_tokens(messages),
+            **get_ai_request_params(**request_params),
+        )
+        content = response.choices[0].message.content if hasattr(response, "choices") else response
+    except Exception as e:
+        print(f"   [AI初筛] 批量请求失败，改为逐个初筛: {type(e).__name__} - {e}")
+        return {}
+    seconds = time.monotonic() - started
+    parsed = _parse_batch_verdicts(content, ids)
+    usage = getattr(response, "usage", None)
+    tokens = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+    results = {}
+    for key, verdict in parsed.items():
+        record_tier("screening", not verdict["reject"], seconds / len(ids))
+        results[key] = {
+            "reject": verdict["reject"],
+            "category": verdict.get("category") or "other",
+            "reason": verdict.get("reason") or "",
+            "seconds": seconds / len(ids),
+            "tokens": tokens // len(ids),
+        }
+    return results
+
+
+async def screen_listings_batch(
+    records: Dict[str, dict], criteria: str, batch_size: int = AI_SCREENING_BATCH_SIZE, client=None, model: str = None
+) -> Dict[str, Optional[dict]]:
+    """
+    批量初筛：每 batch_size 个商品合并为一次请求，返回 {key: 初筛结果或 None}。
+    批量结果格式错误或缺少某些商品时，这些商品改为逐个调用 screen_listing。
+    """
+    client = client or screening_client
+    model = model or AI_SCREENING_MODEL_NAME
+    if client is None or not model or not records:
+        return {key: None for key in records}
+    keys = list(records)
+    results: Dict[str, Optional[dict]] = {}
+    for start in range(0, len(keys), max(1, batch_size)):
+        chunk = {key: records[key] for key in keys[start:start + max(1, batch_size)]}
+        batch = await _screen_batch(chunk, criteria, client, model) if len(chunk) > 1 else {}
+        missing = [key for key in chunk if key not in batch]
+        if batch and missing:
+            print(f"   [AI初筛] 批量结果缺少 {len(missing)} 个商品，改为逐个初筛。")
+        results.update(batch)
+        for key in missing:
+            results[key] = await screen_listing(chunk[key], criteria, client, model)
+    return results
+
+
+def screening_rejection(verdict: dict) -> dict:
+    """把初筛淘汰转换为与完整分析相同结构的结果，供保存、缓存和通知判断使用。"""
+    comment = f"初筛淘汰（{verdict['category']}）: {verdict['reason']}"
+    return {
+        "prompt_version": "screening",
+        "is_recommended": False,
+        "reason": comment,
+        "risk_tags": [f"初筛:{verdict['category']}"],
+        "criteria_analysis": {
+            "seller_type": {
+                "status": "FAIL" if verdict["category"] == "dealer" else "NEEDS_MANUAL_CHECK",
+                "comment": comment,
+            },
+        },
+        "screening": {"category": verdict["category"], "reason": verdict["reason"]},
+    }
@@ -11,12 +11,26 @@ from src.api.routes import tasks, logs, settings, prompts, results, login_state,
 from src.api.dependencies import set_process_service
 from src.services.task_service import TaskService
 from src.services.process_service import ProcessService
+from src.services.browser_pool_service import BrowserPoolService
 from src.services.scheduler_service import SchedulerService
 from src.infrastructure.persistence.json_task_repository import JsonTaskRepository
+from src.config import (
+    BROWSER_POOL_BASE_PORT,
+    BROWSER_POOL_ENABLED,
+    BROWSER_POOL_HEALTH_INTERVAL,
+    BROWSER_POOL_MAX_CONTEXTS,
+    BROWSER_POOL_SIZE,
+)
 
 
 # 全局服务实例
-process_service = ProcessService()
+browser_pool_service = BrowserPoolService(
+    size=BROWSER_POOL_SIZE,
+    base_port=BROWSER_POOL_BASE_PORT,
+    max_contexts=BROWSER_POOL_MAX_CONTEXTS,
+    health_interval=BROWSER_POOL_HEALTH_INTERVAL,
+) if BROWSER_POOL_ENABLED else None
+process_service = ProcessService(browser_pool=browser_pool_service)
 scheduler_service = SchedulerService(process_service)
 
 # 设置全局 ProcessService 实例供依赖注入使用
@@ -38,6 +52,13 @@ async def lifespan(app: FastAPI):
         if task.is_running:
             await task_service.update_task_status(task.id, False)
 
+    # 启动共享浏览器池
+    if browser_pool_service:
+        try:
+            await browser_pool_service.start()
+        except Exception as e:
+            print(f"共享浏览器池启动失败，爬虫将各自启动浏览器: {e}")
+
     # 加载定时任务
     await scheduler_service.reload_jobs(tasks_list)
     scheduler_service.start()
@@ -50,6 +71,8 @@ async def lifespan(app: FastAPI):
     print("正在关闭应用...")
     scheduler_service.stop()
     await process_service.stop_all()
+    if browser_pool_service:
+        await browser_pool_service.stop()
     print("应用已关闭")
 
 
@@ -86,7 +109,10 @@ if os.path.exists("dist"):
 @app.get("/health")
 async def health_check():
     """健康检查（无需认证）"""
-    return {"status": "healthy", "message": "服务正常运行"}
+    result = {"status": "healthy", "message": "服务正常运行"}
+    if browser_pool_service:
+        result["browser_pool"] = browser_pool_service.status(process_service.active_browser_leases()).__dict__
+    return result
 
 
 # 认证状态检查端点
@@ -0,0 +1,115 @@
+"""
+浏览器启动与上下文创建
+统一维护启动参数、移动端模拟参数和反检测脚本，供爬虫进程和共享浏览器池复用。
+"""
+import time
+from typing import Optional, Tuple
+
+from src.config import (
+    BROWSER_CDP_ENDPOINT,
+    LOGIN_IS_EDGE,
+    RUN_HEADLESS,
+    RUNNING_IN_DOCKER,
+)
+from src.utils import log_time
+
+
+# 反检测启动参数
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process'
+]
+
+# 使用移动设备模拟（与真实Chrome移动模式一致）
+# 基于HAR分析：真实浏览器使用Android移动设备模拟
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Mobile Safari/537.36",
+    "viewport": {'width': 412, 'height': 915},  # Pixel 5尺寸
+    "device_scale_factor": 2.625,
+    "is_mobile": True,
+    "has_touch": True,
+    "locale": 'zh-CN',
+    "timezone_id": 'Asia/Shanghai',
+    "permissions": ['geolocation'],
+    "geolocation": {'longitude': 121.4737, 'latitude': 31.2304},
+    "color_scheme": 'light',
+}
+
+# 增强反检测脚本（模拟真实移动设备）
+STEALTH_INIT_SCRIPT = """
+    // 移除webdriver标识
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+
+    // 模拟真实移动设备的navigator属性
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+    Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh', 'en-US', 'en']});
+
+    // 添加chrome对象
+    window.chrome = {runtime: {}, loadTimes: function() {}, csi: function() {}};
+
+    // 模拟触摸支持
+    Object.defineProperty(navigator, 'maxTouchPoints', {get: () => 5});
+
+    // 覆盖permissions查询（避免暴露自动化）
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({state: Notification.permission}) :
+            originalQuery(parameters)
+    );
+"""
+
+
+def build_launch_kwargs(proxy_server: Optional[str] = None, extra_args: Optional[list] = None) -> dict:
+    """构建 chromium.launch 的参数。"""
+    launch_kwargs = {"headless": RUN_HEADLESS, "args": LAUNCH_ARGS + list(extra_args or [])}
+    if proxy_server:
+        launch_kwargs["proxy"] = {"server": proxy_server}
+
+    if LOGIN_IS_EDGE:
+        launch_kwargs["channel"] = "msedge"
+    else:
+        if not RUNNING_IN_DOCKER:
+            launch_kwargs["channel"] = "chrome"
+    return launch_kwargs
+
+
+async def open_browser(p, proxy_server: Optional[str] = None, cdp_endpoint: Optional[str] = None) -> Tuple[object, bool]:
+    """
+    获取一个可用的浏览器。
+    配置了 CDP 地址时优先连接共享浏览器池中的常驻实例，连接失败则回退为本地冷启动。
+    返回 (browser, is_shared)。
+    """
+    endpoint = BROWSER_CDP_ENDPOINT if cdp_endpoint is None else cdp_endpoint
+    started = time.perf_counter()
+    if endpoint:
+        try:
+            browser = await p.chromium.connect_over_cdp(endpoint, timeout=10000)
+            log_time(f"[浏览器] 已连接共享浏览器 {endpoint}，耗时 {time.perf_counter() - started:.2f} 秒。")
+            return browser, True
+        except Exception as e:
+            log_time(f"[浏览器] 连接共享浏览器 {endpoint} 失败，回退为本地启动: {e}")
+            started = time.perf_counter()
+
+    browser = await p.chromium.launch(**build_launch_kwargs(proxy_server))
+    log_time(f"[浏览器] 本地启动 Chromium 完成，耗时 {time.perf_counter() - started:.2f} 秒。")
+    return browser, False
+
+
+async def new_scrape_context(browser, state_file: str, proxy_server: Optional[str] = None, is_shared: bool = False):
+    """
+    在浏览器中创建一个隔离的 BrowserContext（独立的登录状态与代理）。
+    本地启动的浏览器已在启动参数中设置代理，共享浏览器则按上下文设置代理。
+    """
+    context_kwargs = dict(CONTEXT_OPTIONS)
+    context_kwargs["storage_state"] = state_file
+    if is_shared and proxy_server:
+        context_kwargs["proxy"] = {"server": proxy_server}
+
+    context = await browser.new_context(**context_kwargs)
+    await context.add_init_script(STEALTH_INIT_SCRIPT)
+    return context
@@ -16,9 +16,13 @@ os.makedirs(IMAGE_SAVE_DIR, exist_ok=True)
 # 任务隔离的临时图片目录前缀
 TASK_IMAGE_DIR_PREFIX = "task_images_"
 
+# 跨任务、跨进程共享的本地缓存目录
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
 # --- API URL Patterns ---
 API_URL_PATTERN = "h5api.m.goofish.com/h5/mtop.taobao.idlemtopsearch.pc.search"
 DETAIL_API_URL_PATTERN = "h5api.m.goofish.com/h5/mtop.taobao.idle.pc.detail"
+PERSONAL_PAGE_URL = "https://www.goofish.com/personal?userId={user_id}"
 
 # --- Environment Variables ---
 API_KEY = os.getenv("OPENAI_API_KEY")
@@ -47,6 +51,85 @@ SKIP_AI_ANALYSIS = os.getenv("SKIP_AI_ANALYSIS", "false").lower() == "true"
 ENABLE_THINKING = os.getenv("ENABLE_THINKING", "false").lower() == "true"
 ENABLE_RESPONSE_FORMAT = os.getenv("ENABLE_RESPONSE_FORMAT", "true").lower() == "true"
 
+# --- Shared Browser Pool ---
+# 由 Web 服务常驻维护的 Chromium 实例池，爬虫进程通过 CDP 连接并租用独立的 BrowserContext
+BROWSER_POOL_ENABLED = os.getenv("BROWSER_POOL_ENABLED", "false").lower() == "true"
+BROWSER_POOL_SIZE = max(1, int(os.getenv("BROWSER_POOL_SIZE", "1") or 1))
+BROWSER_POOL_BASE_PORT = int(os.getenv("BROWSER_POOL_BASE_PORT", "9222") or 9222)
+BROWSER_POOL_MAX_CONTEXTS = max(1, int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "8") or 8))
+BROWSER_POOL_HEALTH_INTERVAL = max(5, int(os.getenv("BROWSER_POOL_HEALTH_INTERVAL", "30") or 30))
+# 爬虫子进程使用的 CDP 地址（由 ProcessService 注入，也可手动指定）
+BROWSER_CDP_ENDPOINT = os.getenv("BROWSER_CDP_ENDPOINT", "").strip()
+
+# --- Seller Profile Cache ---
+SELLER_CACHE_ENABLED = os.getenv("SELLER_CACHE_ENABLED", "true").lower() == "true"
+SELLER_CACHE_TTL_HOURS = float(os.getenv("SELLER_CACHE_TTL_HOURS", "24") or 24)
+SELLER_CACHE_DB = os.path.join(CACHE_DIR, "seller_profiles.db")
+TASK_STATE_DB = os.path.join(CACHE_DIR, "task_state.db")
+DEDUP_INDEX_DB = os.path.join(CACHE_DIR, "dedup_index.db")
+
+# --- AI Verdict Cache ---
+# 按商品内容指纹 + prompt 指纹缓存 AI 分析结果，重新上架或重复发现的商品不再调用 AI
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+AI_CACHE_TTL_HOURS = float(os.getenv("AI_CACHE_TTL_HOURS", "72") or 72)
+AI_CACHE_MAX_ENTRIES = max(0, int(os.getenv("AI_CACHE_MAX_ENTRIES", "20000") or 0))
+AI_CACHE_DB = os.path.join(CACHE_DIR, "ai_verdicts.db")
+
+# --- Image Download ---
+IMAGE_DOWNLOAD_HTTP2 = os.getenv("IMAGE_DOWNLOAD_HTTP2", "true").lower() == "true"
+IMAGE_DOWNLOAD_CONCURRENCY_PER_HOST = max(1, int(os.getenv("IMAGE_DOWNLOAD_CONCURRENCY_PER_HOST", "4") or 4))
+IMAGE_DOWNLOAD_RETRIES = max(1, int(os.getenv("IMAGE_DOWNLOAD_RETRIES", "2") or 2))
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT", "20") or 20)
+# 单个商品所有图片的下载总时限（秒），0 表示不限制
+IMAGE_DOWNLOAD_BUDGET_SECONDS = float(os.getenv("IMAGE_DOWNLOAD_BUDGET_SECONDS", "60") or 0)
+# 不永久保存图片的 AI 任务直接在内存中下载图片（任务可通过 in_memory_images 单独配置），不落盘
+IMAGE_IN_MEMORY_ENABLED = os.getenv("IMAGE_IN_MEMORY_ENABLED", "true").lower() == "true"
+IMAGE_MEMORY_MAX_BYTES_PER_ITEM = int(float(os.getenv("IMAGE_MEMORY_MAX_MB_PER_ITEM", "16") or 0) * 1024 * 1024)
+
+# --- Image Store ---
+# 跨任务共享的图片库：按内容哈希保存，任务目录中的图片为指向图片库的硬链接
+IMAGE_STORE_ENABLED = os.getenv("IMAGE_STORE_ENABLED", "true").lower() == "true"
+IMAGE_STORE_DIR = os.path.join(IMAGE_SAVE_DIR, "store")
+IMAGE_STORE_DB = os.path.join(CACHE_DIR, "image_store.db")
+IMAGE_STORE_MAX_MB = float(os.getenv("IMAGE_STORE_MAX_MB", "2048") or 0)
+
+# --- AI Image Preprocessing ---
+# 发送给视觉模型前缩小并重新压缩图片，结果按图片内容哈希缓存
+AI_IMAGE_PREPROCESS_ENABLED = os.getenv("AI_IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+AI_IMAGE_MAX_EDGE = max(64, int(os.getenv("AI_IMAGE_MAX_EDGE", "1024") or 1024))
+AI_IMAGE_QUALITY = min(95, max(30, int(os.getenv("AI_IMAGE_QUALITY", "80") or 80)))
+AI_IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "ai_images")
+# 预处理结果缓存的总大小上限（MB），超出时按最近使用时间淘汰，0 表示不限制
+AI_IMAGE_CACHE_MAX_MB = max(0.0, float(os.getenv("AI_IMAGE_CACHE_MAX_MB", "500") or 0))
+# 每次请求最多发送的图片数（任务可通过 ai_image_budget 单独配置），0 表示不限制
+AI_IMAGE_BUDGET = max(0, int(os.getenv("AI_IMAGE_BUDGET", "0") or 0))
+# 近似重复图片的 dHash 汉明距离阈值，-1 表示不去重
+AI_IMAGE_DEDUP_DISTANCE = int(os.getenv("AI_IMAGE_DEDUP_DISTANCE", "6") or 6)
+
+# --- AI Payload ---
+# 发送精简后的商品数据（卖家商品/评价列表改为统计与最近 N 条），而不是完整记录
+AI_PAYLOAD_COMPACT = os.getenv("AI_PAYLOAD_COMPACT", "true").lower() == "true"
+# 商品数据的估算 token 预算（任务可通过 ai_payload_token_budget 单独配置），0 表示不限制
+AI_PAYLOAD_TOKEN_BUDGET = max(0, int(os.getenv("AI_PAYLOAD_TOKEN_BUDGET", "3000") or 0))
+# 消息布局: prefix 把不变的分析标准放在第一条 system 消息中，便于命中服务商的提示词缓存；legacy 为原布局
+AI_PROMPT_LAYOUT = os.getenv("AI_PROMPT_LAYOUT", "prefix").strip().lower()
+if AI_PROMPT_LAYOUT not in ("prefix", "legacy"):
+    AI_PROMPT_LAYOUT = "prefix"
+
+# --- AI Rate Limit ---
+# 所有爬虫进程共享的 AI 请求限流（SQLite），按服务域名分别计算，0 表示不限制
+AI_RATE_LIMIT_ENABLED = os.getenv("AI_RATE_LIMIT_ENABLED", "true").lower() == "true"
+AI_RATE_LIMIT_RPM = max(0, int(os.getenv("AI_RATE_LIMIT_RPM", "0") or 0))
+AI_RATE_LIMIT_TPM = max(0, int(os.getenv("AI_RATE_LIMIT_TPM", "0") or 0))
+AI_MAX_INFLIGHT = max(0, int(os.getenv("AI_MAX_INFLIGHT", "4") or 0))
+# 429 响应没有 Retry-After 时暂停请求的秒数
+AI_RATE_LIMIT_DEFAULT_BACKOFF = max(0.0, float(os.getenv("AI_RATE_LIMIT_DEFAULT_BACKOFF", "20") or 0))
+# 单个请求排队（含 429 后的等待）的最长时间（秒），超出后放弃该商品的分析，0 表示一直等待
+AI_RATE_LIMIT_MAX_WAIT_SECONDS = max(0.0, float(os.getenv("AI_RATE_LIMIT_MAX_WAIT_SECONDS", "300") or 0))
+AI_RATE_LIMIT_DB = os.path.join(CACHE_DIR, "ai_rate_limit.db")
+# 启用限流时 429 由限流器统一处理，关闭 openai 客户端自带的重试，避免各进程各自重试
+AI_CLIENT_MAX_RETRIES = 0 if AI_RATE_LIMIT_ENABLED else 2
+
 # --- Headers ---
 IMAGE_DOWNLOAD_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:139.0) Gecko/20100101 Firefox/139.0',
@@ -70,7 +153,7 @@ else:
             os.environ['HTTPS_PROXY'] = PROXY_URL
 
         # openai 客户端内部的 httpx 会自动从环境变量中获取代理配置
-        client = AsyncOpenAI(api_key=API_KEY, base_url=BASE_URL)
+        client = AsyncOpenAI(api_key=API_KEY, base_url=BASE_URL, max_retries=AI_CLIENT_MAX_RETRIES)
     except Exception as e:
         print(f"初始化 OpenAI 客户端时出错: {e}")
         client = None
@@ -82,6 +165,28 @@ if not client:
     # 为了保持一致性，这里只打印警告，具体逻辑由调用方处理
     pass
 
+# --- AI Screening ---
+# 两级分析：先用便宜的纯文本模型按简短标准初筛，明显不符合的商品不再调用多模态模型
+AI_SCREENING_ENABLED = os.getenv("AI_SCREENING_ENABLED", "false").lower() == "true"
+AI_SCREENING_MODEL_NAME = os.getenv("AI_SCREENING_MODEL_NAME", "").strip()
+AI_SCREENING_BASE_URL = os.getenv("AI_SCREENING_BASE_URL") or BASE_URL
+AI_SCREENING_API_KEY = os.getenv("AI_SCREENING_API_KEY") or API_KEY
+AI_SCREENING_TOKEN_BUDGET = max(0, int(os.getenv("AI_SCREENING_TOKEN_BUDGET", "800") or 0))
+# 大于 1 时按搜索结果页批量初筛，每次请求最多包含的商品数；0/1 表示逐个商品初筛
+AI_SCREENING_BATCH_SIZE = max(0, int(os.getenv("AI_SCREENING_BATCH_SIZE", "0") or 0))
+screening_client = None
+if AI_SCREENING_ENABLED:
+    if not all([AI_SCREENING_BASE_URL, AI_SCREENING_MODEL_NAME]):
+        print("警告：已启用 AI 初筛，但未设置 AI_SCREENING_MODEL_NAME（或服务地址），将不进行初筛。")
+    else:
+        try:
+            screening_client = AsyncOpenAI(
+                api_key=AI_SCREENING_API_KEY, base_url=AI_SCREENING_BASE_URL, max_retries=AI_CLIENT_MAX_RETRIES
+            )
+        except Exception as e:
+            print(f"初始化 AI 初筛客户端时出错: {e}")
+            screening_client = None
+
 # 检查关键配置
 if not all([BASE_URL, MODEL_NAME]) and 'prompt_generator.py' in sys.argv[0]:
     sys.exit("错误：请确保在 .env 文件中完整设置了 OPENAI_BASE_URL 和 OPENAI_MODEL_NAME。(OPENAI_API_KEY 对于某些服务是可选的)")
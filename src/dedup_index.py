@@ -0,0 +1,231 @@
+"""
+商品去重索引
+以 (关键词, 商品ID整数) 为主键保存在共享的 SQLite 中，替代任务启动时逐行解析整个
+jsonl/<keyword>_full_data.jsonl 来重建去重集合的做法。
+
+每次 save_to_jsonl 追加记录时同步写入索引，并记录已建立索引的文件偏移量；
+任务启动时只需补充偏移量之后新增的行（通常为 0 行）。
+
+重建已有文件的索引:
+  python -m src.dedup_index            # 重建 jsonl/ 下所有结果文件
+  python -m src.dedup_index "sony a7m4" # 只重建指定关键词
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from typing import Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from src.config import DEDUP_INDEX_DB
+from src.utils import connect_sqlite, get_link_unique_key
+
+
+RESULT_DIR = "jsonl"
+RESULT_SUFFIX = "_full_data.jsonl"
+
+
+def keyword_key(keyword: str) -> str:
+    """与结果文件名一致的关键词标识（空格替换为下划线）。"""
+    return keyword.replace(' ', '_')
+
+
+def result_file_path(keyword: str) -> str:
+    return os.path.join(RESULT_DIR, f"{keyword_key(keyword)}{RESULT_SUFFIX}")
+
+
+def item_key(link: str) -> int:
+    """将商品链接转换为整数键：优先使用链接中的商品 id，否则使用唯一标识的 63 位哈希。"""
+    unique_key = get_link_unique_key(link)
+    item_id = parse_qs(urlparse(unique_key).query).get("id", [""])[0]
+    if item_id.isdigit() and int(item_id) < 2 ** 63:
+        return int(item_id)
+    digest = hashlib.blake2b(unique_key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class DedupIndex:
+    """基于 SQLite 的去重索引，所有爬虫进程共享"""
+
+    def __init__(self, db_path: str = DEDUP_INDEX_DB):
+        self.db_path = db_path
+        self._conn = connect_sqlite(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seen_items (
+                keyword TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                PRIMARY KEY (keyword, item_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS indexed_files (
+                keyword TEXT PRIMARY KEY,
+                byte_offset INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def contains(self, keyword: str, link: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM seen_items WHERE keyword = ? AND item_id = ?",
+            (keyword_key(keyword), item_key(link)),
+        ).fetchone()
+        return row is not None
+
+    def add(self, keyword: str, link: str):
+        self.add_many(keyword, [link])
+
+    def add_many(self, keyword: str, links: Iterable[str]):
+        key = keyword_key(keyword)
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO seen_items(keyword, item_id) VALUES (?, ?)",
+            ((key, item_key(link)) for link in links if link),
+        )
+
+    def count(self, keyword: str) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM seen_items WHERE keyword = ?", (keyword_key(keyword),)
+        ).fetchone()[0]
+
+    def indexed_offset(self, keyword: str) -> int:
+        row = self._conn.execute(
+            "SELECT byte_offset FROM indexed_files WHERE keyword = ?", (keyword_key(keyword),)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def record_append(self, keyword: str, link: str, start: int, end: int):
+        """
+        记录一次结果文件追加。只有当追加位置紧接在已索引的偏移量之后时才推进偏移量，
+        否则（例如其他进程同时写入）保留原偏移量，由下一次 sync_file 补充索引。
+        """
+        key = keyword_key(keyword)
+        self.add(keyword, link)
+        self._conn.execute("INSERT OR IGNORE INTO indexed_files(keyword, byte_offset) VALUES (?, 0)", (key,))
+        self._conn.execute(
+            "UPDATE indexed_files SET byte_offset = ? WHERE keyword = ? AND byte_offset = ?",
+            (end, key, start),
+        )
+
+    def clear(self, keyword: str):
+        key = keyword_key(keyword)
+        self._conn.execute("BEGIN")
+        self._conn.execute("DELETE FROM seen_items WHERE keyword = ?", (key,))
+        self._conn.execute("DELETE FROM indexed_files WHERE keyword = ?", (key,))
+        self._conn.execute("COMMIT")
+
+    def sync_file(self, keyword: str, path: Optional[str] = None) -> int:
+        """
+        将结果文件中尚未建立索引的行补充到索引中，返回新增索引的行数。
+        文件被删除或截断时会先清空该关键词的索引。
+        """
+        path = path or result_file_path(keyword)
+        key = keyword_key(keyword)
+        offset = self.indexed_offset(keyword)
+        if not os.path.exists(path):
+            if offset:
+                self.clear(keyword)
+            return 0
+        if os.path.getsize(path) < offset:
+            self.clear(keyword)
+            offset = 0
+
+        links, lines = [], 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    # 另一个进程可能正在写入最后一行，留到下次再索引
+                    break
+                offset += len(raw_line)
+                lines += 1
+                try:
+                    link = json.loads(raw_line).get('商品信息', {}).get('商品链接', '')
+                except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                    print(f"   [警告] 文件中有一行无法解析为JSON，已跳过。")
+                    continue
+                if link:
+                    links.append(link)
+                if len(links) >= 5000:
+                    self.add_many(keyword, links)
+                    links = []
+        self.add_many(keyword, links)
+        self._conn.execute(
+            "INSERT INTO indexed_files(keyword, byte_offset) VALUES (?, ?) "
+            "ON CONFLICT(keyword) DO UPDATE SET byte_offset = MAX(byte_offset, excluded.byte_offset)",
+            (key, offset),
+        )
+        return lines
+
+    def rebuild(self, keyword: str, path: Optional[str] = None) -> int:
+        self.clear(keyword)
+        return self.sync_file(keyword, path)
+
+    def view(self, keyword: str) -> "KeywordDedupSet":
+        return KeywordDedupSet(self, keyword)
+
+
+class KeywordDedupSet:
+    """单个关键词的去重集合视图，支持 in / add / len，元素为商品链接或其唯一标识。"""
+
+    def __init__(self, index: DedupIndex, keyword: str):
+        self.index = index
+        self.keyword = keyword
+
+    def __contains__(self, link: str) -> bool:
+        return self.index.contains(self.keyword, link)
+
+    def add(self, link: str):
+        self.index.add(self.keyword, link)
+
+    def __len__(self) -> int:
+        return self.index.count(self.keyword)
+
+
+_shared_index: Optional[DedupIndex] = None
+
+
+def get_dedup_index() -> DedupIndex:
+    """获取进程内共享的去重索引连接。"""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = DedupIndex()
+    return _shared_index
+
+
+def open_keyword_index(keyword: str) -> Tuple[KeywordDedupSet, int, float]:
+    """补充该关键词结果文件的索引，返回 (去重视图, 新增索引行数, 耗时秒数)。"""
+    started = time.perf_counter()
+    index = get_dedup_index()
+    new_lines = index.sync_file(keyword)
+    return index.view(keyword), new_lines, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重建 jsonl 结果文件的去重索引")
+    parser.add_argument("keywords", nargs="*", help="要重建的关键词，留空则重建 jsonl/ 下所有结果文件")
+    args = parser.parse_args()
+
+    keywords = args.keywords or [
+        os.path.basename(path)[:-len(RESULT_SUFFIX)]
+        for path in sorted(glob.glob(os.path.join(RESULT_DIR, f"*{RESULT_SUFFIX}")))
+    ]
+    if not keywords:
+        print(f"未在 {RESULT_DIR}/ 下找到结果文件。")
+        return
+
+    index = get_dedup_index()
+    for keyword in keywords:
+        started = time.perf_counter()
+        lines = index.rebuild(keyword)
+        print(
+            f"{keyword_key(keyword)}: 索引 {lines} 行，共 {index.count(keyword)} 个商品，"
+            f"耗时 {time.perf_counter() - started:.2f} 秒。"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,22 @@ class Task(BaseModel):
     download_images: bool = True
     permanent_images: bool = False
     enable_ai_analysis: bool = True
+    detail_concurrency: int = 1
+    ai_concurrency: Optional[int] = None
+    profile_max_items: Optional[int] = None
+    profile_max_ratings: Optional[int] = None
+    profile_deadline_seconds: Optional[int] = None
+    profile_parallel_pages: Optional[bool] = None
+    stop_after_known_pages: Optional[int] = None
+    use_publish_watermark: Optional[bool] = None
+    filter_mode: Optional[str] = None
+    fetch_mode: Optional[str] = None
+    detail_fetch_mode: Optional[str] = None
+    capture_images: Optional[bool] = None
+    ai_image_budget: Optional[int] = None
+    in_memory_images: Optional[bool] = None
+    ai_payload_token_budget: Optional[int] = None
+    ai_screening: Optional[bool] = None
 
     class Config:
         use_enum_values = True
@@ -68,6 +84,22 @@ class TaskCreate(BaseModel):
     download_images: bool = True
     permanent_images: bool = False
     enable_ai_analysis: bool = True
+    detail_concurrency: int = 1
+    ai_concurrency: Optional[int] = None
+    profile_max_items: Optional[int] = None
+    profile_max_ratings: Optional[int] = None
+    profile_deadline_seconds: Optional[int] = None
+    profile_parallel_pages: Optional[bool] = None
+    stop_after_known_pages: Optional[int] = None
+    use_publish_watermark: Optional[bool] = None
+    filter_mode: Optional[str] = None
+    fetch_mode: Optional[str] = None
+    detail_fetch_mode: Optional[str] = None
+    capture_images: Optional[bool] = None
+    ai_image_budget: Optional[int] = None
+    in_memory_images: Optional[bool] = None
+    ai_payload_token_budget: Optional[int] = None
+    ai_screening: Optional[bool] = None
 
 
 class TaskUpdate(BaseModel):
@@ -88,6 +120,22 @@ class TaskUpdate(BaseModel):
     download_images: Optional[bool] = None
     permanent_images: Optional[bool] = None
     enable_ai_analysis: Optional[bool] = None
+    detail_concurrency: Optional[int] = None
+    ai_concurrency: Optional[int] = None
+    profile_max_items: Optional[int] = None
+    profile_max_ratings: Optional[int] = None
+    profile_deadline_seconds: Optional[int] = None
+    profile_parallel_pages: Optional[bool] = None
+    stop_after_known_pages: Optional[int] = None
+    use_publish_watermark: Optional[bool] = None
+    filter_mode: Optional[str] = None
+    fetch_mode: Optional[str] = None
+    detail_fetch_mode: Optional[str] = None
+    capture_images: Optional[bool] = None
+    ai_image_budget: Optional[int] = None
+    in_memory_images: Optional[bool] = None
+    ai_payload_token_budget: Optional[int] = None
+    ai_screening: Optional[bool] = None
 
 
 class TaskGenerateRequest(BaseModel):
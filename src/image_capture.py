@@ -0,0 +1,157 @@
+"""
+详情页商品图片捕获
+详情页渲染时已经加载了商品图片，无需在图片阶段重新下载。DetailImageCapture 挂在详情页上:
+  - 从详情API响应的 imageInfos 中得到本商品的图片列表；
+  - 在页面上只为这些图片的原图URL安装放行路由（页面路由优先于 context 上的资源拦截），
+    缩略图变体和其他图片仍被拦截，不会经代理下载后再被丢弃；
+  - 通过响应监听保存图片内容，交给 download_all_images 直接写入任务图片目录。
+页面通常加载的是缩小后的 WebP 缩略图，只有原图URL本身的响应、且内容格式与扩展名一致时才会保存，
+否则缩略图会被当作原图写入任务目录和图片库。未捕获到的图片仍由 download_all_images 下载。
+"""
+import asyncio
+import re
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from src.config import DETAIL_API_URL_PATTERN
+
+# 页面加载的是缩略图变体，如 xxx.jpg_790x10000Q90.jpg_.webp，按原图路径归一
+_ORIGINAL_IMAGE_PATH = re.compile(r"^(.*?\.(?:jpe?g|png|webp|gif|heic))(?:_.*)?$", re.IGNORECASE)
+
+
+_EXTENSION_FORMATS = {"jpg": "jpeg", "jpeg": "jpeg", "png": "png", "webp": "webp", "gif": "gif", "heic": "heic"}
+
+
+def _parse(url: str):
+    url = url.strip()
+    return urlparse(f"https:{url}" if url.startswith("//") else url)
+
+
+def image_key(url: str) -> str:
+    """图片URL的归一化标识：忽略协议、查询参数和缩略图后缀。"""
+    parsed = _parse(url)
+    match = _ORIGINAL_IMAGE_PATH.match(parsed.path)
+    path = match.group(1) if match else parsed.path
+    return f"{parsed.netloc}{path}"
+
+
+def is_original_image_url(url: str) -> bool:
+    """URL 路径是否为原图（没有 _790x10000Q90.jpg_.webp 这类缩略图后缀）。"""
+    match = _ORIGINAL_IMAGE_PATH.match(_parse(url).path)
+    return bool(match) and match.group(1) == match.group(0)
+
+
+def sniff_image_format(data: bytes) -> Optional[str]:
+    """根据文件头识别图片格式，返回 jpeg/png/gif/webp/heic，无法识别时返回 None。"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "heic"
+    return None
+
+
+def is_original_image(url: str, data: bytes) -> bool:
+    """响应是否为原图：URL 没有缩略图后缀，且内容格式与扩展名一致（CDN 可能按 Accept 返回 WebP）。"""
+    if not is_original_image_url(url):
+        return False
+    extension = _ORIGINAL_IMAGE_PATH.match(_parse(url).path).group(1).rsplit(".", 1)[-1].lower()
+    return sniff_image_format(data) == _EXTENSION_FORMATS.get(extension)
+
+
+class DetailImageCapture:
+    """捕获单个商品详情页中加载的商品图片"""
+
+    def __init__(self):
+        self.wanted = set()
+        self.images: Dict[str, bytes] = {}
+        self._complete = asyncio.Event()
+        self._arrived = asyncio.Event()
+        self._page = None
+        # 页面实际请求过的原图，只等待这些图片到达
+        self._requested = set()
+
+    def expect(self, image_urls: Iterable[str]):
+        self.wanted.update(image_key(url) for url in image_urls if url)
+        self._check_complete()
+
+    def expect_from_detail(self, detail_json: dict):
+        image_infos = (detail_json.get("data") or {}).get("itemDO", {}).get("imageInfos") or []
+        self.expect(info.get("url") for info in image_infos if isinstance(info, dict))
+
+    def _check_complete(self):
+        if self.wanted and self.wanted.issubset(self.images):
+            self._complete.set()
+
+    def _matches(self, url: str) -> bool:
+        return bool(self.wanted) and image_key(url) in self.wanted
+
+    def _should_route(self, url: str) -> bool:
+        return is_original_image_url(url) and self._matches(url)
+
+    async def _route(self, route):
+        self._requested.add(image_key(route.request.url))
+        await route.continue_()
+
+    async def on_response(self, response):
+        try:
+            if DETAIL_API_URL_PATTERN in response.url and not self.wanted:
+                self.expect_from_detail(await response.json())
+            elif (
+                response.request.resource_type == "image"
+                and self._matches(response.url)
+                and response.ok
+                and is_original_image_url(response.url)
+            ):
+                body = await response.body()
+                if not is_original_image(response.url, body):
+                    return
+                self.images[image_key(response.url)] = body
+                self._arrived.set()
+                self._check_complete()
+        except Exception:
+            pass
+
+    async def attach(self, page):
+        self._page = page
+        page.on("response", self.on_response)
+        await page.route(self._should_route, self._route)
+
+    async def detach(self):
+        page, self._page = self._page, None
+        if page is None:
+            return
+        page.remove_listener("response", self.on_response)
+        try:
+            await page.unroute(self._should_route, self._route)
+        except Exception:
+            pass
+
+    async def wait(self, timeout: float, idle: float = 1.0) -> int:
+        """
+        等待商品图片加载，返回已捕获的图片数。页面请求过的原图都已到达（页面没有请求原图时不等待）、
+        所有图片到齐、总计超过 timeout 秒，或连续 idle 秒没有新图片时停止等待。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.wanted and not self._complete.is_set() and not self._requested.issubset(self.images):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=min(idle, remaining))
+            except asyncio.TimeoutError:
+                break
+        return len(self.images)
+
+
+def captured_image(captured: Optional[Dict[str, bytes]], url: str) -> Optional[bytes]:
+    if not captured:
+        return None
+    return captured.get(image_key(url))
@@ -0,0 +1,214 @@
+"""
+商品图片下载器
+所有图片共享一个 httpx.AsyncClient（HTTP/2 + keep-alive 连接池），避免每张图片重新建立 TCP/TLS 连接；
+同一域名的并发数有上限，每张图片单独重试，下载内容以流式写入临时文件后再替换为目标文件，
+或（fetch_bytes）直接保存在内存中，并受单个商品的字节上限约束。
+未安装 h2 时自动退回 HTTP/1.1，并在首次创建下载器时提示一次。
+"""
+import asyncio
+import importlib.util
+import os
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from src.config import (
+    IMAGE_DOWNLOAD_CONCURRENCY_PER_HOST,
+    IMAGE_DOWNLOAD_HEADERS,
+    IMAGE_DOWNLOAD_HTTP2,
+    IMAGE_DOWNLOAD_RETRIES,
+    IMAGE_DOWNLOAD_TIMEOUT,
+)
+
+# 连接级请求头由 httpx 管理
+_REQUEST_HEADERS = {
+    key: value for key, value in IMAGE_DOWNLOAD_HEADERS.items() if key not in ("Connection", "Upgrade-Insecure-Requests")
+}
+
+
+_h2_missing_logged = False
+
+
+def _http2_available(requested: bool) -> bool:
+    global _h2_missing_logged
+    if not requested:
+        return False
+    if importlib.util.find_spec("h2") is not None:
+        return True
+    if not _h2_missing_logged:
+        _h2_missing_logged = True
+        print("   [图片] 已启用 IMAGE_DOWNLOAD_HTTP2，但未安装 h2（httpx[http2]），图片下载退回 HTTP/1.1。")
+    return False
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.HTTPError)
+
+
+class ImageBudgetExceeded(Exception):
+    """内存中的图片超过了单个商品的字节上限"""
+
+
+class ByteBudget:
+    """单个商品在内存中保存图片的字节上限，limit 为 0 表示不限制"""
+
+    def __init__(self, limit: int = 0):
+        self.limit = max(0, int(limit))
+        self.used = 0
+
+    def take(self, size: int):
+        if self.limit and self.used + size > self.limit:
+            raise ImageBudgetExceeded(f"超过单个商品 {self.limit // 1024} KB 的内存图片上限")
+        self.used += size
+
+    def release(self, size: int):
+        self.used = max(0, self.used - size)
+
+
+class ImageDownloader:
+    """共享连接池的异步图片下载器"""
+
+    def __init__(
+        self,
+        per_host: int = IMAGE_DOWNLOAD_CONCURRENCY_PER_HOST,
+        retries: int = IMAGE_DOWNLOAD_RETRIES,
+        timeout: float = IMAGE_DOWNLOAD_TIMEOUT,
+        retry_delay: float = 1.0,
+        http2: bool = IMAGE_DOWNLOAD_HTTP2,
+    ):
+        self.per_host = max(1, per_host)
+        self.retries = max(1, retries)
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.http2 = _http2_available(http2)
+        self._client = httpx.AsyncClient(
+            http2=self.http2,
+            headers=_REQUEST_HEADERS,
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.per_host * 4, max_keepalive_connections=self.per_host * 2),
+        )
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.downloaded = 0
+        self.bytes_downloaded = 0
+
+    async def close(self):
+        await self._client.aclose()
+
+    def _slot(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self._host_slots[host]
+
+    async def _stream_to_file(self, url: str, save_path: str, timeout: float) -> int:
+        temp_path = f"{save_path}.part"
+        written = 0
+        try:
+            async with self._client.stream("GET", url, timeout=timeout) as response:
+                response.raise_for_status()
+                with open(temp_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(64 * 1024):
+                        f.write(chunk)
+                        written += len(chunk)
+            os.replace(temp_path, save_path)
+            return written
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def _stream_to_memory(self, url: str, timeout: float, budget: ByteBudget) -> bytes:
+        chunks = []
+        taken = 0
+        try:
+            async with self._client.stream("GET", url, timeout=timeout) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    budget.take(len(chunk))
+                    taken += len(chunk)
+                    chunks.append(chunk)
+            return b"".join(chunks)
+        except BaseException:
+            budget.release(taken)
+            raise
+
+    async def fetch(self, url: str, save_path: str, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        下载单张图片到 save_path，成功返回路径。deadline 为 time.monotonic() 时间点，
+        超过后不再重试；每次尝试的超时也不会超过剩余时间。
+        """
+        size = await self._with_retries(url, deadline, lambda timeout: self._stream_to_file(url, save_path, timeout))
+        self.bytes_downloaded += size
+        return save_path
+
+    async def fetch_bytes(
+        self, url: str, deadline: Optional[float] = None, budget: Optional[ByteBudget] = None
+    ) -> bytes:
+        """下载单张图片到内存；超过 budget 时抛出 ImageBudgetExceeded（不重试）。"""
+        budget = budget or ByteBudget()
+        data = await self._with_retries(url, deadline, lambda timeout: self._stream_to_memory(url, timeout, budget))
+        self.bytes_downloaded += len(data)
+        return data
+
+    async def _with_retries(self, url: str, deadline: Optional[float], attempt_once):
+        last_error: Optional[Exception] = None
+        for attempt in range(1, self.retries + 1):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+            try:
+                async with self._slot(url):
+                    result = await attempt_once(timeout)
+                self.downloaded += 1
+                return result
+            except Exception as e:
+                last_error = e
+                if not _retryable(e) or attempt == self.retries:
+                    break
+                print(f"   [图片] 下载 {url} 第 {attempt}/{self.retries} 次失败: {type(e).__name__} - {e}，稍后重试...")
+                await asyncio.sleep(self.retry_delay * attempt)
+        if last_error is None:
+            raise TimeoutError("超过单个商品的图片下载时限")
+        raise last_error
+
+
+_shared: Optional[ImageDownloader] = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+# 同一事件循环中登记使用共享下载器的任务数（spider_v2 在一个事件循环中并发运行所有任务）
+_shared_users = 0
+
+
+def get_image_downloader() -> ImageDownloader:
+    """获取当前事件循环共享的下载器（连接池只能在创建它的事件循环中使用）。"""
+    global _shared, _shared_loop, _shared_users
+    loop = asyncio.get_running_loop()
+    if _shared is None or _shared_loop is not loop:
+        if _shared_loop is not loop:
+            _shared_users = 0
+        _shared, _shared_loop = ImageDownloader(), loop
+    return _shared
+
+
+def hold_image_downloader():
+    """任务开始时登记使用共享下载器，结束时调用 close_image_downloader 释放。"""
+    global _shared_users
+    get_image_downloader()
+    _shared_users += 1
+
+
+async def close_image_downloader():
+    """释放一次登记；同一事件循环中仍有其他任务在使用时不关闭连接池。"""
+    global _shared, _shared_loop, _shared_users
+    if _shared_loop is asyncio.get_running_loop():
+        _shared_users = max(0, _shared_users - 1)
+        if _shared_users:
+            return
+        if _shared is not None:
+            await _shared.close()
+    _shared, _shared_loop, _shared_users = None, None, 0
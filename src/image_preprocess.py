@@ -0,0 +1,214 @@
+"""
+发送给视觉模型前的图片预处理
+原图往往是数 MB 的 JPEG/HEIC，直接 Base64 编码会增大请求体、上传耗时和图片 token 消耗。
+这里把图片等比缩小到最长边不超过 AI_IMAGE_MAX_EDGE，并以 AI_IMAGE_QUALITY 重新编码为 JPEG；
+图片文件的处理结果按 (图片内容哈希, 最长边, 质量) 缓存在 cache/ai_images/ 中，同一图片只处理一次，
+缓存总大小超过 AI_IMAGE_CACHE_MAX_MB 时按最近使用时间（命中时刷新文件修改时间）淘汰；
+内存中的图片（见 download_images_to_memory）直接处理，不读写磁盘。
+原样发送的图片按 Pillow 识别出的实际格式标注 MIME 类型。
+"""
+import base64
+import hashlib
+import io
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.config import (
+    AI_IMAGE_CACHE_DIR,
+    AI_IMAGE_CACHE_MAX_MB,
+    AI_IMAGE_MAX_EDGE,
+    AI_IMAGE_PREPROCESS_ENABLED,
+    AI_IMAGE_QUALITY,
+    MODEL_NAME,
+)
+from src.image_capture import sniff_image_format
+
+
+@dataclass
+class PreparedImage:
+    """一张准备发送给视觉模型的图片"""
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    original_size: Optional[Tuple[int, int]]
+    size: Optional[Tuple[int, int]]
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+    @property
+    def original_tokens(self) -> int:
+        return estimate_image_tokens(*self.original_size) if self.original_size else 0
+
+    @property
+    def tokens(self) -> int:
+        return estimate_image_tokens(*self.size) if self.size else 0
+
+
+def estimate_image_tokens(width: int, height: int, model: str = MODEL_NAME) -> int:
+    """
+    估算一张图片的输入 token：
+      - Gemini: 两边都不超过 384 时为 258，否则按 768x768 分块，每块 258；
+      - 其他（OpenAI high detail 规则）: 先缩放到 2048x2048 以内，再把短边缩放到 768，
+        按 512x512 分块，每块 170，另加 85。
+    """
+    if width <= 0 or height <= 0:
+        return 0
+    if "gemini" in (model or "").lower():
+        if width <= 384 and height <= 384:
+            return 258
+        return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 170 * math.ceil(width / 512) * math.ceil(height / 512) + 85
+
+
+# 每个进程第一次写入缓存时以及之后每写入这么多个文件时检查一次缓存总大小
+CACHE_EVICT_EVERY = 50
+_writes_since_evict = 0
+
+
+def _cache_path(sha256: str, max_edge: int, quality: int) -> str:
+    return os.path.join(AI_IMAGE_CACHE_DIR, sha256[:2], f"{sha256}_{max_edge}_q{quality}.jpg")
+
+
+def evict_cache(max_bytes: float = AI_IMAGE_CACHE_MAX_MB * 1024 * 1024) -> int:
+    """按修改时间淘汰最旧的缓存文件直到总大小不超过 max_bytes，返回淘汰的文件数；max_bytes 为 0 时不限制。"""
+    if max_bytes <= 0 or not os.path.isdir(AI_IMAGE_CACHE_DIR):
+        return 0
+    entries = []
+    for directory, _, names in os.walk(AI_IMAGE_CACHE_DIR):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"   [AI图片] 删除缓存 {path} 失败: {e}")
+            continue
+        total -= size
+        evicted += 1
+    return evicted
+
+
+def _identify(data: bytes) -> Tuple[Optional[Tuple[int, int]], str]:
+    """返回 (尺寸, MIME 类型)；Pillow 无法识别时尺寸为 None，MIME 类型按文件头判断。"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size, Image.MIME.get(image.format, "image/jpeg")
+    except (UnidentifiedImageError, OSError):
+        sniffed = sniff_image_format(data)
+        return None, f"image/{sniffed}" if sniffed else "application/octet-stream"
+
+
+def _open_size(data: bytes) -> Optional[Tuple[int, int]]:
+    return _identify(data)[0]
+
+
+def _reencode(data: bytes, max_edge: int, quality: int) -> Tuple[bytes, Tuple[int, int]]:
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue(), image.size
+
+
+def prepare_image_bytes(
+    data: bytes, max_edge: int = AI_IMAGE_MAX_EDGE, quality: int = AI_IMAGE_QUALITY
+) -> PreparedImage:
+    """在内存中缩小并重新压缩一张图片，不读写磁盘缓存；无法识别的格式原样返回。"""
+    original_size, mime_type = _identify(data)
+    if original_size is None or not AI_IMAGE_PREPROCESS_ENABLED:
+        return PreparedImage(data, mime_type, len(data), original_size, original_size)
+    encoded, size = _reencode(data, max_edge, quality)
+    if len(encoded) >= len(data) and size == original_size:
+        return PreparedImage(data, mime_type, len(data), original_size, original_size)
+    return PreparedImage(encoded, "image/jpeg", len(data), original_size, size)
+
+
+def prepare_image(
+    path: str, max_edge: int = AI_IMAGE_MAX_EDGE, quality: int = AI_IMAGE_QUALITY
+) -> Optional[PreparedImage]:
+    """缩小并重新压缩一张图片文件；Pillow 无法识别的格式（如未安装解码插件的 HEIC）原样返回。"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    original_size, mime_type = _identify(data)
+    if original_size is None or not AI_IMAGE_PREPROCESS_ENABLED:
+        return PreparedImage(data, mime_type, len(data), original_size, original_size)
+
+    cache_path = _cache_path(hashlib.sha256(data).hexdigest(), max_edge, quality)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = f.read()
+        # 刷新修改时间，淘汰时按最近使用排序
+        os.utime(cache_path)
+        return PreparedImage(cached, "image/jpeg", len(data), original_size, _open_size(cached))
+    except FileNotFoundError:
+        pass
+
+    prepared = prepare_image_bytes(data, max_edge, quality)
+    if prepared.data is data:
+        # 原图已足够小，重新压缩没有收益
+        return prepared
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(prepared.data)
+    os.replace(temp_path, cache_path)
+
+    global _writes_since_evict
+    if _writes_since_evict % CACHE_EVICT_EVERY == 0:
+        evict_cache()
+    _writes_since_evict += 1
+    return prepared
+
+
+def prepare_images(sources: List[Union[str, bytes]]) -> List[PreparedImage]:
+    """sources 中的每一项可以是图片文件路径，也可以是内存中的图片内容。"""
+    prepared = []
+    for index, source in enumerate(sources or []):
+        try:
+            image = prepare_image_bytes(source) if isinstance(source, bytes) else prepare_image(source)
+        except Exception as e:
+            label = source if isinstance(source, str) else f"#{index + 1}"
+            print(f"   [AI图片] 预处理图片 {label} 失败，已跳过: {e}")
+            continue
+        if image is not None:
+            prepared.append(image)
+    return prepared
+
+
+def summarize(prepared: List[PreparedImage]) -> str:
+    """本次请求中图片的体积与估算 token 变化。"""
+    original_bytes = sum(image.original_bytes for image in prepared)
+    sent_bytes = sum(len(image.data) for image in prepared)
+    original_tokens = sum(image.original_tokens for image in prepared)
+    tokens = sum(image.tokens for image in prepared)
+    return (
+        f"{len(prepared)} 张图片 {original_bytes / 1024:.0f} KB → {sent_bytes / 1024:.0f} KB，"
+        f"估算图片 token {original_tokens} → {tokens}（节省 {original_tokens - tokens}）"
+    )
@@ -0,0 +1,101 @@
+"""
+发送给视觉模型的图片挑选
+商品图片中常有连拍的近似图、同一角度的重复图。这里对预处理后的图片计算差值哈希（dHash），
+汉明距离不超过 AI_IMAGE_DEDUP_DISTANCE 的视为近似重复，只保留先出现的一张；
+剩余图片仍超过图片预算时保留首图（封面），其余按灰度直方图信息熵从高到低挑选。
+被丢弃的图片及原因会返回给调用方记录。
+"""
+import hashlib
+import io
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image, UnidentifiedImageError
+
+from src.config import AI_IMAGE_DEDUP_DISTANCE
+from src.image_preprocess import PreparedImage
+
+
+@dataclass
+class DroppedImage:
+    index: int
+    reason: str
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """差值哈希：缩放到 (hash_size+1) x hash_size 的灰度图，比较相邻像素的明暗。"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def image_fingerprints(sources: List[Union[str, bytes]]) -> List[str]:
+    """
+    计算图片文件或内存图片的 dHash（十六进制），用于识别重新上架的同一商品；
+    无法解码的图片退回内容的 SHA-256 前缀。
+    """
+    fingerprints = []
+    for source in sources or []:
+        if isinstance(source, bytes):
+            data = source
+        else:
+            try:
+                with open(source, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.draft("L", (64, 64))
+                fingerprints.append(f"{dhash(image):016x}")
+        except (UnidentifiedImageError, OSError):
+            fingerprints.append(hashlib.sha256(data).hexdigest()[:16])
+    return fingerprints
+
+
+def _fingerprint(prepared: PreparedImage) -> Tuple[Optional[int], float]:
+    """返回 (dHash, 信息熵)；无法解码的图片返回 (None, 0)。"""
+    try:
+        with Image.open(io.BytesIO(prepared.data)) as image:
+            return dhash(image), image.convert("L").entropy()
+    except (UnidentifiedImageError, OSError):
+        return None, 0.0
+
+
+def select_images(
+    prepared: List[PreparedImage], budget: int = 0, max_distance: int = AI_IMAGE_DEDUP_DISTANCE
+) -> Tuple[List[PreparedImage], List[DroppedImage]]:
+    """
+    挑选要发送的图片，保持原有顺序。
+    budget 为 0 表示不限制数量；max_distance 小于 0 表示不去重。
+    """
+    fingerprints = [_fingerprint(image) for image in prepared]
+    dropped: List[DroppedImage] = []
+    kept: List[int] = []
+    for index, (hash_value, _) in enumerate(fingerprints):
+        duplicate_of = None
+        if hash_value is not None and max_distance >= 0:
+            for kept_index in kept:
+                kept_hash = fingerprints[kept_index][0]
+                if kept_hash is not None and bin(hash_value ^ kept_hash).count("1") <= max_distance:
+                    duplicate_of = kept_index
+                    break
+        if duplicate_of is None:
+            kept.append(index)
+        else:
+            dropped.append(DroppedImage(index, f"与第{duplicate_of + 1}张近似"))
+
+    if budget > 0 and len(kept) > budget:
+        cover, rest = kept[0], kept[1:]
+        rest.sort(key=lambda index: fingerprints[index][1], reverse=True)
+        for index in rest[budget - 1:]:
+            dropped.append(DroppedImage(index, "超出图片预算"))
+        kept = sorted([cover] + rest[:budget - 1])
+
+    dropped.sort(key=lambda item: item.index)
+    return [prepared[index] for index in kept], dropped
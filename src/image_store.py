@@ -0,0 +1,237 @@
+"""
+跨任务共享的图片库
+图片按内容的 SHA-256 保存在 images/store/objects/<前两位>/<哈希><扩展名>，索引保存在共享的 SQLite 中:
+  - blobs: 内容哈希 → 文件路径、大小、最近使用时间
+  - urls:  归一化图片URL → 内容哈希
+任务目录（images/task_images_<任务名>/）中的图片是指向图片库的硬链接（跨文件系统时退回复制），
+因此清理任务目录不会删除图片库中的内容，同一张图片被多个任务或多次运行发现时也只下载一次。
+图片库总大小超过 IMAGE_STORE_MAX_MB 时按最近使用时间淘汰最旧的图片。仍被任务目录硬链接引用的图片
+（如 permanent_images 任务）删除后并不释放磁盘空间，淘汰时按链接数（st_nlink）跳过，
+因此上限约束的是图片库实际占用的磁盘空间；这些图片在任务目录清理后才会被淘汰。
+所有方法都可以在线程中调用（asyncio.to_thread），同一连接上的操作由锁串行化。
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Optional, Tuple
+
+from src.config import IMAGE_STORE_DB, IMAGE_STORE_DIR, IMAGE_STORE_ENABLED, IMAGE_STORE_MAX_MB
+from src.image_capture import image_key
+from src.utils import connect_sqlite, log_time
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source: str, dest: str):
+    """把 source 以硬链接（失败时复制）的方式原子地放到 dest。"""
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    temp_path = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, dest)
+
+
+class ImageStore:
+    """内容寻址的图片库，所有爬虫进程共享"""
+
+    def __init__(
+        self,
+        root: str = IMAGE_STORE_DIR,
+        db_path: str = IMAGE_STORE_DB,
+        max_bytes: float = IMAGE_STORE_MAX_MB * 1024 * 1024,
+    ):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.reused = 0
+        self.added = 0
+        self._linked_warned = False
+        self._lock = threading.RLock()
+        self._conn = connect_sqlite(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_last_used ON blobs(last_used);
+            CREATE TABLE IF NOT EXISTS urls (
+                url_key TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_urls_sha256 ON urls(sha256);
+            """
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def _blob_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}{ext}")
+
+    def _forget(self, sha256: str):
+        self._conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        self._conn.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+
+    def _lookup(self, url: str) -> Optional[Tuple[str, str]]:
+        row = self._conn.execute(
+            "SELECT b.sha256, b.path FROM urls u JOIN blobs b ON b.sha256 = u.sha256 WHERE u.url_key = ?",
+            (image_key(url),),
+        ).fetchone()
+        if not row:
+            return None
+        sha256, path = row
+        if not os.path.exists(path):
+            self._forget(sha256)
+            return None
+        self._conn.execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), sha256))
+        return sha256, path
+
+    def lookup(self, url: str) -> Optional[str]:
+        """返回该图片URL在图片库中的文件路径，并刷新其最近使用时间；不存在时返回 None。"""
+        with self._lock:
+            found = self._lookup(url)
+        return found[1] if found else None
+
+    def materialize(self, url: str, dest: str) -> bool:
+        """
+        图片库中已有该图片时在 dest 创建链接并返回 True。
+        文件在查询后被其他进程淘汰时视为未命中，并删除失效的索引。
+        """
+        with self._lock:
+            found = self._lookup(url)
+            if found is None:
+                return False
+            try:
+                _link_or_copy(found[1], dest)
+            except FileNotFoundError:
+                self._forget(found[0])
+                return False
+            self.reused += 1
+            return True
+
+    def read(self, url: str) -> Optional[bytes]:
+        """读取图片库中该图片的内容；不存在或已被其他进程淘汰时返回 None。"""
+        with self._lock:
+            found = self._lookup(url)
+            if found is None:
+                return None
+            try:
+                with open(found[1], "rb") as f:
+                    body = f.read()
+            except FileNotFoundError:
+                self._forget(found[0])
+                return None
+            self.reused += 1
+            return body
+
+    def adopt(self, url: str, path: str) -> str:
+        """
+        把刚下载（或从详情页捕获）的图片文件收入图片库，返回内容哈希。
+        内容已存在时 path 改为指向已有文件的链接，否则把 path 链接进图片库。
+        """
+        sha256 = file_sha256(path)
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row and os.path.exists(row[0]):
+                _link_or_copy(row[0], path)
+                blob_path = row[0]
+            else:
+                blob_path = self._blob_path(sha256, os.path.splitext(path)[1].lower() or ".jpg")
+                _link_or_copy(path, blob_path)
+                self.added += 1
+            self._conn.execute(
+                "INSERT INTO blobs(sha256, path, size, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET path = excluded.path, last_used = excluded.last_used",
+                (sha256, blob_path, os.path.getsize(blob_path), time.time()),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls(url_key, sha256) VALUES (?, ?)", (image_key(url), sha256)
+            )
+            self.evict()
+            return sha256
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self) -> int:
+        """
+        淘汰最久未使用的图片直到总大小不超过上限，返回淘汰的图片数。
+        仍有其他硬链接（任务目录引用）的图片删除后不释放空间，跳过不淘汰。
+        """
+        if not self.max_bytes:
+            return 0
+        with self._lock:
+            total = self.total_bytes()
+            if total <= self.max_bytes:
+                return 0
+            evicted = 0
+            rows = self._conn.execute("SELECT sha256, path, size FROM blobs ORDER BY last_used ASC").fetchall()
+            for sha256, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    if os.stat(path).st_nlink > 1:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"   [图片库] 删除 {path} 失败: {e}")
+                    continue
+                self._forget(sha256)
+                total -= size
+                evicted += 1
+            if total > self.max_bytes and not self._linked_warned:
+                self._linked_warned = True
+                print(
+                    f"   [图片库] 图片库 {total / 1024 / 1024:.1f} MB 仍超过上限，剩余图片被任务目录引用，"
+                    "清理任务目录（或关闭 permanent_images）后才能释放空间。"
+                )
+            return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            blobs, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {"blobs": blobs, "bytes": total, "reused": self.reused, "added": self.added}
+
+
+_shared_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> Optional[ImageStore]:
+    """获取进程内共享的图片库；未启用或打开失败时返回 None。"""
+    global _shared_store
+    if not IMAGE_STORE_ENABLED:
+        return None
+    if _shared_store is None:
+        try:
+            _shared_store = ImageStore()
+        except Exception as e:
+            print(f"   [警告] 打开图片库失败，将不使用图片库: {e}")
+            return None
+    return _shared_store
+
+
+def log_image_store_stats():
+    """输出本次运行的图片库复用情况（本进程未使用图片库时不输出）。"""
+    if _shared_store is None:
+        return
+    stats = _shared_store.stats()
+    log_time(
+        f"[图片库] 本次复用 {stats['reused']} 张，新增 {stats['added']} 张；"
+        f"图片库共 {stats['blobs']} 张，{stats['bytes'] / 1024 / 1024:.1f} MB。"
+    )
@@ -0,0 +1,152 @@
+"""
+mtop 接口工具
+闲鱼网页端通过 h5api.m.goofish.com 的 mtop 接口获取数据。请求签名规则:
+  sign = md5(token + "&" + t + "&" + appKey + "&" + data)
+其中 token 为 Cookie `_m_h5_tk` 中下划线之前的部分，t 为毫秒时间戳，data 为请求体中的 JSON 字符串。
+"""
+import hashlib
+import json
+import time
+from typing import Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urlparse, urlunparse
+
+MTOP_APP_KEY = "34839810"
+MTOP_TOKEN_COOKIE = "_m_h5_tk"
+SEARCH_API_ROUTE = "**/h5/mtop.taobao.idlemtopsearch.pc.search/**"
+
+
+def get_mtop_token(cookies: Iterable[dict]) -> Optional[str]:
+    """从 Cookie 列表（Playwright / storage_state 格式）中取出签名使用的 token。"""
+    for cookie in cookies:
+        if cookie.get("name") == MTOP_TOKEN_COOKIE and cookie.get("value"):
+            return cookie["value"].split("_", 1)[0]
+    return None
+
+
+def mtop_sign(token: str, timestamp: str, data: str, app_key: str = MTOP_APP_KEY) -> str:
+    return hashlib.md5(f"{token}&{timestamp}&{app_key}&{data}".encode("utf-8")).hexdigest()
+
+
+def build_mtop_query(api: str, token: str, data: str, version: str = "1.0", timestamp: Optional[str] = None) -> dict:
+    """构建调用 mtop 接口的查询参数（含签名），data 为请求体中的 JSON 字符串。"""
+    timestamp = timestamp or str(int(time.time() * 1000))
+    return {
+        "jsv": "2.7.2",
+        "appKey": MTOP_APP_KEY,
+        "t": timestamp,
+        "sign": mtop_sign(token, timestamp, data),
+        "v": version,
+        "type": "originaljson",
+        "accountSite": "xianyu",
+        "dataType": "json",
+        "timeout": "20000",
+        "api": api,
+        "sessionOption": "AutoLoginOnly",
+    }
+
+
+def build_search_filter(
+    personal_only: bool = False,
+    min_price: Optional[str] = None,
+    max_price: Optional[str] = None,
+) -> dict:
+    """
+    构建与界面筛选等价的搜索请求参数：按发布时间倒序（“新发布 → 最新”），
+    “个人闲置”与价格区间写入 propValueStr.searchFilter。
+    """
+    search_filter = ""
+    if min_price or max_price:
+        search_filter += f"priceRange:{min_price or 0},{max_price or ''};"
+    if personal_only:
+        search_filter += "quickFilter:filterPersonal;"
+    overrides = {"sortField": "create", "sortValue": "desc", "fromFilter": True}
+    if search_filter:
+        overrides["propValueStr"] = {"searchFilter": search_filter}
+    return overrides
+
+
+def apply_search_filter(data: dict, overrides: dict) -> dict:
+    """把筛选参数合并进原始搜索请求的 data，保留页码、关键词等其他字段。"""
+    merged = dict(data)
+    for key, value in overrides.items():
+        if key == "propValueStr":
+            current = merged.get(key) or {}
+            # 保持原请求中该字段的类型（对象或 JSON 字符串）
+            if isinstance(current, str):
+                try:
+                    decoded = json.loads(current) if current else {}
+                except json.JSONDecodeError:
+                    decoded = {}
+                merged[key] = json.dumps({**decoded, **value}, ensure_ascii=False, separators=(",", ":"))
+            else:
+                merged[key] = {**current, **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def rewrite_mtop_request(
+    url: str, post_data: Optional[str], overrides: dict, token: str
+) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    改写一个 mtop 请求的 data 并重新签名，返回 (新URL, 新请求体)。
+    data 可能位于 POST 表单或 URL 查询参数中；都没有或无法解析时返回 None。
+    """
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+    form = dict(parse_qsl(post_data or "", keep_blank_values=True))
+    container = form if form.get("data") else query
+    raw_data = container.get("data")
+    if not raw_data:
+        return None
+    try:
+        data = json.loads(raw_data)
+    except json.JSONDecodeError:
+        return None
+
+    new_data = json.dumps(apply_search_filter(data, overrides), ensure_ascii=False, separators=(",", ":"))
+    container["data"] = new_data
+    timestamp = query.get("t") or str(int(time.time() * 1000))
+    query["t"] = timestamp
+    query["sign"] = mtop_sign(token, timestamp, new_data, query.get("appKey", MTOP_APP_KEY))
+    new_url = urlunparse(parsed._replace(query=urlencode(query, quote_via=quote)))
+    new_body = urlencode(form, quote_via=quote) if container is form else post_data
+    return new_url, new_body
+
+
+def response_succeeded(payload: dict) -> bool:
+    """mtop 返回的 ret 以 SUCCESS 开头表示调用成功。"""
+    ret = payload.get("ret") or []
+    return bool(ret) and str(ret[0]).startswith("SUCCESS")
+
+
+class SearchFilterRoute:
+    """
+    拦截页面发出的搜索接口请求，写入筛选参数并重新签名，
+    使搜索页首次加载即返回筛选后的结果（替代逐个点击筛选项）。
+    """
+
+    def __init__(self, context, overrides: dict):
+        self.context = context
+        self.overrides = overrides
+        self.rewritten = 0
+
+    async def handle(self, route):
+        request = route.request
+        try:
+            token = get_mtop_token(await self.context.cookies())
+            rewritten = rewrite_mtop_request(request.url, request.post_data, self.overrides, token) if token else None
+        except Exception:
+            rewritten = None
+        if rewritten is None:
+            await route.continue_()
+            return
+        url, post_data = rewritten
+        self.rewritten += 1
+        await route.continue_(url=url, post_data=post_data)
+
+    async def install(self, page):
+        await page.route(SEARCH_API_ROUTE, self.handle)
+
+    async def remove(self, page):
+        await page.unroute(SEARCH_API_ROUTE, self.handle)
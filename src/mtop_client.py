@@ -0,0 +1,182 @@
+"""
+无浏览器的 mtop 接口客户端
+直接复用 state/ 下登录状态文件（Playwright storage_state）中的 Cookie，
+按网页端相同的规则签名后调用搜索、商品详情和用户主页接口，返回的 JSON 交给 src/parsers.py 解析。
+Token（_m_h5_tk）过期时接口会通过 Set-Cookie 下发新的 token，客户端自动重试一次；
+登录会话失效时抛出 MtopSessionError，由调用方回退到浏览器模式。
+"""
+import json
+from typing import Optional
+
+import httpx
+
+from src.browser import CONTEXT_OPTIONS
+from src.mtop import MTOP_TOKEN_COOKIE, apply_search_filter, build_mtop_query, get_mtop_token, response_succeeded
+
+MTOP_BASE_URL = "https://h5api.m.goofish.com"
+
+SEARCH_API = "mtop.taobao.idlemtopsearch.pc.search"
+DETAIL_API = "mtop.taobao.idle.pc.detail"
+USER_HEAD_API = "mtop.idle.web.user.page.head"
+USER_ITEMS_API = "mtop.idle.web.xyh.item.list"
+USER_RATINGS_API = "mtop.idle.web.trade.rate.list"
+
+# token 过期或缺失：响应中已带有新的 _m_h5_tk，重新签名即可
+TOKEN_RETRY_CODES = ("FAIL_SYS_TOKEN_EXOIRED", "FAIL_SYS_TOKEN_EMPTY", "FAIL_SYS_TOKEN_ILLEGAL")
+# 登录会话失效：需要浏览器重新建立会话
+SESSION_EXPIRED_CODES = ("FAIL_SYS_SESSION_EXPIRED", "FAIL_SYS_ILLEGAL_ACCESS", "SESSION_EXPIRED")
+
+REQUEST_HEADERS = {
+    "Referer": "https://www.goofish.com/",
+    "Origin": "https://www.goofish.com",
+    "Accept": "application/json",
+}
+
+
+class MtopSessionError(Exception):
+    """登录会话失效或签名无法通过，需要使用浏览器刷新会话。"""
+
+
+def load_storage_cookies(state_file: str) -> httpx.Cookies:
+    """读取 Playwright storage_state 文件中的 Cookie。"""
+    with open(state_file, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    cookies = httpx.Cookies()
+    for cookie in state.get("cookies", []):
+        if cookie.get("name") and cookie.get("value") is not None:
+            cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    return cookies
+
+
+def _ret_text(payload: dict) -> str:
+    return " ".join(str(ret) for ret in payload.get("ret") or [])
+
+
+async def call_mtop_in_context(context, api: str, data: dict, version: str = "1.0", base_url: str = MTOP_BASE_URL) -> dict:
+    """
+    通过 BrowserContext.request 调用 mtop 接口：与浏览器共享 Cookie，但不打开页面、不渲染。
+    响应中下发的新 token 会写回 context 的 Cookie，token 过期时重新签名重试一次。
+    """
+    data_text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    payload = {}
+    for _ in range(2):
+        token = get_mtop_token(await context.cookies(base_url)) or ""
+        response = await context.request.post(
+            f"{base_url}/h5/{api}/{version}/",
+            params=build_mtop_query(api, token, data_text, version),
+            form={"data": data_text},
+            headers=REQUEST_HEADERS,
+        )
+        if not response.ok:
+            raise RuntimeError(f"{api}: HTTP {response.status}")
+        payload = await response.json()
+        if response_succeeded(payload) or not any(code in _ret_text(payload) for code in TOKEN_RETRY_CODES):
+            return payload
+    return payload
+
+
+class MtopClient:
+    """基于 httpx 连接池的 mtop 接口客户端"""
+
+    def __init__(
+        self,
+        state_file: Optional[str] = None,
+        base_url: str = MTOP_BASE_URL,
+        proxy: Optional[str] = None,
+        timeout: float = 20.0,
+        cookies: Optional[httpx.Cookies] = None,
+    ):
+        if cookies is None:
+            cookies = load_storage_cookies(state_file) if state_file else httpx.Cookies()
+        client_kwargs = {
+            "base_url": base_url,
+            "cookies": cookies,
+            "timeout": timeout,
+            "limits": httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            "headers": {"User-Agent": CONTEXT_OPTIONS["user_agent"], **REQUEST_HEADERS},
+        }
+        if proxy:
+            client_kwargs["proxy"] = proxy
+        self._client = httpx.AsyncClient(**client_kwargs)
+        self.calls = 0
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _token(self) -> str:
+        for cookie in self._client.cookies.jar:
+            if cookie.name == MTOP_TOKEN_COOKIE and cookie.value:
+                return cookie.value.split("_", 1)[0]
+        return ""
+
+    def _drop_replaced_tokens(self, response: httpx.Response):
+        """响应下发了新的 _m_h5_tk 时，删除 Cookie 中其他域名下的旧 token，避免签名时取到旧值。"""
+        new_value = response.cookies.get(MTOP_TOKEN_COOKIE)
+        if not new_value:
+            return
+        jar = self._client.cookies.jar
+        for cookie in list(jar):
+            if cookie.name == MTOP_TOKEN_COOKIE and cookie.value != new_value:
+                jar.clear(cookie.domain, cookie.path, cookie.name)
+
+    async def call(self, api: str, data: dict, version: str = "1.0") -> dict:
+        """调用一个 mtop 接口并返回 JSON；token 过期时自动重试一次。"""
+        data_text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        ret_text = ""
+        for _ in range(2):
+            params = build_mtop_query(api, self._token(), data_text, version)
+            response = await self._client.post(f"/h5/{api}/{version}/", params=params, data={"data": data_text})
+            self.calls += 1
+            response.raise_for_status()
+            self._drop_replaced_tokens(response)
+            payload = response.json()
+            if response_succeeded(payload):
+                return payload
+            ret_text = _ret_text(payload)
+            if any(code in ret_text for code in SESSION_EXPIRED_CODES):
+                raise MtopSessionError(f"{api}: {ret_text}")
+            if not any(code in ret_text for code in TOKEN_RETRY_CODES):
+                # 其他失败（包括风控验证）交给调用方根据 ret 判断
+                return payload
+        raise MtopSessionError(f"{api}: {ret_text or 'token 刷新失败'}")
+
+    async def search(self, keyword: str, page_number: int = 1, overrides: Optional[dict] = None, rows: int = 30) -> dict:
+        data = {
+            "pageNumber": page_number,
+            "keyword": keyword,
+            "fromFilter": False,
+            "rowsPerPage": rows,
+            "sortValue": "",
+            "sortField": "",
+            "customDistance": "",
+            "gps": "",
+            "propValueStr": {},
+            "customGps": "",
+            "searchReqFromPage": "pcSearch",
+            "extraFilterValue": "{}",
+            "userPositionJson": "{}",
+        }
+        return await self.call(SEARCH_API, apply_search_filter(data, overrides or {}))
+
+    async def item_detail(self, item_id: str) -> dict:
+        return await self.call(DETAIL_API, {"itemId": str(item_id)})
+
+    async def user_head(self, user_id: str) -> dict:
+        return await self.call(USER_HEAD_API, {"self": False, "userId": str(user_id)})
+
+    async def user_items(self, user_id: str, page_number: int = 1, page_size: int = 20) -> dict:
+        return await self.call(
+            USER_ITEMS_API,
+            {"needGroupInfo": False, "pageNumber": page_number, "userId": str(user_id), "pageSize": page_size},
+        )
+
+    async def user_ratings(self, user_id: str, page_number: int = 1, page_size: int = 20) -> dict:
+        return await self.call(
+            USER_RATINGS_API, {"pageNumber": page_number, "pageSize": page_size, "rateType": 3, "userId": str(user_id)}
+        )
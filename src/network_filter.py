@@ -0,0 +1,166 @@
+"""
+网络资源拦截
+爬虫只读取 mtop 接口返回的 JSON，页面中的图片、视频、字体和统计脚本都不需要下载。
+在 BrowserContext 上安装路由后，这些请求会被直接中止，以节省代理流量；
+反爬验证（滑块、风控弹窗）需要的资源通过白名单放行。
+"""
+import os
+import time
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.utils import log_time
+
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# 埋点与统计脚本所在的域名（按子串匹配 URL）
+DEFAULT_BLOCKED_HOSTS = (
+    "log.mmstat.com",
+    "gm.mmstat.com",
+    "wgo.mmstat.com",
+    "arms-retcode.aliyuncs.com",
+    "g.alicdn.com/alilog/",
+    "hm.baidu.com",
+    "cnzz.com",
+    "umeng.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+)
+
+# 风控验证相关资源，无论类型都不拦截
+DEFAULT_ALLOW_PATTERNS = (
+    "baxia",
+    "punish",
+    "captcha",
+    "nocaptcha",
+    "AWSC",
+    "x5sec",
+    "_____tmd_____",
+)
+
+
+def _split_env(name: str, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return tuple(part.strip() for part in raw.split(",") if part.strip())
+
+
+@dataclass
+class ResourceBlockProfile:
+    """资源拦截配置"""
+    enabled: bool = True
+    resource_types: Tuple[str, ...] = DEFAULT_BLOCKED_RESOURCE_TYPES
+    hosts: Tuple[str, ...] = DEFAULT_BLOCKED_HOSTS
+    allow_patterns: Tuple[str, ...] = DEFAULT_ALLOW_PATTERNS
+
+    @classmethod
+    def from_env(cls) -> "ResourceBlockProfile":
+        return cls(
+            enabled=os.getenv("RESOURCE_BLOCKING_ENABLED", "true").lower() == "true",
+            resource_types=_split_env("RESOURCE_BLOCK_TYPES", DEFAULT_BLOCKED_RESOURCE_TYPES),
+            hosts=_split_env("RESOURCE_BLOCK_HOSTS", DEFAULT_BLOCKED_HOSTS),
+            allow_patterns=DEFAULT_ALLOW_PATTERNS + _split_env("RESOURCE_ALLOW_PATTERNS", ()),
+        )
+
+    def block_reason(self, url: str, resource_type: str) -> Optional[str]:
+        """返回拦截原因（资源类型或 "tracking"），不拦截时返回 None。"""
+        if any(pattern in url for pattern in self.allow_patterns):
+            return None
+        if resource_type in self.resource_types:
+            return resource_type
+        if any(host in url for host in self.hosts):
+            return "tracking"
+        return None
+
+
+@dataclass
+class NetworkStats:
+    """单次运行的网络流量与页面加载统计"""
+    blocked: Counter = field(default_factory=Counter)
+    requests_finished: int = 0
+    bytes_loaded: int = 0
+    page_loads: Dict[str, List[float]] = field(default_factory=dict)
+
+    def record_page_load(self, label: str, seconds: float):
+        self.page_loads.setdefault(label, []).append(seconds)
+
+    def summary(self) -> str:
+        blocked_total = sum(self.blocked.values())
+        blocked_detail = "，".join(f"{reason} {count}" for reason, count in self.blocked.most_common()) or "无"
+        loads = "，".join(
+            f"{label} {len(samples)} 次 平均 {sum(samples) / len(samples):.2f}s"
+            for label, samples in self.page_loads.items()
+        ) or "无"
+        return (
+            f"[网络统计] 拦截请求 {blocked_total} 个（{blocked_detail}）；"
+            f"完成请求 {self.requests_finished} 个，下载 {self.bytes_loaded / 1024 / 1024:.2f} MB；"
+            f"页面加载: {loads}"
+        )
+
+
+_context_stats: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+async def install_resource_blocking(context, profile: Optional[ResourceBlockProfile] = None) -> NetworkStats:
+    """
+    在 BrowserContext 上安装拦截路由并开始统计下载流量。
+    未启用拦截时仍会统计流量，便于对比。
+    """
+    profile = profile or ResourceBlockProfile.from_env()
+    stats = NetworkStats()
+    _context_stats[context] = stats
+
+    async def _route(route):
+        request = route.request
+        reason = profile.block_reason(request.url, request.resource_type)
+        if reason:
+            stats.blocked[reason] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _on_finished(request):
+        stats.requests_finished += 1
+        try:
+            sizes = await request.sizes()
+            stats.bytes_loaded += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        except Exception:
+            pass
+
+    if profile.enabled:
+        await context.route("**/*", _route)
+    context.on("requestfinished", _on_finished)
+    return stats
+
+
+def get_network_stats(context) -> Optional[NetworkStats]:
+    try:
+        return _context_stats.get(context)
+    except TypeError:
+        return None
+
+
+def record_load_time(context, label: str, seconds: float):
+    """记录一次页面或接口加载耗时（按 label 分类统计）。"""
+    stats = get_network_stats(context)
+    if stats is not None:
+        stats.record_page_load(label, seconds)
+
+
+async def timed_goto(page, url: str, label: str, **kwargs):
+    """page.goto 并记录页面加载耗时（按 label 分类统计）。"""
+    started = time.perf_counter()
+    try:
+        return await page.goto(url, **kwargs)
+    finally:
+        record_load_time(getattr(page, "context", None), label, time.perf_counter() - started)
+
+
+def log_network_stats(context):
+    stats = get_network_stats(context)
+    if stats is not None:
+        log_time(stats.summary())
@@ -1,8 +1,10 @@
 import json
+from dataclasses import asdict, dataclass
 from datetime import datetime
+from typing import Optional
 
 from src.config import AI_DEBUG_MODE
-from src.utils import safe_get
+from src.utils import format_registration_days, safe_get
 
 
 async def _parse_search_results_json(json_data: dict, source: str) -> list:
@@ -64,38 +66,56 @@ async def _parse_search_results_json(json_data: dict, source: str) -> list:
         return []
 
 
-async def calculate_reputation_from_ratings(ratings_json: list) -> dict:
-    """从原始评价API数据列表中，计算作为卖家和买家的好评数与好评率。"""
-    seller_total = 0
-    seller_positive = 0
-    buyer_total = 0
-    buyer_positive = 0
+@dataclass
+class ReputationCounter:
+    """可增量累加的好评统计：新采集到的评价卡片可以直接累加到已有计数上，无需重新遍历全部评价。"""
+    seller_total: int = 0
+    seller_positive: int = 0
+    buyer_total: int = 0
+    buyer_positive: int = 0
+
+    async def add_cards(self, ratings_json: list) -> None:
+        for card in ratings_json:
+            # 使用 safe_get 保证安全访问
+            data = await safe_get(card, 'cardData', default={})
+            role_tag = await safe_get(data, 'rateTagList', 0, 'text', default='')
+            rate_type = await safe_get(data, 'rate') # 1=好评, 0=中评, -1=差评
+
+            if "卖家" in role_tag:
+                self.seller_total += 1
+                if rate_type == 1:
+                    self.seller_positive += 1
+            elif "买家" in role_tag:
+                self.buyer_total += 1
+                if rate_type == 1:
+                    self.buyer_positive += 1
+
+    def to_dict(self) -> dict:
+        # 计算比率，并处理除以零的情况
+        seller_rate = f"{(self.seller_positive / self.seller_total * 100):.2f}%" if self.seller_total > 0 else "N/A"
+        buyer_rate = f"{(self.buyer_positive / self.buyer_total * 100):.2f}%" if self.buyer_total > 0 else "N/A"
+
+        return {
+            "作为卖家的好评数": f"{self.seller_positive}/{self.seller_total}",
+            "作为卖家的好评率": seller_rate,
+            "作为买家的好评数": f"{self.buyer_positive}/{self.buyer_total}",
+            "作为买家的好评率": buyer_rate
+        }
+
+    def to_state(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_state(cls, state: Optional[dict]) -> "ReputationCounter":
+        state = state or {}
+        return cls(**{key: int(state.get(key, 0) or 0) for key in cls.__dataclass_fields__})
 
-    for card in ratings_json:
-        # 使用 safe_get 保证安全访问
-        data = await safe_get(card, 'cardData', default={})
-        role_tag = await safe_get(data, 'rateTagList', 0, 'text', default='')
-        rate_type = await safe_get(data, 'rate') # 1=好评, 0=中评, -1=差评
-
-        if "卖家" in role_tag:
-            seller_total += 1
-            if rate_type == 1:
-                seller_positive += 1
-        elif "买家" in role_tag:
-            buyer_total += 1
-            if rate_type == 1:
-                buyer_positive += 1
-
-    # 计算比率，并处理除以零的情况
-    seller_rate = f"{(seller_positive / seller_total * 100):.2f}%" if seller_total > 0 else "N/A"
-    buyer_rate = f"{(buyer_positive / buyer_total * 100):.2f}%" if buyer_total > 0 else "N/A"
 
-    return {
-        "作为卖家的好评数": f"{seller_positive}/{seller_total}",
-        "作为卖家的好评率": seller_rate,
-        "作为买家的好评数": f"{buyer_positive}/{buyer_total}",
-        "作为买家的好评率": buyer_rate
-    }
+async def calculate_reputation_from_ratings(ratings_json: list) -> dict:
+    """从原始评价API数据列表中，计算作为卖家和买家的好评数与好评率。"""
+    counter = ReputationCounter()
+    await counter.add_cards(ratings_json)
+    return counter.to_dict()
 
 
 async def _parse_user_items_data(items_json: list) -> list:
@@ -121,6 +141,47 @@ async def _parse_user_items_data(items_json: list) -> list:
     return parsed_list
 
 
+async def parse_item_detail(detail_json: dict, item_data: dict) -> dict:
+    """
+    解析商品详情API的JSON数据：把图片列表、“想要”人数、浏览量和商品描述补充到 item_data 中，
+    返回 {"seller_id": ..., "seller_extra": {...}}。
+    """
+    item_do = await safe_get(detail_json, 'data', 'itemDO', default={})
+    seller_do = await safe_get(detail_json, 'data', 'sellerDO', default={})
+
+    reg_days_raw = await safe_get(seller_do, 'userRegDay', default=0)
+    registration_duration_text = format_registration_days(reg_days_raw)
+
+    # 1. 提取卖家的芝麻信用信息
+    zhima_credit_text = await safe_get(seller_do, 'zhimaLevelInfo', 'levelName')
+
+    # 2. 提取该商品的完整图片列表
+    image_infos = await safe_get(item_do, 'imageInfos', default=[])
+    if image_infos:
+        # 使用列表推导式获取所有有效的图片URL
+        all_image_urls = [img.get('url') for img in image_infos if img.get('url')]
+        if all_image_urls:
+            # 用新的字段存储图片列表，替换掉旧的单个链接
+            item_data['商品图片列表'] = all_image_urls
+            # (可选) 仍然保留主图链接，以防万一
+            item_data['商品主图链接'] = all_image_urls[0]
+
+    item_data['“想要”人数'] = await safe_get(item_do, 'wantCnt', default=item_data.get('“想要”人数', 'NaN'))
+    item_data['浏览量'] = await safe_get(item_do, 'browseCnt', default='-')
+    # 商品描述只在详情接口中提供，也参与 AI 结果缓存的商品指纹
+    item_data['商品描述'] = await safe_get(item_do, 'desc', default='')
+    # ...[此处可添加更多从详情页解析出的商品信息]...
+
+    seller_id = await safe_get(seller_do, 'sellerId', default=None)
+    return {
+        "seller_id": str(seller_id) if seller_id else None,
+        "seller_extra": {
+            '卖家芝麻信用': zhima_credit_text,
+            '卖家注册时长': registration_duration_text,
+        },
+    }
+
+
 async def parse_user_head_data(head_json: dict) -> dict:
     """解析用户头部API的JSON数据。"""
     data = head_json.get('data', {})
@@ -163,3 +224,18 @@ async def parse_ratings_data(ratings_json: list) -> list:
             "评价图片": await safe_get(data, 'pictCdnUrlList', default=[])
         })
     return parsed_list
+
+
+def merge_cards_by_id(fresh: list, previous: list, id_key: str) -> list:
+    """
+    将本次增量采集到的记录合并进已保存的列表：新记录在前，同一ID以新采集的为准（例如商品状态由在售变为已售）。
+    """
+    merged, seen = [], set()
+    for entry in list(fresh) + list(previous or []):
+        entry_id = entry.get(id_key)
+        if entry_id is not None:
+            if entry_id in seen:
+                continue
+            seen.add(entry_id)
+        merged.append(entry)
+    return merged
@@ -0,0 +1,157 @@
+"""
+分阶段的异步处理流水线
+各阶段之间通过有界队列连接：上游阶段只要下游队列未满就可以继续工作，
+例如浏览器在 AI 分析进行时继续抓取下一个商品。每个阶段都会统计队列深度、吞吐量和耗时。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, Type
+
+from src.utils import log_time
+
+
+StageHandler = Callable[[Any], Awaitable[Optional[Any]]]
+
+
+@dataclass
+class StageStats:
+    """单个阶段的运行统计"""
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    queue_peak: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def throughput_per_minute(self) -> float:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return self.processed / elapsed * 60
+
+    def average_seconds(self) -> float:
+        return self.busy_seconds / self.processed if self.processed else 0.0
+
+
+class Stage:
+    """
+    流水线中的一个阶段。
+    handler 返回要交给下一阶段的对象；返回 None 表示该对象在此阶段结束（过滤或失败）。
+    """
+
+    def __init__(self, name: str, handler: StageHandler, workers: int = 1, queue_size: int = 10):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.stats = StageStats()
+
+    def describe(self) -> str:
+        stats = self.stats
+        return (
+            f"{self.name}: 队列 {self.queue.qsize()}/{self.queue.maxsize} (峰值 {stats.queue_peak})，"
+            f"完成 {stats.processed}，丢弃 {stats.dropped}，错误 {stats.errors}，"
+            f"吞吐 {stats.throughput_per_minute():.2f}/分钟，平均耗时 {stats.average_seconds():.1f}s"
+        )
+
+
+class StagePipeline:
+    """按顺序连接多个 Stage 的流水线"""
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        fatal_exceptions: Tuple[Type[BaseException], ...] = (),
+        report_interval: float = 60,
+        name: str = "流水线",
+    ):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.fatal_exceptions = fatal_exceptions
+        self.report_interval = report_interval
+        self.name = name
+        self.fatal_error: Optional[BaseException] = None
+        self._workers: List[asyncio.Task] = []
+        self._reporter: Optional[asyncio.Task] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.fatal_error is not None
+
+    def start(self):
+        """为每个阶段启动工作协程"""
+        for index, stage in enumerate(self.stages):
+            stage.stats.started_at = time.monotonic()
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for _ in range(stage.workers):
+                self._workers.append(asyncio.create_task(self._worker(stage, next_stage)))
+        if self.report_interval and self.report_interval > 0:
+            self._reporter = asyncio.create_task(self._report_loop())
+
+    async def submit(self, item: Any) -> bool:
+        """向第一个阶段提交对象；队列已满时等待（反压）。流水线已失败时返回 False。"""
+        if self.failed:
+            return False
+        await self._put(self.stages[0], item)
+        return True
+
+    async def _put(self, stage: Stage, item: Any):
+        await stage.queue.put(item)
+        stage.stats.queue_peak = max(stage.stats.queue_peak, stage.queue.qsize())
+
+    async def _worker(self, stage: Stage, next_stage: Optional[Stage]):
+        while True:
+            item = await stage.queue.get()
+            try:
+                if self.failed:
+                    stage.stats.dropped += 1
+                    continue
+                started = time.monotonic()
+                try:
+                    result = await stage.handler(item)
+                finally:
+                    stage.stats.busy_seconds += time.monotonic() - started
+                stage.stats.processed += 1
+                if result is None:
+                    if next_stage is not None:
+                        stage.stats.dropped += 1
+                elif next_stage is not None:
+                    await self._put(next_stage, result)
+            except asyncio.CancelledError:
+                raise
+            except self.fatal_exceptions as e:
+                stage.stats.errors += 1
+                if self.fatal_error is None:
+                    self.fatal_error = e
+                    log_time(f"[{self.name}] 阶段 {stage.name} 出现致命错误，停止处理后续对象: {e}")
+            except Exception as e:
+                stage.stats.errors += 1
+                log_time(f"[{self.name}] 阶段 {stage.name} 处理失败: {type(e).__name__}: {e}")
+            finally:
+                stage.queue.task_done()
+
+    async def join(self):
+        """等待所有已提交的对象依次流经全部阶段，然后停止工作协程"""
+        for stage in self.stages:
+            await stage.queue.join()
+        await self.shutdown()
+
+    async def shutdown(self):
+        """立即停止所有工作协程（未处理完的对象将被丢弃）"""
+        tasks = self._workers + ([self._reporter] if self._reporter else [])
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reporter = None
+
+    def report(self):
+        log_time(f"[{self.name}] 各阶段统计:")
+        for stage in self.stages:
+            log_time(f"    {stage.describe()}")
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
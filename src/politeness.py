@@ -0,0 +1,60 @@
+"""
+按账号的访问礼貌限制
+同一账号（登录状态文件）在单个爬虫进程内共享一个限制器：限制同时进行的页面访问数，
+并保证相邻两次访问之间至少间隔一段随机时间，避免并发处理商品时触发风控。
+"""
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class AccountPolitenessLimiter:
+    """单个账号的并发与访问间隔限制"""
+
+    def __init__(self, max_concurrent: int = 2, min_interval: float = 3.0, max_interval: float = 6.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_interval = max(0.0, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._interval_lock = asyncio.Lock()
+        self._last_started = 0.0
+        self.waited_seconds = 0.0
+
+    async def _wait_interval(self):
+        async with self._interval_lock:
+            gap = random.uniform(self.min_interval, self.max_interval)
+            delay = self._last_started + gap - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_started = time.monotonic()
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个访问槽位，退出时释放。"""
+        started = time.monotonic()
+        await self._semaphore.acquire()
+        try:
+            await self._wait_interval()
+            self.waited_seconds += time.monotonic() - started
+            yield
+        finally:
+            self._semaphore.release()
+
+
+_limiters: Dict[str, AccountPolitenessLimiter] = {}
+
+
+def get_account_limiter(account_key: str) -> AccountPolitenessLimiter:
+    """获取（或创建）账号对应的限制器，同一进程内的多个任务共用。"""
+    limiter = _limiters.get(account_key)
+    if limiter is None:
+        limiter = AccountPolitenessLimiter(
+            max_concurrent=int(os.getenv("ACCOUNT_MAX_CONCURRENT_PAGES", "2") or 2),
+            min_interval=float(os.getenv("ACCOUNT_MIN_REQUEST_INTERVAL", "3") or 3),
+            max_interval=float(os.getenv("ACCOUNT_MAX_REQUEST_INTERVAL", "6") or 6),
+        )
+        _limiters[account_key] = limiter
+    return limiter
@@ -2,40 +2,55 @@ import asyncio
 import json
 import os
 import random
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from urllib.parse import urlencode
 
+import httpx
 from playwright.async_api import (
     Response,
     TimeoutError as PlaywrightTimeoutError,
     async_playwright,
 )
 
+from src.ai_cache import AIVerdictCache, listing_fingerprint, prompt_fingerprint
+from src.ai_screening import build_screening_criteria, screen_listings_batch
 from src.ai_handler import (
     download_all_images,
+    download_images_to_memory,
     get_ai_analysis,
+    validate_ai_response_format,
     send_ntfy_notification,
     cleanup_task_images,
 )
+from src.browser import new_scrape_context, open_browser
+from src.network_filter import install_resource_blocking, log_network_stats, record_load_time, timed_goto
 from src.config import (
+    AI_CACHE_ENABLED,
     AI_DEBUG_MODE,
+    AI_IMAGE_BUDGET,
+    AI_PAYLOAD_TOKEN_BUDGET,
+    AI_SCREENING_BATCH_SIZE,
+    AI_SCREENING_ENABLED,
     API_URL_PATTERN,
     DETAIL_API_URL_PATTERN,
-    LOGIN_IS_EDGE,
-    RUN_HEADLESS,
-    RUNNING_IN_DOCKER,
+    IMAGE_IN_MEMORY_ENABLED,
+    PERSONAL_PAGE_URL,
+    SELLER_CACHE_ENABLED,
     STATE_FILE,
 )
 from src.parsers import (
     _parse_search_results_json,
     _parse_user_items_data,
-    calculate_reputation_from_ratings,
+    ReputationCounter,
+    merge_cards_by_id,
+    parse_item_detail,
     parse_ratings_data,
     parse_user_head_data,
 )
 from src.utils import (
-    format_registration_days,
     get_link_unique_key,
     random_sleep,
     safe_get,
@@ -43,12 +58,46 @@ from src.utils import (
     log_time,
 )
 from src.rotation import RotationPool, load_state_files, parse_proxy_pool, RotationItem
+from src.politeness import get_account_limiter
+from src.pipeline import Stage, StagePipeline
+from src.seller_cache import SellerProfileCache
+from src.dedup_index import open_keyword_index
+from src.image_capture import DetailImageCapture
+from src.image_downloader import close_image_downloader, hold_image_downloader
+from src.image_select import image_fingerprints
+from src.mtop import SearchFilterRoute, build_search_filter, response_succeeded
+from src.mtop_client import DETAIL_API, MtopClient, MtopSessionError, call_mtop_in_context
+from src.task_state import TaskWatermarkStore
 
 
 class RiskControlError(Exception):
     pass
 
 
+@dataclass
+class ItemJob:
+    """在处理流水线中流转的单个新商品"""
+    item_data: dict
+    unique_key: str
+    seen_at: float
+    seller_id: Optional[str] = None
+    seller_extra: dict = field(default_factory=dict)
+    final_record: Optional[dict] = None
+    image_paths: list = field(default_factory=list)
+    image_data: list = field(default_factory=list)
+    captured_images: dict = field(default_factory=dict)
+    screening: Optional[dict] = None
+    ai_result: Optional[dict] = None
+
+
+@dataclass
+class ProfileLimits:
+    """卖家主页采集预算，0 表示不限制。"""
+    max_items: int = 0
+    max_ratings: int = 0
+    deadline_seconds: float = 0
+
+
 def _as_bool(value, default: bool = False) -> bool:
     if value is None:
         return default
@@ -66,6 +115,70 @@ def _as_int(value, default: int) -> int:
         return default
 
 
+def _log_latency_summary(latencies: list) -> None:
+    """输出本次运行中商品从发现到处理完成的耗时统计。"""
+    if not latencies:
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    log_time(
+        f"[耗时统计] 共 {len(ordered)} 个商品，发现→完成 平均 {sum(ordered) / len(ordered):.1f}s，"
+        f"P95 {p95:.1f}s，最大 {ordered[-1]:.1f}s。"
+    )
+
+
+def _open_seller_cache() -> Optional[SellerProfileCache]:
+    """打开跨进程共享的卖家信息缓存；未启用或打开失败时返回 None。"""
+    if not SELLER_CACHE_ENABLED:
+        return None
+    try:
+        return SellerProfileCache()
+    except Exception as e:
+        print(f"   [警告] 打开卖家信息缓存失败，将不使用缓存: {e}")
+        return None
+
+
+def _open_ai_cache() -> Optional[AIVerdictCache]:
+    """打开跨进程共享的 AI 分析结果缓存；未启用或打开失败时返回 None。"""
+    if not AI_CACHE_ENABLED:
+        return None
+    try:
+        return AIVerdictCache()
+    except Exception as e:
+        print(f"   [警告] 打开AI分析结果缓存失败，将不使用缓存: {e}")
+        return None
+
+
+def _open_watermark_store() -> Optional[TaskWatermarkStore]:
+    """打开任务高水位存储；打开失败时返回 None（不影响翻页）。"""
+    try:
+        return TaskWatermarkStore()
+    except Exception as e:
+        print(f"   [警告] 打开任务状态数据库失败，将不使用发布时间高水位: {e}")
+        return None
+
+
+def _publish_timestamp(item_data: dict) -> Optional[float]:
+    """将搜索结果中的“发布时间”（%Y-%m-%d %H:%M）转换为时间戳，无法解析时返回 None。"""
+    try:
+        return datetime.strptime(item_data.get("发布时间", ""), "%Y-%m-%d %H:%M").timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_pagination_settings(task_config: dict) -> dict:
+    stop_after_known_pages = _as_int(
+        task_config.get("stop_after_known_pages"), _as_int(os.getenv("PAGINATION_STOP_AFTER_KNOWN_PAGES"), 1)
+    )
+    use_watermark = _as_bool(
+        task_config.get("use_publish_watermark"), _as_bool(os.getenv("PAGINATION_USE_WATERMARK"), True)
+    )
+    return {
+        "stop_after_known_pages": max(0, stop_after_known_pages),
+        "use_watermark": use_watermark,
+    }
+
+
 def _get_rotation_settings(task_config: dict) -> dict:
     account_cfg = task_config.get("account_rotation") or {}
     proxy_cfg = task_config.get("proxy_rotation") or {}
@@ -96,23 +209,168 @@ def _get_rotation_settings(task_config: dict) -> dict:
     }
 
 
-async def scrape_user_profile(context, user_id: str) -> dict:
+def _get_profile_limits(task_config: dict) -> ProfileLimits:
+    max_items = _as_int(task_config.get("profile_max_items"), _as_int(os.getenv("PROFILE_MAX_ITEMS"), 0))
+    max_ratings = _as_int(task_config.get("profile_max_ratings"), _as_int(os.getenv("PROFILE_MAX_RATINGS"), 0))
+    deadline_seconds = _as_int(
+        task_config.get("profile_deadline_seconds"), _as_int(os.getenv("PROFILE_DEADLINE_SECONDS"), 0)
+    )
+    return ProfileLimits(
+        max_items=max(0, max_items),
+        max_ratings=max(0, max_ratings),
+        deadline_seconds=max(0, deadline_seconds),
+    )
+
+
+class _ProfileCollector:
     """
-    【新版】访问指定用户的个人主页，按顺序采集其摘要信息、完整的商品列表和完整的评价列表。
+    卖家主页采集过程中的状态：已捕获的商品/评价、增量同步的停止位置、采集预算与完整性标记。
+    浏览器模式（拦截页面的API响应）和接口模式（直接调用API）共用同一套处理逻辑。
     """
-    print(f"   -> 开始采集用户ID: {user_id} 的完整信息...")
+
+    def __init__(
+        self,
+        previous_profile: Optional[dict] = None,
+        reputation: Optional[ReputationCounter] = None,
+        limits: Optional[ProfileLimits] = None,
+    ):
+        self.incremental = previous_profile is not None
+        self.previous_profile = previous_profile or {}
+        self.reputation = reputation if reputation is not None else ReputationCounter()
+        self.limits = limits or ProfileLimits()
+        self.deadline = time.monotonic() + self.limits.deadline_seconds if self.limits.deadline_seconds > 0 else None
+        self.previous_items = self.previous_profile.get("卖家发布的商品列表", [])
+        self.previous_ratings = self.previous_profile.get("卖家收到的评价列表", [])
+        self.known_item_ids = {entry.get("商品ID") for entry in self.previous_items} - {None}
+        self.known_rating_ids = {entry.get("评价ID") for entry in self.previous_ratings} - {None}
+        self.all_items, self.all_ratings = [], []
+        self.counted_rating_ids = set()
+        # 是否因预算、时限或错误而未采集完整
+        self.partial = {"items": False, "ratings": False}
+        self.ratings_visited = False
+
+    def time_left(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def accept_items(self, data: dict) -> bool:
+        """处理一页商品列表API数据，返回是否应停止加载下一页。"""
+        limits = self.limits
+        cards = data.get('data', {}).get('cardList', [])
+        reached_known = bool(self.known_item_ids) and any(
+            card.get('cardData', {}).get('id') in self.known_item_ids for card in cards
+        )
+        kept = cards
+        if limits.max_items > 0:
+            kept = cards[:max(0, limits.max_items - len(self.all_items))]
+            if len(kept) < len(cards) and not reached_known:
+                self.partial["items"] = True
+        self.all_items.extend(kept)
+        print(f"      [API捕获] 商品列表... 当前已捕获 {len(self.all_items)} 件")
+        if not data.get('data', {}).get('nextPage', True):
+            return True
+        if reached_known:
+            print("      [增量同步] 商品列表已到达上次保存的位置，停止滚动。")
+            return True
+        if limits.max_items > 0 and len(self.all_items) >= limits.max_items:
+            print(f"      [采集预算] 商品列表已达到上限 {limits.max_items} 件，停止滚动。")
+            self.partial["items"] = True
+            return True
+        return False
+
+    async def accept_ratings(self, data: dict) -> bool:
+        """处理一页评价列表API数据（逐条累加好评计数），返回是否应停止加载下一页。"""
+        limits = self.limits
+        reached_known = False
+        # 评价按时间倒序返回：逐条累加好评计数，遇到已保存的评价后其余都是旧评价
+        for card in data.get('data', {}).get('cardList', []):
+            rate_id = card.get('cardData', {}).get('rateId')
+            if rate_id is not None and rate_id in self.known_rating_ids:
+                reached_known = True
+                break
+            if limits.max_ratings > 0 and len(self.all_ratings) >= limits.max_ratings:
+                self.partial["ratings"] = True
+                break
+            if rate_id is not None:
+                if rate_id in self.counted_rating_ids:
+                    continue
+                self.counted_rating_ids.add(rate_id)
+            await self.reputation.add_cards([card])
+            self.all_ratings.append(card)
+        print(f"      [API捕获] 评价列表... 当前已捕获 {len(self.all_ratings)} 条")
+        if not data.get('data', {}).get('nextPage', True):
+            return True
+        if reached_known:
+            print("      [增量同步] 评价列表已到达上次保存的位置，停止滚动。")
+            return True
+        if limits.max_ratings > 0 and len(self.all_ratings) >= limits.max_ratings:
+            print(f"      [采集预算] 评价列表已达到上限 {limits.max_ratings} 条，停止滚动。")
+            self.partial["ratings"] = True
+            return True
+        return False
+
+    async def finish(self, profile_data: dict) -> dict:
+        """把本次捕获的商品/评价与已保存的结果合并，写入完整性标记和好评统计。"""
+        limits, previous_profile = self.limits, self.previous_profile
+        if not profile_data and not self.incremental:
+            return profile_data
+
+        items = merge_cards_by_id(await _parse_user_items_data(self.all_items), self.previous_items, "商品ID")
+        if limits.max_items > 0 and len(items) > limits.max_items:
+            items, self.partial["items"] = items[:limits.max_items], True
+        profile_data["卖家发布的商品列表"] = items
+        profile_data["商品列表是否完整"] = not self.partial["items"] and previous_profile.get("商品列表是否完整", True)
+
+        # 好评计数已在评价到达时累加，这里只需合并评价列表
+        if self.ratings_visited or "卖家收到的评价列表" in previous_profile:
+            ratings = merge_cards_by_id(await parse_ratings_data(self.all_ratings), self.previous_ratings, "评价ID")
+            if limits.max_ratings > 0 and len(ratings) > limits.max_ratings:
+                ratings, self.partial["ratings"] = ratings[:limits.max_ratings], True
+            profile_data["卖家收到的评价列表"] = ratings
+            profile_data["评价列表是否完整"] = not self.partial["ratings"] and previous_profile.get("评价列表是否完整", True)
+            profile_data.update(self.reputation.to_dict())
+            if self.incremental:
+                print(f"      [增量同步] 新增评价 {len(self.all_ratings)} 条。")
+
+        if self.incremental:
+            # 本次未能采集到的部分沿用已保存的数据
+            for key, value in previous_profile.items():
+                profile_data.setdefault(key, value)
+
+        return profile_data
+
+
+async def scrape_user_profile(
+    context,
+    user_id: str,
+    previous_profile: Optional[dict] = None,
+    reputation: Optional[ReputationCounter] = None,
+    limits: Optional[ProfileLimits] = None,
+    parallel_pages: bool = False,
+) -> dict:
+    """
+    【新版】访问指定用户的个人主页，采集其摘要信息、商品列表和评价列表。
+    默认在同一页面中按顺序采集；parallel_pages 为 True 时商品列表和评价列表分别在同一 context 的两个页面中同时采集。
+
+    传入 previous_profile（已保存的采集结果）时进入增量模式：商品/评价列表滚动到已保存的记录即停止，
+    新记录合并进已保存的列表。reputation 为与已保存评价列表对应的好评计数，评价在到达时即累加，
+    调用方可在采集完成后通过 reputation.to_state() 保存。
+    limits 限制采集的商品数、评价数和总耗时；超出预算时结果中的完整性标记为 False。
+    """
+    collector = _ProfileCollector(previous_profile, reputation, limits)
+    limits = collector.limits
+    mode_text = "增量同步" if collector.incremental else "完整信息"
+    print(f"   -> 开始采集用户ID: {user_id} 的{mode_text}...")
     profile_data = {}
-    page = await context.new_page()
+    personal_url = PERSONAL_PAGE_URL.format(user_id=user_id)
+    opened_pages = []
 
     # 为各项异步任务准备Future和数据容器
     head_api_future = asyncio.get_event_loop().create_future()
-
-    all_items, all_ratings = [], []
     stop_item_scrolling, stop_rating_scrolling = asyncio.Event(), asyncio.Event()
 
-    async def handle_response(response: Response):
+    async def handle_response(response: Response, roles: set):
         # 捕获头部摘要API
-        if "mtop.idle.web.user.page.head" in response.url and not head_api_future.done():
+        if "head" in roles and "mtop.idle.web.user.page.head" in response.url and not head_api_future.done():
             try:
                 head_api_future.set_result(await response.json())
                 print(f"      [API捕获] 用户头部信息... 成功")
@@ -120,94 +378,189 @@ async def scrape_user_profile(context, user_id: str) -> dict:
                 if not head_api_future.done(): head_api_future.set_exception(e)
 
         # 捕获商品列表API
-        elif "mtop.idle.web.xyh.item.list" in response.url:
+        elif "items" in roles and "mtop.idle.web.xyh.item.list" in response.url:
+            if stop_item_scrolling.is_set():
+                return
             try:
-                data = await response.json()
-                all_items.extend(data.get('data', {}).get('cardList', []))
-                print(f"      [API捕获] 商品列表... 当前已捕获 {len(all_items)} 件")
-                if not data.get('data', {}).get('nextPage', True):
+                if collector.accept_items(await response.json()):
                     stop_item_scrolling.set()
             except Exception as e:
                 stop_item_scrolling.set()
 
         # 捕获评价列表API
-        elif "mtop.idle.web.trade.rate.list" in response.url:
+        elif "ratings" in roles and "mtop.idle.web.trade.rate.list" in response.url:
+            if stop_rating_scrolling.is_set():
+                return
             try:
-                data = await response.json()
-                all_ratings.extend(data.get('data', {}).get('cardList', []))
-                print(f"      [API捕获] 评价列表... 当前已捕获 {len(all_ratings)} 条")
-                if not data.get('data', {}).get('nextPage', True):
+                if await collector.accept_ratings(await response.json()):
                     stop_rating_scrolling.set()
             except Exception as e:
                 stop_rating_scrolling.set()
 
-    page.on("response", handle_response)
-
-    try:
-        # --- 任务1: 导航并采集头部信息 ---
-        await page.goto(f"https://www.goofish.com/personal?userId={user_id}", wait_until="domcontentloaded", timeout=20000)
-        head_data = await asyncio.wait_for(head_api_future, timeout=15)
-        profile_data = await parse_user_head_data(head_data)
-
-        # --- 任务2: 滚动加载所有商品 (默认页面) ---
-        print("      [采集阶段] 开始采集该用户的商品列表...")
-        await random_sleep(2, 4) # 等待第一页商品API完成
-        while not stop_item_scrolling.is_set():
+    async def _scroll_until(page, stop_event: asyncio.Event, label: str) -> bool:
+        """滚动到列表结束或触发停止条件；因超过时限而停止时返回 False。"""
+        while not stop_event.is_set():
+            remaining = collector.time_left()
+            if remaining is not None and remaining <= 0:
+                print(f"      [采集预算] 已达到采集时限 {limits.deadline_seconds:g} 秒，停止滚动{label}。")
+                return False
             await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
             try:
-                await asyncio.wait_for(stop_item_scrolling.wait(), timeout=8)
+                timeout = 8 if remaining is None else max(0.1, min(8, remaining))
+                await asyncio.wait_for(stop_event.wait(), timeout=timeout)
             except asyncio.TimeoutError:
-                print("      [滚动超时] 商品列表可能已加载完毕。")
+                if collector.time_left() is not None and collector.time_left() <= 0:
+                    continue
+                print(f"      [滚动超时] {label}可能已加载完毕。")
                 break
-        profile_data["卖家发布的商品列表"] = await _parse_user_items_data(all_items)
+        return True
+
+    async def _open_page(roles: set):
+        """打开个人主页，页面只收集 roles 指定的 API 响应（head / items / ratings）。"""
+        page = await context.new_page()
 
-        # --- 任务3: 点击并采集所有评价 ---
+        async def on_response(response: Response):
+            await handle_response(response, roles)
+
+        page.on("response", on_response)
+        opened_pages.append((page, on_response))
+        await timed_goto(page, personal_url, "卖家主页", wait_until="domcontentloaded", timeout=20000)
+        return page
+
+    async def _collect_items(page):
+        print("      [采集阶段] 开始采集该用户的商品列表...")
+        await random_sleep(2, 4) # 等待第一页商品API完成
+        if not await _scroll_until(page, stop_item_scrolling, "商品列表"):
+            collector.partial["items"] = True
+        stop_item_scrolling.set()
+
+    async def _collect_ratings(page):
+        remaining = collector.time_left()
+        if remaining is not None and remaining <= 0:
+            print("      [采集预算] 已达到采集时限，跳过评价采集。")
+            collector.partial["ratings"] = True
+            return
         print("      [采集阶段] 开始采集该用户的评价列表...")
         rating_tab_locator = page.locator("//div[text()='信用及评价']/ancestor::li")
         if await rating_tab_locator.count() > 0:
+            collector.ratings_visited = True
             await rating_tab_locator.click()
             await random_sleep(3, 5) # 等待第一页评价API完成
-
-            while not stop_rating_scrolling.is_set():
-                await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                try:
-                    await asyncio.wait_for(stop_rating_scrolling.wait(), timeout=8)
-                except asyncio.TimeoutError:
-                    print("      [滚动超时] 评价列表可能已加载完毕。")
-                    break
-
-            profile_data['卖家收到的评价列表'] = await parse_ratings_data(all_ratings)
-            reputation_stats = await calculate_reputation_from_ratings(all_ratings)
-            profile_data.update(reputation_stats)
+            if not await _scroll_until(page, stop_rating_scrolling, "评价列表"):
+                collector.partial["ratings"] = True
+            stop_rating_scrolling.set()
         else:
             print("      [警告] 未找到评价选项卡，跳过评价采集。")
 
+    async def _collect_head_and_items(roles: set):
+        nonlocal profile_data
+        page = await _open_page(roles)
+        head_data = await asyncio.wait_for(head_api_future, timeout=15)
+        profile_data = await parse_user_head_data(head_data)
+        await _collect_items(page)
+        return page
+
+    async def _collect_ratings_on_new_page():
+        page = await _open_page({"ratings"})
+        await _collect_ratings(page)
+
+    try:
+        if parallel_pages:
+            # 两个页面同时采集，任一失败不影响另一页已采集的数据
+            results = await asyncio.gather(
+                _collect_head_and_items({"head", "items"}),
+                _collect_ratings_on_new_page(),
+                return_exceptions=True,
+            )
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+        else:
+            # --- 任务1: 导航并采集头部信息；任务2: 滚动加载商品 (默认页面) ---
+            page = await _collect_head_and_items({"head", "items", "ratings"})
+            # --- 任务3: 点击并采集评价 ---
+            await _collect_ratings(page)
+
     except Exception as e:
         print(f"   [错误] 采集用户 {user_id} 信息时发生错误: {e}")
+        if not stop_item_scrolling.is_set():
+            collector.partial["items"] = True
+        if not stop_rating_scrolling.is_set():
+            collector.partial["ratings"] = True
     finally:
-        page.remove_listener("response", handle_response)
-        await page.close()
+        for page, on_response in opened_pages:
+            page.remove_listener("response", on_response)
+            await page.close()
         print(f"   -> 用户 {user_id} 信息采集完成。")
 
-    return profile_data
+    return await collector.finish(profile_data)
 
 
-async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
+async def fetch_user_profile_via_api(
+    client: MtopClient,
+    user_id: str,
+    previous_profile: Optional[dict] = None,
+    reputation: Optional[ReputationCounter] = None,
+    limits: Optional[ProfileLimits] = None,
+) -> dict:
     """
-    【核心执行器】
-    根据单个任务配置，异步爬取闲鱼商品数据，并对每个新发现的商品进行实时的、独立的AI分析和通知。
+    接口模式下采集卖家主页：直接分页调用头部、商品列表和评价列表接口，不打开浏览器页面。
+    增量同步、采集预算和返回结果与 scrape_user_profile 相同；登录会话失效时抛出 MtopSessionError。
     """
-    keyword = task_config['keyword']
-    max_pages = task_config.get('max_pages', 1)
-    personal_only = task_config.get('personal_only', False)
-    min_price = task_config.get('min_price')
-    max_price = task_config.get('max_price')
-    ai_prompt_text = task_config.get('ai_prompt_text', '')
+    collector = _ProfileCollector(previous_profile, reputation, limits)
+    mode_text = "增量同步" if collector.incremental else "完整信息"
+    print(f"   -> [接口模式] 开始采集用户ID: {user_id} 的{mode_text}...")
+    profile_data = {}
 
+    async def _page_through(fetch, accept, key: str, label: str):
+        page_number = 1
+        while True:
+            remaining = collector.time_left()
+            if remaining is not None and remaining <= 0:
+                print(f"      [采集预算] 已达到采集时限 {collector.limits.deadline_seconds:g} 秒，停止加载{label}。")
+                collector.partial[key] = True
+                return
+            data = await fetch(user_id, page_number)
+            if not response_succeeded(data):
+                print(f"      [警告] {label}接口返回失败: {data.get('ret')}")
+                collector.partial[key] = True
+                return
+            if await accept(data):
+                return
+            page_number += 1
+            await random_sleep(0.5, 1.5)
+
+    async def _accept_items(data: dict) -> bool:
+        return collector.accept_items(data)
+
+    current = "items"
+    try:
+        profile_data = await parse_user_head_data(await client.user_head(user_id))
+        print(f"      [API请求] 用户头部信息... 成功")
+        await _page_through(client.user_items, _accept_items, "items", "商品列表")
+        current = "ratings"
+        collector.ratings_visited = True
+        await _page_through(client.user_ratings, collector.accept_ratings, "ratings", "评价列表")
+        current = None
+    except MtopSessionError:
+        raise
+    except Exception as e:
+        print(f"   [错误] 采集用户 {user_id} 信息时发生错误: {e}")
+        if current == "items":
+            collector.partial["items"] = True
+        if current in ("items", "ratings"):
+            collector.partial["ratings"] = True
+    print(f"   -> 用户 {user_id} 信息采集完成。")
+
+    return await collector.finish(profile_data)
+
+
+def _load_processed_links(output_filename: str) -> set:
+    """逐行读取历史结果文件重建去重集合（去重索引不可用时的回退方式）。"""
     processed_links = set()
-    output_filename = os.path.join("jsonl", f"{keyword.replace(' ', '_')}_full_data.jsonl")
     if os.path.exists(output_filename):
         print(f"LOG: 发现已存在文件 {output_filename}，正在加载历史记录以去重...")
+        started = time.perf_counter()
         try:
             with open(output_filename, 'r', encoding='utf-8') as f:
                 for line in f:
@@ -218,11 +571,165 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
                             processed_links.add(get_link_unique_key(link))
                     except json.JSONDecodeError:
                         print(f"   [警告] 文件中有一行无法解析为JSON，已跳过。")
-            print(f"LOG: 加载完成，已记录 {len(processed_links)} 个已处理过的商品。")
+            print(
+                f"LOG: 加载完成，已记录 {len(processed_links)} 个已处理过的商品，"
+                f"耗时 {time.perf_counter() - started:.2f} 秒。"
+            )
         except IOError as e:
             print(f"   [警告] 读取历史文件时发生错误: {e}")
     else:
         print(f"LOG: 输出文件 {output_filename} 不存在，将创建新文件。")
+    return processed_links
+
+
+class _PageScheduler:
+    """
+    把一页搜索结果中的新商品提交到流水线，并执行翻页停止策略:
+    连续 stop_after_known_pages 页全部是已处理的商品，或整页发布时间早于上次成功运行的高水位时停止翻页。
+    新的高水位只取已处理跳过或已由保存阶段确认（confirm）的商品的发布时间，并且不超过被流水线丢弃的商品，
+    调试上限提前结束时不更新高水位，避免下次运行跳过本次未处理的商品。
+    """
+
+    def __init__(
+        self,
+        processed_links: set,
+        stop_after_known_pages: int = 1,
+        high_water_ts: Optional[float] = None,
+        debug_limit: int = 0,
+    ):
+        self.processed_links = processed_links
+        self.stop_after_known_pages = stop_after_known_pages
+        self.high_water_ts = high_water_ts
+        self.debug_limit = debug_limit
+        self.reset()
+
+    def reset(self):
+        self.scheduled_keys = set()
+        self.consecutive_known_pages = 0
+        self.newest_publish_ts: Optional[float] = None
+        # 已提交但尚未保存的商品 -> 发布时间
+        self.pending_publish: Dict[str, Optional[float]] = {}
+        self.stop_scraping = False
+        self.hit_debug_limit = False
+
+    @property
+    def scheduled_count(self) -> int:
+        return len(self.scheduled_keys)
+
+    def is_known(self, unique_key: str) -> bool:
+        return unique_key in self.processed_links or unique_key in self.scheduled_keys
+
+    def watermark_ts(self) -> Optional[float]:
+        """本次运行结束后可以写入的发布时间高水位，不应更新时返回 None。"""
+        if self.hit_debug_limit or self.newest_publish_ts is None:
+            return None
+        # 流水线结束后仍未确认的商品处理失败，高水位不能越过它们，下次运行需要重新翻到
+        dropped = [ts for ts in self.pending_publish.values() if ts is not None]
+        return min([self.newest_publish_ts, *dropped])
+
+    def confirm(self, unique_key: str):
+        """保存阶段确认商品已写入结果文件。"""
+        if unique_key in self.pending_publish:
+            self._advance(self.pending_publish.pop(unique_key))
+
+    def _advance(self, publish_ts: Optional[float]):
+        if publish_ts is not None:
+            self.newest_publish_ts = max(self.newest_publish_ts or 0, publish_ts)
+
+    async def schedule_page(self, basic_items: list, pipeline, page_screening: Optional[dict] = None) -> bool:
+        """把一页搜索结果中的新商品提交到流水线，返回是否应停止翻页。"""
+        page_screening = page_screening or {}
+        total_items_on_page = len(basic_items)
+        page_all_known = all(self.is_known(get_link_unique_key(item["商品链接"])) for item in basic_items)
+        page_publish_times = [ts for ts in map(_publish_timestamp, basic_items) if ts is not None]
+        for i, item_data in enumerate(basic_items, 1):
+            if pipeline.failed:
+                break
+            if self.debug_limit > 0 and self.scheduled_count >= self.debug_limit:
+                log_time(f"已达到调试上限 ({self.debug_limit})，停止获取新商品。")
+                self.stop_scraping = True
+                self.hit_debug_limit = True
+                break
+
+            unique_key = get_link_unique_key(item_data["商品链接"])
+            if self.is_known(unique_key):
+                log_time(f"[页内进度 {i}/{total_items_on_page}] 商品 '{item_data['商品标题'][:20]}...' 已存在，跳过。")
+                self._advance(_publish_timestamp(item_data))
+                continue
+
+            seen_at = time.monotonic()
+            log_time(f"[页内进度 {i}/{total_items_on_page}] 发现新商品，加入处理队列: {item_data['商品标题'][:30]}...")
+            # --- 修改: 访问详情页前的等待时间，模拟用户在列表页上看了一会儿 ---
+            await random_sleep(3, 6) # 原来是 (2, 4)
+            self.scheduled_keys.add(unique_key)
+            self.pending_publish[unique_key] = _publish_timestamp(item_data)
+            # 详情队列已满时在此等待（反压），翻页节奏由下游处理速度决定
+            await pipeline.submit(
+                ItemJob(
+                    item_data=item_data,
+                    unique_key=unique_key,
+                    seen_at=seen_at,
+                    screening=page_screening.get(unique_key),
+                )
+            )
+
+        if pipeline.failed:
+            return True
+
+        self.consecutive_known_pages = self.consecutive_known_pages + 1 if page_all_known else 0
+        if self.stop_after_known_pages and self.consecutive_known_pages >= self.stop_after_known_pages:
+            log_time(f"[翻页策略] 连续 {self.consecutive_known_pages} 页均为已处理的商品，停止翻页。")
+            return True
+        if self.high_water_ts and page_publish_times and max(page_publish_times) < self.high_water_ts:
+            log_time("[翻页策略] 本页商品的发布时间均早于上次运行的高水位，停止翻页。")
+            return True
+        return False
+
+
+async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
+    """
+    【核心执行器】
+    根据单个任务配置，异步爬取闲鱼商品数据，并对每个新发现的商品进行实时的、独立的AI分析和通知。
+    """
+    keyword = task_config['keyword']
+    max_pages = task_config.get('max_pages', 1)
+    personal_only = task_config.get('personal_only', False)
+    min_price = task_config.get('min_price')
+    max_price = task_config.get('max_price')
+    ai_prompt_text = task_config.get('ai_prompt_text', '')
+
+    output_filename = os.path.join("jsonl", f"{keyword.replace(' ', '_')}_full_data.jsonl")
+    try:
+        # 去重索引保存在 SQLite 中，启动时只需补充上次之后新增的记录
+        processed_links, new_lines, elapsed = open_keyword_index(keyword)
+        print(
+            f"LOG: 去重索引就绪，已记录 {len(processed_links)} 个已处理过的商品"
+            f"（补充索引 {new_lines} 行，耗时 {elapsed:.2f} 秒）。"
+        )
+    except Exception as e:
+        print(f"   [警告] 打开去重索引失败，改为读取历史文件: {e}")
+        processed_links = _load_processed_links(output_filename)
+
+    seller_cache = _open_seller_cache()
+    ai_cache = _open_ai_cache()
+    # 两级分析：先用纯文本模型按任务的简短需求初筛
+    screening_criteria = (
+        build_screening_criteria(task_config)
+        if _as_bool(task_config.get("ai_screening"), AI_SCREENING_ENABLED)
+        else None
+    )
+    ai_prompt_fingerprint = prompt_fingerprint(
+        f"{ai_prompt_text}\n{screening_criteria}" if screening_criteria else ai_prompt_text
+    )
+
+    # 翻页停止策略：连续 N 页全部是已处理商品，或整页发布时间早于上次成功运行的高水位
+    pagination_settings = _get_pagination_settings(task_config)
+    watermark_task = task_config.get('task_name') or keyword
+    watermark_store = _open_watermark_store() if pagination_settings["use_watermark"] else None
+    high_water_ts = watermark_store.get(watermark_task) if watermark_store else None
+    page_scheduler: Optional[_PageScheduler] = None
+    if high_water_ts:
+        print(f"LOG: 上次成功运行的发布时间高水位为 {datetime.fromtimestamp(high_water_ts).strftime('%Y-%m-%d %H:%M')}。")
 
     rotation_settings = _get_rotation_settings(task_config)
     forced_account = task_config.get("account_state_file") or None
@@ -265,81 +772,458 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
         return picked or selected_proxy
 
     async def _run_scrape_attempt(state_file: str, proxy_server: Optional[str]) -> int:
+        nonlocal page_scheduler
         processed_item_count = 0
-        stop_scraping = False
+        detail_concurrency = max(1, _as_int(task_config.get("detail_concurrency"), 1))
+        ai_concurrency = max(1, _as_int(task_config.get("ai_concurrency"), _as_int(os.getenv("AI_CONCURRENCY"), 2)))
+        queue_size = max(1, _as_int(os.getenv("PIPELINE_QUEUE_SIZE"), detail_concurrency * 2))
+        account_limiter = get_account_limiter(state_file)
+        profile_limits = _get_profile_limits(task_config)
+        filter_mode = (task_config.get("filter_mode") or os.getenv("SEARCH_FILTER_MODE", "ui")).lower()
+        fetch_mode = (task_config.get("fetch_mode") or os.getenv("FETCH_MODE", "browser")).lower()
+        # 浏览器模式下获取详情的方式: page 每个商品新开页面；reuse 复用常驻详情页；request 通过 context.request 直接请求接口
+        detail_fetch_mode = (task_config.get("detail_fetch_mode") or os.getenv("DETAIL_FETCH_MODE", "page")).lower()
+        # 从详情页捕获已加载的商品图片，图片阶段只下载未捕获到的图片
+        capture_images = _as_bool(task_config.get("capture_images"), _as_bool(os.getenv("IMAGE_CAPTURE_ENABLED"), False))
+        image_capture_wait = max(0, _as_int(os.getenv("IMAGE_CAPTURE_WAIT_SECONDS"), 3))
+        ai_image_budget = max(0, _as_int(task_config.get("ai_image_budget"), AI_IMAGE_BUDGET))
+        ai_payload_token_budget = max(
+            0, _as_int(task_config.get("ai_payload_token_budget"), AI_PAYLOAD_TOKEN_BUDGET)
+        )
+        profile_parallel_pages = _as_bool(
+            task_config.get("profile_parallel_pages"), _as_bool(os.getenv("PROFILE_PARALLEL_PAGES"), False)
+        )
+        page_scheduler = _PageScheduler(
+            processed_links,
+            stop_after_known_pages=pagination_settings["stop_after_known_pages"],
+            high_water_ts=high_water_ts,
+            debug_limit=debug_limit,
+        )
+        item_latencies = []
+
+        # --- 获取任务配置的开关 ---
+        from src.config import SKIP_AI_ANALYSIS
+        task_name = task_config.get('task_name', 'default')
+        task_enable_ai_analysis = task_config.get('enable_ai_analysis', True)
+        task_download_images = task_config.get('download_images', True)
+        task_permanent_images = task_config.get('permanent_images', False)
+
+        # 检查是否跳过AI分析（全局环境变量）
+        if SKIP_AI_ANALYSIS:
+            log_time("环境变量 SKIP_AI_ANALYSIS 已设置，跳过AI分析并直接发送通知...")
+            task_enable_ai_analysis = False
+        # 图片只用于 AI 分析、不永久保存时，直接在内存中下载并发送，不写入任务目录
+        use_memory_images = (
+            task_enable_ai_analysis
+            and bool(ai_prompt_text)
+            and not task_permanent_images
+            and _as_bool(task_config.get("in_memory_images"), IMAGE_IN_MEMORY_ENABLED)
+        )
+
+        async def _capture_detail_response(
+            detail_page, item_data: dict, label: str, capture: Optional[DetailImageCapture] = None
+        ) -> Optional[dict]:
+            """
+            在 detail_page 中打开商品详情页并捕获详情API的响应，加载耗时按 label 统计。
+            传入 capture 时同时保存页面加载的商品图片。
+            """
+            if capture:
+                await capture.attach(detail_page)
+            try:
+                async with account_limiter.slot():
+                    async with detail_page.expect_response(lambda r: DETAIL_API_URL_PATTERN in r.url, timeout=25000) as detail_info:
+                        await timed_goto(
+                            detail_page, item_data["商品链接"], label, wait_until="domcontentloaded", timeout=25000
+                        )
+
+                detail_response = await detail_info.value
+                if not detail_response.ok:
+                    print(f"   错误: 获取商品详情API响应失败，状态码: {detail_response.status}")
+                    if AI_DEBUG_MODE:
+                        print(f"--- [DETAIL DEBUG] FAILED RESPONSE from {item_data['商品链接']} ---")
+                        try:
+                            print(await detail_response.text())
+                        except Exception as e:
+                            print(f"无法读取响应内容: {e}")
+                        print("----------------------------------------------------")
+                    return None
+
+                detail_json = await detail_response.json()
+                if capture:
+                    capture.expect_from_detail(detail_json)
+                    await capture.wait(image_capture_wait)
+                return detail_json
+            except PlaywrightTimeoutError:
+                print(f"   错误: 访问商品详情页或等待API响应超时。")
+                return None
+            finally:
+                if capture:
+                    await capture.detach()
 
-        if not os.path.exists(state_file):
-            raise FileNotFoundError(f"登录状态文件不存在: {state_file}")
+        async def _fetch_detail_via_page(item_data: dict, capture: Optional[DetailImageCapture]) -> Optional[dict]:
+            """浏览器模式(page): 每个商品新开一个详情页，用完即关闭。"""
+            detail_page = await context.new_page()
+            try:
+                return await _capture_detail_response(detail_page, item_data, "详情页", capture)
+            finally:
+                await detail_page.close()
 
-        async with async_playwright() as p:
-            # 反检测启动参数
-            launch_args = [
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-web-security',
-                '--disable-features=IsolateOrigins,site-per-process'
-            ]
-
-            launch_kwargs = {"headless": RUN_HEADLESS, "args": launch_args}
-            if proxy_server:
-                launch_kwargs["proxy"] = {"server": proxy_server}
-
-            if LOGIN_IS_EDGE:
-                launch_kwargs["channel"] = "msedge"
+        async def _fetch_detail_via_reused_page(item_data: dict, capture: Optional[DetailImageCapture]) -> Optional[dict]:
+            """浏览器模式(reuse): 每个详情 worker 复用一个常驻页面，在原页面内跳转到下一个商品。"""
+            detail_page = idle_detail_pages.pop() if idle_detail_pages else await context.new_page()
+            reusable = False
+            try:
+                detail_json = await _capture_detail_response(detail_page, item_data, "详情页(复用)", capture)
+                reusable = True
+                return detail_json
+            finally:
+                if reusable:
+                    idle_detail_pages.append(detail_page)
+                else:
+                    await detail_page.close()
+
+        async def _fetch_detail_via_request(item_data: dict) -> Optional[dict]:
+            """浏览器模式(request): 通过 context.request 直接请求详情接口，与页面共享 Cookie，不渲染页面。"""
+            started = time.perf_counter()
+            try:
+                async with account_limiter.slot():
+                    return await call_mtop_in_context(context, DETAIL_API, {"itemId": str(item_data["商品ID"])})
+            except Exception as e:
+                print(f"   错误: 请求商品详情接口失败: {e}")
+                return None
+            finally:
+                record_load_time(context, "详情接口", time.perf_counter() - started)
+
+        async def _fetch_detail_via_api(item_data: dict) -> Optional[dict]:
+            """接口模式: 直接调用详情接口。"""
+            try:
+                async with account_limiter.slot():
+                    return await api_client.item_detail(item_data["商品ID"])
+            except httpx.HTTPError as e:
+                print(f"   错误: 请求商品详情接口失败: {e}")
+                return None
+
+        async def _detail_stage(job: ItemJob) -> Optional[ItemJob]:
+            """阶段: 获取商品详情API数据并补充商品信息。"""
+            item_data = job.item_data
+            capture = DetailImageCapture() if capture_images else None
+            try:
+                if api_client is not None:
+                    detail_json = await _fetch_detail_via_api(item_data)
+                elif detail_fetch_mode == "request":
+                    detail_json = await _fetch_detail_via_request(item_data)
+                elif detail_fetch_mode == "reuse":
+                    detail_json = await _fetch_detail_via_reused_page(item_data, capture)
+                else:
+                    detail_json = await _fetch_detail_via_page(item_data, capture)
+                if detail_json is None:
+                    return None
+                if capture and capture.images:
+                    job.captured_images = capture.images
+                    log_time(f"[图片] 从详情页捕获 {len(capture.images)}/{len(capture.wanted)} 张商品图片。")
+
+                ret_string = str(await safe_get(detail_json, 'ret', default=[]))
+                if "FAIL_SYS_USER_VALIDATE" in ret_string:
+                    print("\n==================== CRITICAL BLOCK DETECTED ====================")
+                    print("检测到闲鱼反爬虫验证 (FAIL_SYS_USER_VALIDATE)，程序将终止。")
+                    long_sleep_duration = random.randint(3, 60)
+                    print(f"为避免账户风险，将执行一次长时间休眠 ({long_sleep_duration} 秒) 后再退出...")
+                    await asyncio.sleep(long_sleep_duration)
+                    print("长时间休眠结束，现在将安全退出。")
+                    print("===================================================================")
+                    raise RiskControlError("FAIL_SYS_USER_VALIDATE")
+
+                # 解析商品详情数据并更新 item_data
+                detail = await parse_item_detail(detail_json, item_data)
+                job.seller_id = detail["seller_id"]
+                job.seller_extra = detail["seller_extra"]
+                return job
+            finally:
+                # --- 修改: 增加关闭页面后的短暂整理时间 ---
+                await random_sleep(2, 4) # 原来是 (1, 2.5)
+
+        async def _seller_stage(job: ItemJob) -> ItemJob:
+            """阶段: 采集卖家主页信息并构建基础记录。"""
+            user_profile_data = {}
+            if job.seller_id:
+                cached_profile = seller_cache.get(job.seller_id) if seller_cache else None
+                if cached_profile is not None:
+                    log_time(f"[卖家缓存] 命中卖家 {job.seller_id} 的缓存信息，跳过主页采集。")
+                    user_profile_data = cached_profile
+                else:
+                    previous_profile, reputation = None, ReputationCounter()
+                    if seller_cache:
+                        stale_entry = seller_cache.get_entry(job.seller_id)
+                        reputation_state = seller_cache.get_reputation_state(job.seller_id)
+                        if stale_entry and reputation_state is not None:
+                            log_time(f"[卖家缓存] 卖家 {job.seller_id} 的缓存已过期，进行增量同步。")
+                            previous_profile = stale_entry[0]
+                            reputation = ReputationCounter.from_state(reputation_state)
+                    async with account_limiter.slot():
+                        if api_client is not None:
+                            user_profile_data = await fetch_user_profile_via_api(
+                                api_client,
+                                job.seller_id,
+                                previous_profile=previous_profile,
+                                reputation=reputation,
+                                limits=profile_limits,
+                            )
+                        else:
+                            user_profile_data = await scrape_user_profile(
+                                context,
+                                job.seller_id,
+                                previous_profile=previous_profile,
+                                reputation=reputation,
+                                limits=profile_limits,
+                                parallel_pages=profile_parallel_pages,
+                            )
+                    if seller_cache and user_profile_data:
+                        seller_cache.put(job.seller_id, user_profile_data, reputation_state=reputation.to_state())
+            else:
+                print("   [警告] 未能从详情API中获取到卖家ID。")
+            user_profile_data.update(job.seller_extra)
+
+            # 构建基础记录
+            job.final_record = {
+                "爬取时间": datetime.now().isoformat(),
+                "搜索关键字": keyword,
+                "任务名称": task_config.get('task_name', 'Untitled Task'),
+                "商品信息": job.item_data,
+                "卖家信息": user_profile_data
+            }
+
+            # --- 修改: 增加单个商品处理后的主要延迟 ---
+            log_time("[反爬] 执行一次主要的随机延迟以模拟用户浏览间隔...")
+            await random_sleep(15, 30) # 原来是 (8, 15)，这是最重要的修改之一
+            return job
+
+        async def _image_stage(job: ItemJob) -> ItemJob:
+            """阶段: 根据配置下载商品图片。"""
+            if use_memory_images:
+                job.image_data = await download_images_to_memory(
+                    job.item_data['商品ID'], job.item_data.get('商品图片列表', []), captured=job.captured_images
+                )
+                job.captured_images = {}
+            elif task_download_images or task_enable_ai_analysis:
+                image_urls = job.item_data.get('商品图片列表', [])
+                job.image_paths = await download_all_images(
+                    job.item_data['商品ID'], image_urls, task_name, captured=job.captured_images
+                )
+                job.captured_images = {}
+            else:
+                log_time("配置不下载图片，跳过图片下载...")
+            return job
+
+        async def _cached_ai_analysis(job: ItemJob, images: list) -> Optional[dict]:
+            """命中 AI 结果缓存时直接返回带 cached 标记的结论，否则调用 AI 并缓存格式正确的结果。"""
+            cache_key = None
+            if ai_cache:
+                image_hashes = await asyncio.get_running_loop().run_in_executor(None, image_fingerprints, images)
+                cache_key = AIVerdictCache.make_key(
+                    listing_fingerprint(job.item_data, job.seller_id, image_hashes), ai_prompt_fingerprint
+                )
+                cached = ai_cache.get(cache_key)
+                if cached:
+                    log_time(f"[AI缓存] 商品 #{job.item_data['商品ID']} 命中AI分析缓存，跳过AI调用。")
+                    return {**cached, "cached": True}
+
+            usage = {}
+            result = await get_ai_analysis(
+                job.final_record,
+                images,
+                prompt_text=ai_prompt_text,
+                image_budget=ai_image_budget,
+                usage=usage,
+                payload_token_budget=ai_payload_token_budget,
+                screening_criteria=screening_criteria,
+                screening_verdict=job.screening,
+            )
+            if cache_key and result and validate_ai_response_format(result):
+                ai_cache.put(
+                    cache_key,
+                    result,
+                    tokens=sum(usage.get(key, 0) for key in ("prompt_tokens", "completion_tokens", "screening_tokens")),
+                    seconds=usage.get("seconds", 0.0),
+                )
+            return result
+
+        async def _ai_stage(job: ItemJob) -> ItemJob:
+            """阶段: 根据配置进行AI分析，并清理非永久保存的图片。"""
+            item_data, final_record = job.item_data, job.final_record
+            if task_enable_ai_analysis and ai_prompt_text:
+                log_time(f"开始对商品 #{item_data['商品ID']} 进行实时AI分析...")
+                try:
+                    # 注意：这里我们将整个记录传给AI，让它拥有最全的上下文
+                    # 内存中的图片交给 AI 请求后即从任务中释放
+                    images, job.image_data = job.image_data or job.image_paths, []
+                    job.ai_result = await _cached_ai_analysis(job, images)
+                    if job.ai_result:
+                        final_record['ai_analysis'] = job.ai_result
+                        log_time(f"AI分析完成。推荐状态: {job.ai_result.get('is_recommended')}")
+                    else:
+                        final_record['ai_analysis'] = {'error': 'AI analysis returned None after retries.'}
+                except Exception as e:
+                    print(f"   -> AI分析过程中发生严重错误: {e}")
+                    final_record['ai_analysis'] = {'error': str(e)}
+            elif not task_enable_ai_analysis:
+                log_time("任务配置关闭了AI分析，跳过AI分析...")
+                final_record['ai_analysis'] = {'skipped': True, 'reason': 'AI分析已禁用'}
+            else:
+                print("   -> 任务未配置AI prompt，跳过分析。")
+
+            # 根据配置删除图片（如果不永久保存）
+            if not task_permanent_images:
+                for img_path in job.image_paths:
+                    try:
+                        if os.path.exists(img_path):
+                            os.remove(img_path)
+                            print(f"   [图片] 已删除临时图片文件: {img_path}")
+                    except Exception as e:
+                        print(f"   [图片] 删除图片文件时出错: {e}")
             else:
-                if not RUNNING_IN_DOCKER:
-                    launch_kwargs["channel"] = "chrome"
-
-            browser = await p.chromium.launch(**launch_kwargs)
-
-            # 使用移动设备模拟（与真实Chrome移动模式一致）
-            # 基于HAR分析：真实浏览器使用Android移动设备模拟
-            context = await browser.new_context(
-                storage_state=state_file,
-                user_agent="Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Mobile Safari/537.36",
-                viewport={'width': 412, 'height': 915},  # Pixel 5尺寸
-                device_scale_factor=2.625,
-                is_mobile=True,
-                has_touch=True,
-                locale='zh-CN',
-                timezone_id='Asia/Shanghai',
-                permissions=['geolocation'],
-                geolocation={'longitude': 121.4737, 'latitude': 31.2304},
-                color_scheme='light'
+                log_time(f"已保留 {len(job.image_paths)} 张图片到: images/task_images_{task_name}/")
+            return job
+
+        async def _notify_stage(job: ItemJob) -> ItemJob:
+            """阶段: 发送通知。"""
+            item_data = job.item_data
+            if task_enable_ai_analysis:
+                # AI分析模式：只有推荐的商品才发送通知
+                if job.ai_result and job.ai_result.get('is_recommended'):
+                    log_time("商品被AI推荐，准备发送通知...")
+                    await send_ntfy_notification(item_data, job.ai_result.get("reason", "无"))
+                    log_time(f"[耗时] 商品 #{item_data['商品ID']} 从发现到通知耗时 {time.monotonic() - job.seen_at:.1f} 秒。")
+            else:
+                # 非AI分析模式：直接通知所有商品
+                log_time("商品已跳过AI分析，准备发送通知...")
+                await send_ntfy_notification(item_data, "商品已跳过AI分析，直接通知")
+                log_time(f"[耗时] 商品 #{item_data['商品ID']} 从发现到通知耗时 {time.monotonic() - job.seen_at:.1f} 秒。")
+            return job
+
+        async def _persist_stage(job: ItemJob) -> None:
+            """阶段: 保存包含AI结果的完整记录。"""
+            nonlocal processed_item_count
+            await save_to_jsonl(job.final_record, keyword)
+
+            processed_links.add(job.unique_key)
+            page_scheduler.confirm(job.unique_key)
+            processed_item_count += 1
+            item_latency = time.monotonic() - job.seen_at
+            item_latencies.append(item_latency)
+            log_time(f"商品处理流程完毕，从发现到处理完成耗时 {item_latency:.1f} 秒。累计处理 {processed_item_count} 个新商品。")
+            return None
+
+        def _build_pipeline() -> StagePipeline:
+            # 发现(翻页) → 详情 → 卖家 → 图片 → AI → 通知 → 保存，阶段之间通过有界队列连接
+            return StagePipeline(
+                [
+                    Stage("详情", _detail_stage, workers=detail_concurrency, queue_size=queue_size),
+                    Stage("卖家", _seller_stage, workers=detail_concurrency, queue_size=queue_size),
+                    Stage("图片", _image_stage, workers=2, queue_size=queue_size),
+                    Stage("AI", _ai_stage, workers=ai_concurrency, queue_size=queue_size),
+                    Stage("通知", _notify_stage, workers=1, queue_size=queue_size),
+                    Stage("保存", _persist_stage, workers=1, queue_size=queue_size),
+                ],
+                fatal_exceptions=(RiskControlError, MtopSessionError),
+                report_interval=_as_int(os.getenv("PIPELINE_REPORT_INTERVAL"), 60),
+                name=f"流水线 {task_name}",
             )
 
-            # 增强反检测脚本（模拟真实移动设备）
-            await context.add_init_script("""
-                // 移除webdriver标识
-                Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+        async def _batch_screen_page(basic_items: list) -> dict:
+            """批量初筛模式: 用搜索结果卡片信息一次性初筛本页所有新商品，返回 {unique_key: 初筛结果}。"""
+            if not (screening_criteria and task_enable_ai_analysis and ai_prompt_text and AI_SCREENING_BATCH_SIZE > 1):
+                return {}
+            new_items = {}
+            for item_data in basic_items:
+                unique_key = get_link_unique_key(item_data["商品链接"])
+                if not page_scheduler.is_known(unique_key):
+                    new_items[unique_key] = {"商品信息": item_data}
+            if not new_items:
+                return {}
+            verdicts = await screen_listings_batch(new_items, screening_criteria)
+            rejected = sum(1 for verdict in verdicts.values() if verdict and verdict["reject"])
+            log_time(f"[AI初筛] 本页 {len(new_items)} 个新商品批量初筛完成，淘汰 {rejected} 个。")
+            return {key: verdict for key, verdict in verdicts.items() if verdict}
+
+        async def _schedule_page(page_num: int, basic_items: list) -> bool:
+            """把一页搜索结果中的新商品提交到流水线，返回是否应停止翻页。"""
+            page_screening = await _batch_screen_page(basic_items)
+            return await page_scheduler.schedule_page(basic_items, pipeline, page_screening)
+
+        async def _run_api_search():
+            """接口模式: 不启动浏览器，直接调用搜索接口翻页，详情与卖家信息同样通过接口获取。"""
+            nonlocal api_client, pipeline
+            api_client = MtopClient(state_file, proxy=proxy_server)
+            pipeline = _build_pipeline()
+            pipeline.start()
+            try:
+                search_overrides = build_search_filter(personal_only, min_price, max_price)
+                log_time(f"[接口模式] 直接请求搜索接口: {keyword}")
+                for page_num in range(1, max_pages + 1):
+                    if page_scheduler.stop_scraping:
+                        break
+                    log_time(f"开始处理第 {page_num}/{max_pages} 页 ...")
+                    async with account_limiter.slot():
+                        search_json = await api_client.search(keyword, page_num, search_overrides)
+                    ret_string = " ".join(str(ret) for ret in search_json.get("ret") or [])
+                    if "FAIL_SYS_USER_VALIDATE" in ret_string or "RGV587" in ret_string:
+                        print(f"\n检测到闲鱼反爬虫验证 ({ret_string})，任务 '{keyword}' 将在此处中止。")
+                        raise RiskControlError(ret_string)
+                    if not response_succeeded(search_json):
+                        log_time(f"第 {page_num} 页接口返回失败: {ret_string}，停止翻页。")
+                        break
+
+                    basic_items = await _parse_search_results_json(search_json, f"第 {page_num} 页")
+                    if not basic_items or await _schedule_page(page_num, basic_items):
+                        break
+
+                    if not page_scheduler.stop_scraping and page_num < max_pages:
+                        print(f"--- 第 {page_num} 页处理完毕，准备翻页。执行一次页面间的长时休息... ---")
+                        await random_sleep(25, 50)
+
+                log_time(f"翻页结束，共发现 {page_scheduler.scheduled_count} 个新商品，等待流水线处理完成...")
+                await pipeline.join()
+                if pipeline.fatal_error:
+                    raise pipeline.fatal_error
+            finally:
+                await pipeline.shutdown()
+                pipeline.report()
+                log_time(f"[接口模式] 本次共发出 {api_client.calls} 次接口请求。")
+                await api_client.close()
+                api_client = None
 
-                // 模拟真实移动设备的navigator属性
-                Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
-                Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh', 'en-US', 'en']});
+        if not os.path.exists(state_file):
+            raise FileNotFoundError(f"登录状态文件不存在: {state_file}")
 
-                // 添加chrome对象
-                window.chrome = {runtime: {}, loadTimes: function() {}, csi: function() {}};
+        api_client: Optional[MtopClient] = None
+        context = None
+        idle_detail_pages = []
+        if fetch_mode == "api":
+            try:
+                await _run_api_search()
+                _log_latency_summary(item_latencies)
+                return processed_item_count
+            except MtopSessionError as e:
+                # 会话失效时才需要浏览器：未完成的商品交给浏览器模式重新处理
+                log_time(f"[接口模式] 登录会话失效，回退到浏览器模式: {e}")
+                page_scheduler.reset()
 
-                // 模拟触摸支持
-                Object.defineProperty(navigator, 'maxTouchPoints', {get: () => 5});
+        pipeline = _build_pipeline()
 
-                // 覆盖permissions查询（避免暴露自动化）
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({state: Notification.permission}) :
-                        originalQuery(parameters)
-                );
-            """)
+        async with async_playwright() as p:
+            # 优先租用共享浏览器池中的常驻 Chromium，未配置或不可用时本地冷启动
+            browser, is_shared_browser = await open_browser(p, proxy_server)
+            context = await new_scrape_context(browser, state_file, proxy_server, is_shared=is_shared_browser)
+            # 拦截图片、视频、字体和统计脚本，只保留页面与接口请求
+            await install_resource_blocking(context)
 
             page = await context.new_page()
+            pipeline.start()
 
             try:
                 # 步骤 0 - 模拟真实用户：先访问首页（重要的反检测措施）
                 log_time("步骤 0 - 模拟真实用户访问首页...")
-                await page.goto("https://www.goofish.com/", wait_until="domcontentloaded", timeout=30000)
+                await timed_goto(page, "https://www.goofish.com/", "首页", wait_until="domcontentloaded", timeout=30000)
                 log_time("[反爬] 在首页停留，模拟浏览...")
                 await random_sleep(3, 6)
 
@@ -353,11 +1237,36 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
                 search_url = f"https://www.goofish.com/search?{urlencode(params)}"
                 log_time(f"目标URL: {search_url}")
 
+                # 请求参数模式：拦截搜索接口请求并直接写入筛选条件，首次加载即为筛选后的结果
+                search_filter_route = None
+                if filter_mode == "request":
+                    search_filter_route = SearchFilterRoute(
+                        context, build_search_filter(personal_only, min_price, max_price)
+                    )
+                    await search_filter_route.install(page)
+
                 # 使用 expect_response 在导航的同时捕获初始搜索的API数据
                 async with page.expect_response(lambda r: API_URL_PATTERN in r.url, timeout=30000) as response_info:
-                    await page.goto(search_url, wait_until="domcontentloaded", timeout=60000)
+                    await timed_goto(page, search_url, "搜索页", wait_until="domcontentloaded", timeout=60000)
 
                 initial_response = await response_info.value
+                filters_applied = False
+                if search_filter_route:
+                    try:
+                        filters_applied = (
+                            search_filter_route.rewritten > 0
+                            and initial_response.ok
+                            and response_succeeded(await initial_response.json())
+                        )
+                    except Exception:
+                        filters_applied = False
+                    if not filters_applied:
+                        # 回退到界面点击：移除拦截后重新加载搜索页
+                        log_time("[筛选] 通过请求参数应用筛选失败，回退为界面操作。")
+                        await search_filter_route.remove(page)
+                        async with page.expect_response(lambda r: API_URL_PATTERN in r.url, timeout=30000) as response_info:
+                            await timed_goto(page, search_url, "搜索页", wait_until="domcontentloaded", timeout=60000)
+                        initial_response = await response_info.value
 
                 # 等待页面加载出关键筛选元素，以确认已成功进入搜索结果页
                 await page.wait_for_selector('text=新发布', timeout=15000)
@@ -409,48 +1318,51 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
                 except PlaywrightTimeoutError:
                     print("LOG: 未检测到广告弹窗。")
 
-                final_response = None
-                log_time("步骤 2 - 应用筛选条件...")
-                await page.click('text=新发布')
-                await random_sleep(2, 4) # 原来是 (1.5, 2.5)
-                async with page.expect_response(lambda r: API_URL_PATTERN in r.url, timeout=20000) as response_info:
-                    await page.click('text=最新')
-                    # --- 修改: 增加排序后的等待时间 ---
-                    await random_sleep(4, 7) # 原来是 (3, 5)
-                final_response = await response_info.value
-
-                if personal_only:
+                if filters_applied:
+                    log_time("步骤 2 - 筛选条件已通过请求参数应用，跳过界面操作。")
+                    final_response = initial_response
+                else:
+                    log_time("步骤 2 - 应用筛选条件...")
+                    await page.click('text=新发布')
+                    await random_sleep(2, 4) # 原来是 (1.5, 2.5)
                     async with page.expect_response(lambda r: API_URL_PATTERN in r.url, timeout=20000) as response_info:
-                        await page.click('text=个人闲置')
-                        # --- 修改: 将固定等待改为随机等待，并加长 ---
-                        await random_sleep(4, 6) # 原来是 asyncio.sleep(5)
+                        await page.click('text=最新')
+                        # --- 修改: 增加排序后的等待时间 ---
+                        await random_sleep(4, 7) # 原来是 (3, 5)
                     final_response = await response_info.value
 
-                if min_price or max_price:
-                    price_container = page.locator('div[class*="search-price-input-container"]').first
-                    if await price_container.is_visible():
-                        if min_price:
-                            await price_container.get_by_placeholder("¥").first.fill(min_price)
-                            # --- 修改: 将固定等待改为随机等待 ---
-                            await random_sleep(1, 2.5) # 原来是 asyncio.sleep(5)
-                        if max_price:
-                            await price_container.get_by_placeholder("¥").nth(1).fill(max_price)
-                            # --- 修改: 将固定等待改为随机等待 ---
-                            await random_sleep(1, 2.5) # 原来是 asyncio.sleep(5)
-
+                    if personal_only:
                         async with page.expect_response(lambda r: API_URL_PATTERN in r.url, timeout=20000) as response_info:
-                            await page.keyboard.press('Tab')
-                            # --- 修改: 增加确认价格后的等待时间 ---
-                            await random_sleep(4, 7) # 原来是 asyncio.sleep(5)
+                            await page.click('text=个人闲置')
+                            # --- 修改: 将固定等待改为随机等待，并加长 ---
+                            await random_sleep(4, 6) # 原来是 asyncio.sleep(5)
                         final_response = await response_info.value
-                    else:
-                        print("LOG: 警告 - 未找到价格输入容器。")
+
+                    if min_price or max_price:
+                        price_container = page.locator('div[class*="search-price-input-container"]').first
+                        if await price_container.is_visible():
+                            if min_price:
+                                await price_container.get_by_placeholder("¥").first.fill(min_price)
+                                # --- 修改: 将固定等待改为随机等待 ---
+                                await random_sleep(1, 2.5) # 原来是 asyncio.sleep(5)
+                            if max_price:
+                                await price_container.get_by_placeholder("¥").nth(1).fill(max_price)
+                                # --- 修改: 将固定等待改为随机等待 ---
+                                await random_sleep(1, 2.5) # 原来是 asyncio.sleep(5)
+
+                            async with page.expect_response(lambda r: API_URL_PATTERN in r.url, timeout=20000) as response_info:
+                                await page.keyboard.press('Tab')
+                                # --- 修改: 增加确认价格后的等待时间 ---
+                                await random_sleep(4, 7) # 原来是 asyncio.sleep(5)
+                            final_response = await response_info.value
+                        else:
+                            print("LOG: 警告 - 未找到价格输入容器。")
 
                 log_time("所有筛选已完成，开始处理商品列表...")
 
                 current_response = final_response if final_response and final_response.ok else initial_response
                 for page_num in range(1, max_pages + 1):
-                    if stop_scraping:
+                    if page_scheduler.stop_scraping:
                         break
                     log_time(f"开始处理第 {page_num}/{max_pages} 页 ...")
 
@@ -478,193 +1390,19 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
                     if not basic_items:
                         break
 
-                    total_items_on_page = len(basic_items)
-                    for i, item_data in enumerate(basic_items, 1):
-                        if debug_limit > 0 and processed_item_count >= debug_limit:
-                            log_time(f"已达到调试上限 ({debug_limit})，停止获取新商品。")
-                            stop_scraping = True
-                            break
-
-                        unique_key = get_link_unique_key(item_data["商品链接"])
-                        if unique_key in processed_links:
-                            log_time(f"[页内进度 {i}/{total_items_on_page}] 商品 '{item_data['商品标题'][:20]}...' 已存在，跳过。")
-                            continue
-
-                        log_time(f"[页内进度 {i}/{total_items_on_page}] 发现新商品，获取详情: {item_data['商品标题'][:30]}...")
-                        # --- 修改: 访问详情页前的等待时间，模拟用户在列表页上看了一会儿 ---
-                        await random_sleep(3, 6) # 原来是 (2, 4)
-
-                        detail_page = await context.new_page()
-                        try:
-                            async with detail_page.expect_response(lambda r: DETAIL_API_URL_PATTERN in r.url, timeout=25000) as detail_info:
-                                await detail_page.goto(item_data["商品链接"], wait_until="domcontentloaded", timeout=25000)
-
-                            detail_response = await detail_info.value
-                            if detail_response.ok:
-                                detail_json = await detail_response.json()
-
-                                ret_string = str(await safe_get(detail_json, 'ret', default=[]))
-                                if "FAIL_SYS_USER_VALIDATE" in ret_string:
-                                    print("\n==================== CRITICAL BLOCK DETECTED ====================")
-                                    print("检测到闲鱼反爬虫验证 (FAIL_SYS_USER_VALIDATE)，程序将终止。")
-                                    long_sleep_duration = random.randint(3, 60)
-                                    print(f"为避免账户风险，将执行一次长时间休眠 ({long_sleep_duration} 秒) 后再退出...")
-                                    await asyncio.sleep(long_sleep_duration)
-                                    print("长时间休眠结束，现在将安全退出。")
-                                    print("===================================================================")
-                                    raise RiskControlError("FAIL_SYS_USER_VALIDATE")
-
-                                # 解析商品详情数据并更新 item_data
-                                item_do = await safe_get(detail_json, 'data', 'itemDO', default={})
-                                seller_do = await safe_get(detail_json, 'data', 'sellerDO', default={})
-
-                                reg_days_raw = await safe_get(seller_do, 'userRegDay', default=0)
-                                registration_duration_text = format_registration_days(reg_days_raw)
-
-                                # --- START: 新增代码块 ---
-
-                                # 1. 提取卖家的芝麻信用信息
-                                zhima_credit_text = await safe_get(seller_do, 'zhimaLevelInfo', 'levelName')
-
-                                # 2. 提取该商品的完整图片列表
-                                image_infos = await safe_get(item_do, 'imageInfos', default=[])
-                                if image_infos:
-                                    # 使用列表推导式获取所有有效的图片URL
-                                    all_image_urls = [img.get('url') for img in image_infos if img.get('url')]
-                                    if all_image_urls:
-                                        # 用新的字段存储图片列表，替换掉旧的单个链接
-                                        item_data['商品图片列表'] = all_image_urls
-                                        # (可选) 仍然保留主图链接，以防万一
-                                        item_data['商品主图链接'] = all_image_urls[0]
-
-                                # --- END: 新增代码块 ---
-                                item_data['“想要”人数'] = await safe_get(item_do, 'wantCnt', default=item_data.get('“想要”人数', 'NaN'))
-                                item_data['浏览量'] = await safe_get(item_do, 'browseCnt', default='-')
-                                # ...[此处可添加更多从详情页解析出的商品信息]...
-
-                                # 调用核心函数采集卖家信息
-                                user_profile_data = {}
-                                user_id = await safe_get(seller_do, 'sellerId')
-                                if user_id:
-                                    # 新的、高效的调用方式:
-                                    user_profile_data = await scrape_user_profile(context, str(user_id))
-                                else:
-                                    print("   [警告] 未能从详情API中获取到卖家ID。")
-                                user_profile_data['卖家芝麻信用'] = zhima_credit_text
-                                user_profile_data['卖家注册时长'] = registration_duration_text
-
-                                # 构建基础记录
-                                final_record = {
-                                    "爬取时间": datetime.now().isoformat(),
-                                    "搜索关键字": keyword,
-                                    "任务名称": task_config.get('task_name', 'Untitled Task'),
-                                    "商品信息": item_data,
-                                    "卖家信息": user_profile_data
-                                }
-
-                                # --- START: Real-time AI Analysis & Notification ---
-                                from src.config import SKIP_AI_ANALYSIS
-
-                                # 获取任务配置的开关
-                                task_enable_ai_analysis = task_config.get('enable_ai_analysis', True)
-                                task_download_images = task_config.get('download_images', True)
-                                task_permanent_images = task_config.get('permanent_images', False)
-
-                                # 检查是否跳过AI分析（全局环境变量）
-                                if SKIP_AI_ANALYSIS:
-                                    log_time("环境变量 SKIP_AI_ANALYSIS 已设置，跳过AI分析并直接发送通知...")
-                                    task_enable_ai_analysis = False
-
-                                # 初始化变量
-                                downloaded_image_paths = []
-                                ai_analysis_result = None
-
-                                # 1. 根据配置下载图片
-                                if task_download_images or task_enable_ai_analysis:
-                                    image_urls = item_data.get('商品图片列表', [])
-                                    downloaded_image_paths = await download_all_images(item_data['商品ID'], image_urls, task_config.get('task_name', 'default'))
-                                else:
-                                    log_time("配置不下载图片，跳过图片下载...")
-
-                                # 2. 根据配置进行AI分析
-                                if task_enable_ai_analysis and ai_prompt_text:
-                                    log_time(f"开始对商品 #{item_data['商品ID']} 进行实时AI分析...")
-                                    try:
-                                        # 注意：这里我们将整个记录传给AI，让它拥有最全的上下文
-                                        ai_analysis_result = await get_ai_analysis(final_record, downloaded_image_paths, prompt_text=ai_prompt_text)
-                                        if ai_analysis_result:
-                                            final_record['ai_analysis'] = ai_analysis_result
-                                            log_time(f"AI分析完成。推荐状态: {ai_analysis_result.get('is_recommended')}")
-                                        else:
-                                            final_record['ai_analysis'] = {'error': 'AI analysis returned None after retries.'}
-                                    except Exception as e:
-                                        print(f"   -> AI分析过程中发生严重错误: {e}")
-                                        final_record['ai_analysis'] = {'error': str(e)}
-                                elif not task_enable_ai_analysis:
-                                    log_time("任务配置关闭了AI分析，跳过AI分析...")
-                                    final_record['ai_analysis'] = {'skipped': True, 'reason': 'AI分析已禁用'}
-                                else:
-                                    print("   -> 任务未配置AI prompt，跳过分析。")
-
-                                # 3. 根据配置删除图片（如果不永久保存）
-                                if not task_permanent_images:
-                                    for img_path in downloaded_image_paths:
-                                        try:
-                                            if os.path.exists(img_path):
-                                                os.remove(img_path)
-                                                print(f"   [图片] 已删除临时图片文件: {img_path}")
-                                        except Exception as e:
-                                            print(f"   [图片] 删除图片文件时出错: {e}")
-                                else:
-                                    log_time(f"已保留 {len(downloaded_image_paths)} 张图片到: images/task_images_{task_config.get('task_name', 'default')}/")
-
-                                # 4. 发送通知
-                                if task_enable_ai_analysis:
-                                    # AI分析模式：只有推荐的商品才发送通知
-                                    if ai_analysis_result and ai_analysis_result.get('is_recommended'):
-                                        log_time("商品被AI推荐，准备发送通知...")
-                                        await send_ntfy_notification(item_data, ai_analysis_result.get("reason", "无"))
-                                else:
-                                    # 非AI分析模式：直接通知所有商品
-                                    log_time("商品已跳过AI分析，准备发送通知...")
-                                    await send_ntfy_notification(item_data, "商品已跳过AI分析，直接通知")
-
-                                # --- END: Real-time AI Analysis & Notification ---
-
-                                # 4. 保存包含AI结果的完整记录
-                                await save_to_jsonl(final_record, keyword)
-
-                                processed_links.add(unique_key)
-                                processed_item_count += 1
-                                log_time(f"商品处理流程完毕。累计处理 {processed_item_count} 个新商品。")
-
-                                # --- 修改: 增加单个商品处理后的主要延迟 ---
-                                log_time("[反爬] 执行一次主要的随机延迟以模拟用户浏览间隔...")
-                                await random_sleep(15, 30) # 原来是 (8, 15)，这是最重要的修改之一
-                            else:
-                                print(f"   错误: 获取商品详情API响应失败，状态码: {detail_response.status}")
-                                if AI_DEBUG_MODE:
-                                    print(f"--- [DETAIL DEBUG] FAILED RESPONSE from {item_data['商品链接']} ---")
-                                    try:
-                                        print(await detail_response.text())
-                                    except Exception as e:
-                                        print(f"无法读取响应内容: {e}")
-                                    print("----------------------------------------------------")
-
-                        except PlaywrightTimeoutError:
-                            print(f"   错误: 访问商品详情页或等待API响应超时。")
-                        except Exception as e:
-                            print(f"   错误: 处理商品详情时发生未知错误: {e}")
-                        finally:
-                            await detail_page.close()
-                            # --- 修改: 增加关闭页面后的短暂整理时间 ---
-                            await random_sleep(2, 4) # 原来是 (1, 2.5)
+                    if await _schedule_page(page_num, basic_items):
+                        break
 
                     # --- 新增: 在处理完一页所有商品后，翻页前，增加一个更长的“休息”时间 ---
-                    if not stop_scraping and page_num < max_pages:
+                    if not page_scheduler.stop_scraping and page_num < max_pages:
                         print(f"--- 第 {page_num} 页处理完毕，准备翻页。执行一次页面间的长时休息... ---")
                         await random_sleep(25, 50)
 
+                log_time(f"翻页结束，共发现 {page_scheduler.scheduled_count} 个新商品，等待流水线处理完成...")
+                await pipeline.join()
+                if pipeline.fatal_error:
+                    raise pipeline.fatal_error
+
             except PlaywrightTimeoutError as e:
                 print(f"\n操作超时错误: 页面元素或网络响应未在规定时间内出现。\n{e}")
                 raise
@@ -672,10 +1410,16 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
                 print(f"\n爬取过程中发生未知错误: {e}")
                 raise
             finally:
+                await pipeline.shutdown()
+                pipeline.report()
+                _log_latency_summary(item_latencies)
+                log_network_stats(context)
                 log_time("任务执行完毕，浏览器将在5秒后自动关闭...")
                 await asyncio.sleep(5)
                 if debug_limit:
                     input("按回车键关闭浏览器...")
+                await context.close()
+                # 共享浏览器只断开连接，不会关闭浏览器进程
                 await browser.close()
 
         return processed_item_count
@@ -683,6 +1427,8 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
     processed_item_count = 0
     attempt_limit = max(rotation_settings["account_retry_limit"], rotation_settings["proxy_retry_limit"], 1)
     last_error = ""
+    # 所有任务共享同一个图片下载连接池，最后一个结束的任务负责关闭
+    hold_image_downloader()
 
     for attempt in range(1, attempt_limit + 1):
         if attempt == 1:
@@ -715,6 +1461,9 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
 
         try:
             processed_item_count += await _run_scrape_attempt(state_path, proxy_server)
+            newest_publish_ts = page_scheduler.watermark_ts() if page_scheduler else None
+            if watermark_store and newest_publish_ts:
+                watermark_store.advance(watermark_task, newest_publish_ts)
             break
         except RiskControlError as e:
             last_error = str(e)
@@ -729,5 +1478,24 @@ async def scrape_xianyu(task_config: dict, debug_limit: int = 0):
 
     # 清理任务图片目录
     cleanup_task_images(task_config.get('task_name', 'default'))
+    await close_image_downloader()
+
+    if seller_cache:
+        stats = seller_cache.stats()
+        log_time(
+            f"[卖家缓存] 本次命中 {stats['hits']} 次，未命中 {stats['misses']} 次 (命中率 {stats['hit_rate'] * 100:.1f}%)；"
+            f"累计命中 {stats['total_hits']} 次，未命中 {stats['total_misses']} 次，缓存卖家 {stats['entries']} 个。"
+        )
+        seller_cache.close()
+    if ai_cache:
+        stats = ai_cache.stats()
+        log_time(
+            f"[AI缓存] 本次命中 {stats['hits']} 次，未命中 {stats['misses']} 次 (命中率 {stats['hit_rate'] * 100:.1f}%)，"
+            f"节省约 {stats['tokens_saved']} tokens、{stats['seconds_saved']} 秒；"
+            f"累计命中 {stats['total_hits']} 次，节省约 {stats['total_tokens_saved']} tokens，缓存结果 {stats['entries']} 条。"
+        )
+        ai_cache.close()
+    if watermark_store:
+        watermark_store.close()
 
     return processed_item_count
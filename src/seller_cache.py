@@ -0,0 +1,113 @@
+"""
+卖家信息缓存
+以 sellerId 为键，将 scrape_user_profile 的采集结果保存到本地 SQLite（WAL 模式）。
+所有爬虫进程共享同一个数据库文件，命中缓存时可跳过打开卖家主页、滚动采集商品和评价的全过程。
+"""
+import json
+import time
+from typing import Optional, Tuple
+
+from src.config import SELLER_CACHE_DB, SELLER_CACHE_TTL_HOURS
+from src.utils import connect_sqlite
+
+
+class SellerProfileCache:
+    """基于 SQLite 的卖家信息缓存"""
+
+    def __init__(self, db_path: str = SELLER_CACHE_DB, ttl_seconds: float = SELLER_CACHE_TTL_HOURS * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self._conn = connect_sqlite(db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seller_profiles (
+                seller_id TEXT PRIMARY KEY,
+                profile_json TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(seller_profiles)").fetchall()}
+        if "reputation_json" not in columns:
+            # 旧版本数据库没有好评计数列，补充后按需全量采集一次即可
+            self._conn.execute("ALTER TABLE seller_profiles ADD COLUMN reputation_json TEXT")
+
+    def close(self):
+        self._conn.close()
+
+    def _bump(self, name: str):
+        self._conn.execute(
+            "INSERT INTO cache_stats(name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get_entry(self, seller_id: str) -> Optional[Tuple[dict, float]]:
+        """返回 (profile, updated_at)，不检查是否过期。"""
+        row = self._conn.execute(
+            "SELECT profile_json, updated_at FROM seller_profiles WHERE seller_id = ?",
+            (str(seller_id),),
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except json.JSONDecodeError:
+            return None
+
+    def get(self, seller_id: str) -> Optional[dict]:
+        """读取未过期的缓存，并记录命中/未命中。"""
+        entry = self.get_entry(seller_id)
+        if entry and time.time() - entry[1] <= self.ttl_seconds:
+            self.hits += 1
+            self._bump("hits")
+            return entry[0]
+        self.misses += 1
+        self._bump("misses")
+        return None
+
+    def get_reputation_state(self, seller_id: str) -> Optional[dict]:
+        """返回与已保存评价列表对应的好评计数状态，用于增量同步；没有记录时返回 None。"""
+        row = self._conn.execute(
+            "SELECT reputation_json FROM seller_profiles WHERE seller_id = ?",
+            (str(seller_id),),
+        ).fetchone()
+        if not row or not row[0]:
+            return None
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, seller_id: str, profile: dict, reputation_state: Optional[dict] = None):
+        self._conn.execute(
+            "INSERT INTO seller_profiles(seller_id, profile_json, updated_at, reputation_json) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(seller_id) DO UPDATE SET profile_json = excluded.profile_json, "
+            "updated_at = excluded.updated_at, reputation_json = excluded.reputation_json",
+            (
+                str(seller_id),
+                json.dumps(profile, ensure_ascii=False),
+                time.time(),
+                json.dumps(reputation_state) if reputation_state is not None else None,
+            ),
+        )
+
+    def stats(self) -> dict:
+        """当前进程及所有进程累计的命中统计。"""
+        totals = dict(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+        size = self._conn.execute("SELECT COUNT(*) FROM seller_profiles").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+            "entries": size,
+        }
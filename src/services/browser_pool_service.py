@@ -0,0 +1,179 @@
+"""
+共享浏览器池服务
+在 Web 服务进程内常驻维护若干 Chromium 实例，爬虫进程通过 CDP 连接并租用独立的 BrowserContext，
+避免每次定时任务触发都冷启动一个浏览器。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from src.browser import build_launch_kwargs
+
+
+@dataclass
+class PooledBrowser:
+    """池中的单个浏览器实例"""
+    index: int
+    port: int
+    browser: Optional[object] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    last_error: Optional[str] = None
+    healthy: bool = False
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+@dataclass
+class BrowserPoolStatus:
+    """浏览器池状态快照"""
+    enabled: bool
+    size: int
+    max_contexts: int
+    instances: List[Dict] = field(default_factory=list)
+
+
+class BrowserPoolService:
+    """共享浏览器池服务"""
+
+    def __init__(self, size: int = 1, base_port: int = 9222, max_contexts: int = 8, health_interval: int = 30):
+        self.size = max(1, size)
+        self.base_port = base_port
+        self.max_contexts = max(1, max_contexts)
+        self.health_interval = max(5, health_interval)
+        self.instances: List[PooledBrowser] = [
+            PooledBrowser(index=i, port=base_port + i) for i in range(self.size)
+        ]
+        self._playwright = None
+        self._playwright_manager = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        """启动 Playwright 及池中的全部浏览器实例"""
+        if self.running:
+            return
+        from playwright.async_api import async_playwright
+
+        self._playwright_manager = async_playwright()
+        self._playwright = await self._playwright_manager.start()
+        for instance in self.instances:
+            await self._launch(instance)
+        self._health_task = asyncio.create_task(self._health_loop())
+        print(f"共享浏览器池已启动，共 {self.size} 个实例")
+
+    async def stop(self):
+        """关闭全部浏览器实例"""
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+        for instance in self.instances:
+            await self._close(instance)
+
+        if self._playwright_manager:
+            await self._playwright_manager.__aexit__(None, None, None)
+        self._playwright = None
+        self._playwright_manager = None
+        print("共享浏览器池已关闭")
+
+    async def _launch(self, instance: PooledBrowser):
+        started = time.perf_counter()
+        try:
+            launch_kwargs = build_launch_kwargs(extra_args=[f"--remote-debugging-port={instance.port}"])
+            instance.browser = await self._playwright.chromium.launch(**launch_kwargs)
+            instance.started_at = time.time()
+            instance.healthy = True
+            instance.last_error = None
+            print(f"  -> 浏览器实例 #{instance.index} 已启动: {instance.endpoint} ({time.perf_counter() - started:.2f}s)")
+        except Exception as e:
+            instance.browser = None
+            instance.healthy = False
+            instance.last_error = f"{type(e).__name__}: {e}"
+            print(f"  -> [警告] 浏览器实例 #{instance.index} 启动失败: {e}")
+
+    async def _close(self, instance: PooledBrowser):
+        if instance.browser:
+            try:
+                await instance.browser.close()
+            except Exception as e:
+                print(f"  -> [警告] 关闭浏览器实例 #{instance.index} 时出错: {e}")
+        instance.browser = None
+        instance.healthy = False
+
+    async def check_instance(self, instance: PooledBrowser) -> bool:
+        """健康检查：进程仍然连接，且 CDP 端点可以响应"""
+        if not instance.browser or not instance.browser.is_connected():
+            return False
+        try:
+            async with httpx.AsyncClient(timeout=5) as http:
+                response = await http.get(f"{instance.endpoint}/json/version")
+                return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def check_health(self):
+        """检查全部实例，异常实例会被重启"""
+        async with self._lock:
+            for instance in self.instances:
+                instance.healthy = await self.check_instance(instance)
+                if not instance.healthy:
+                    print(f"  -> [浏览器池] 实例 #{instance.index} 健康检查失败，正在重启...")
+                    await self._close(instance)
+                    await self._launch(instance)
+                    instance.restarts += 1
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"  -> [浏览器池] 健康检查出错: {e}")
+
+    def select_endpoint(self, active_leases: Dict[str, int]) -> Optional[str]:
+        """
+        选择当前负载最低的健康实例。
+        active_leases 为 {endpoint: 正在使用该实例的任务数}；全部实例满载时返回 None，由爬虫自行冷启动。
+        """
+        candidates = [
+            instance for instance in self.instances
+            if instance.healthy and active_leases.get(instance.endpoint, 0) < self.max_contexts
+        ]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda instance: active_leases.get(instance.endpoint, 0))
+        return best.endpoint
+
+    def status(self, active_leases: Optional[Dict[str, int]] = None) -> BrowserPoolStatus:
+        active_leases = active_leases or {}
+        return BrowserPoolStatus(
+            enabled=self.running,
+            size=self.size,
+            max_contexts=self.max_contexts,
+            instances=[
+                {
+                    "index": instance.index,
+                    "endpoint": instance.endpoint,
+                    "healthy": instance.healthy,
+                    "leases": active_leases.get(instance.endpoint, 0),
+                    "restarts": instance.restarts,
+                    "uptime_seconds": round(time.time() - instance.started_at) if instance.started_at else 0,
+                    "last_error": instance.last_error,
+                }
+                for instance in self.instances
+            ],
+        )
@@ -7,16 +7,36 @@ import sys
 import os
 import signal
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 from src.utils import build_task_log_path
 
 
 class ProcessService:
     """进程管理服务"""
 
-    def __init__(self):
+    def __init__(self, browser_pool=None):
         self.processes: Dict[int, asyncio.subprocess.Process] = {}
         self.log_paths: Dict[int, str] = {}
+        self.browser_pool = browser_pool
+        self.browser_endpoints: Dict[int, str] = {}
+
+    def active_browser_leases(self) -> Dict[str, int]:
+        """统计每个共享浏览器实例上正在运行的任务数"""
+        leases: Dict[str, int] = {}
+        for task_id, endpoint in list(self.browser_endpoints.items()):
+            if not self.is_running(task_id):
+                del self.browser_endpoints[task_id]
+                continue
+            leases[endpoint] = leases.get(endpoint, 0) + 1
+        return leases
+
+    def _lease_browser_endpoint(self, task_id: int) -> Optional[str]:
+        if not self.browser_pool or not self.browser_pool.running:
+            return None
+        endpoint = self.browser_pool.select_endpoint(self.active_browser_leases())
+        if endpoint:
+            self.browser_endpoints[task_id] = endpoint
+        return endpoint
 
     def is_running(self, task_id: int) -> bool:
         """检查任务是否正在运行"""
@@ -38,6 +58,9 @@ class ProcessService:
             child_env = os.environ.copy()
             child_env["PYTHONIOENCODING"] = "utf-8"
             child_env["PYTHONUTF8"] = "1"
+            browser_endpoint = self._lease_browser_endpoint(task_id)
+            if browser_endpoint:
+                child_env["BROWSER_CDP_ENDPOINT"] = browser_endpoint
 
             process = await asyncio.create_subprocess_exec(
                 sys.executable, "-u", "spider_v2.py", "--task-name", task_name,
@@ -49,12 +72,16 @@ class ProcessService:
 
             self.processes[task_id] = process
             self.log_paths[task_id] = log_file_path
-            print(f"启动任务 '{task_name}' (PID: {process.pid})")
+            if browser_endpoint:
+                print(f"启动任务 '{task_name}' (PID: {process.pid})，使用共享浏览器 {browser_endpoint}")
+            else:
+                print(f"启动任务 '{task_name}' (PID: {process.pid})")
             return True
 
         except Exception as e:
             if task_id in self.log_paths:
                 del self.log_paths[task_id]
+            self.browser_endpoints.pop(task_id, None)
             print(f"启动任务 '{task_name}' 失败: {e}")
             return False
 
@@ -0,0 +1,45 @@
+"""
+任务运行状态
+按任务名称记录上一次成功运行时看到的最新商品发布时间（高水位），
+下一次运行翻页到发布时间早于高水位的页面时即可停止。数据保存在共享的 SQLite 中。
+"""
+import time
+from typing import Optional
+
+from src.config import TASK_STATE_DB
+from src.utils import connect_sqlite
+
+
+class TaskWatermarkStore:
+    """基于 SQLite 的任务高水位存储"""
+
+    def __init__(self, db_path: str = TASK_STATE_DB):
+        self.db_path = db_path
+        self._conn = connect_sqlite(db_path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS task_watermarks (
+                task_name TEXT PRIMARY KEY,
+                high_water_ts REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, task_name: str) -> Optional[float]:
+        row = self._conn.execute(
+            "SELECT high_water_ts FROM task_watermarks WHERE task_name = ?", (task_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def advance(self, task_name: str, high_water_ts: float):
+        """只向前推进高水位，不会被较早的时间覆盖。"""
+        self._conn.execute(
+            "INSERT INTO task_watermarks(task_name, high_water_ts, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(task_name) DO UPDATE SET "
+            "high_water_ts = MAX(high_water_ts, excluded.high_water_ts), updated_at = excluded.updated_at",
+            (task_name, high_water_ts, time.time()),
+        )
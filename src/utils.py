@@ -5,6 +5,7 @@ import os
 import random
 import re
 import glob
+import sqlite3
 from datetime import datetime
 from functools import wraps
 from urllib.parse import quote
@@ -13,9 +14,10 @@ from openai import APIStatusError
 from requests.exceptions import HTTPError
 
 
-def retry_on_failure(retries=3, delay=5):
+def retry_on_failure(retries=3, delay=5, give_up_on=()):
     """
     一个通用的异步重试装饰器，增加了对HTTP错误的详细日志记录。
+    give_up_on 中的异常已由调用方自行等待/重试过，不再重试，直接返回 None。
     """
     def decorator(func):
         @wraps(func)
@@ -23,6 +25,9 @@ def retry_on_failure(retries=3, delay=5):
             for i in range(retries):
                 try:
                     return await func(*args, **kwargs)
+                except give_up_on as e:
+                    print(f"函数 {func.__name__} 失败且不再重试: {type(e).__name__} - {e}")
+                    return None
                 except (APIStatusError, HTTPError) as e:
                     print(f"函数 {func.__name__} 第 {i + 1}/{retries} 次尝试失败，发生HTTP错误。")
                     if hasattr(e, 'status_code'):
@@ -122,14 +127,37 @@ async def save_to_jsonl(data_record: dict, keyword: str):
     output_dir = "jsonl"
     os.makedirs(output_dir, exist_ok=True)
     filename = os.path.join(output_dir, f"{keyword.replace(' ', '_')}_full_data.jsonl")
+    line = (json.dumps(data_record, ensure_ascii=False) + "\n").encode("utf-8")
     try:
-        with open(filename, "a", encoding="utf-8") as f:
-            f.write(json.dumps(data_record, ensure_ascii=False) + "\n")
-        return True
+        with open(filename, "ab") as f:
+            f.write(line)
+            end = f.tell()
     except IOError as e:
         print(f"写入文件 {filename} 出错: {e}")
         return False
 
+    # 同步更新去重索引，下次启动时无需重新解析整个文件
+    link = data_record.get('商品信息', {}).get('商品链接', '')
+    if link:
+        try:
+            from src.dedup_index import get_dedup_index
+            get_dedup_index().record_append(keyword, link, end - len(line), end)
+        except Exception as e:
+            print(f"   [警告] 更新去重索引失败，将在下次启动时补充: {e}")
+    return True
+
+
+def connect_sqlite(db_path: str) -> sqlite3.Connection:
+    """打开一个可在多个爬虫进程间共享的 SQLite 连接（WAL 模式 + busy_timeout）。"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
 
 def format_registration_days(total_days: int) -> str:
     """
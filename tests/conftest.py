@@ -96,3 +96,11 @@ def api_context(tmp_path):
 @pytest.fixture()
 def api_client(api_context):
     return TestClient(api_context["app"])
+
+
+@pytest.fixture(autouse=True)
+def disable_ai_rate_limit(monkeypatch):
+    # Keep AI calls in tests away from the shared limiter database; the limiter has its own tests
+    from src import ai_rate_limit
+
+    monkeypatch.setattr(ai_rate_limit, "AI_RATE_LIMIT_ENABLED", False)
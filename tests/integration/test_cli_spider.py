@@ -54,3 +54,47 @@ def test_cli_runs_single_task_with_prompt(tmp_path, load_json_fixture, monkeypat
     asyncio.run(spider_v2.main())
 
     assert called == ["Sony A7M4"]
+
+
+def test_cli_logs_process_wide_stats_once_after_all_tasks(tmp_path, load_json_fixture, monkeypatch):
+    fake_scraper = types.ModuleType("src.scraper")
+    fake_scraper.scrape_xianyu = None
+    monkeypatch.setitem(sys.modules, "src.scraper", fake_scraper)
+    sys.modules.pop("spider_v2", None)
+    spider_v2 = importlib.import_module("spider_v2")
+
+    config_data = load_json_fixture("config.sample.json")
+    for task in config_data:
+        task["enabled"] = True
+        task.pop("ai_prompt_base_file", None)
+        task.pop("ai_prompt_criteria_file", None)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config_data, ensure_ascii=False), encoding="utf-8")
+    state_path = tmp_path / "state.json"
+    state_path.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(spider_v2, "STATE_FILE", str(state_path))
+
+    events = []
+    task_names = [task["task_name"] for task in config_data]
+
+    async def fake_scrape_xianyu(task_config, debug_limit):
+        # 任务依次结束，统计仍只在所有任务结束后输出
+        await asyncio.sleep(0.05 * task_names.index(task_config["task_name"]))
+        events.append(("task", task_config["task_name"]))
+        return 0
+
+    monkeypatch.setattr(spider_v2, "scrape_xianyu", fake_scrape_xianyu)
+    for name in ("log_image_store_stats", "log_ai_usage_stats", "log_tier_stats", "log_ai_rate_limit_stats"):
+        monkeypatch.setattr(spider_v2, name, lambda *args, name=name: events.append(("stats", name)))
+    monkeypatch.setattr(sys, "argv", ["spider_v2.py", "--config", str(config_path)])
+
+    asyncio.run(spider_v2.main())
+
+    task_events = [event for event in events if event[0] == "task"]
+    assert len(task_events) == len(config_data)
+    assert events[len(task_events):] == [
+        ("stats", "log_image_store_stats"),
+        ("stats", "log_ai_usage_stats"),
+        ("stats", "log_tier_stats"),
+        ("stats", "log_ai_rate_limit_stats"),
+    ]
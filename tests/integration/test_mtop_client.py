@@ -0,0 +1,200 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import httpx
+import pytest
+
+from src import scraper
+from src.mtop import mtop_sign
+from src.mtop_client import MtopClient, MtopSessionError, call_mtop_in_context, load_storage_cookies
+from src.parsers import _parse_search_results_json, parse_item_detail
+
+DETAIL_JSON = {
+    "ret": ["SUCCESS::调用成功"],
+    "data": {
+        "itemDO": {
+            "imageInfos": [{"url": "https://img.example.com/1.jpg"}, {"url": "https://img.example.com/2.jpg"}],
+            "wantCnt": 12,
+            "browseCnt": 345,
+            "desc": "镜头无划痕，快门数 3000",
+        },
+        "sellerDO": {"sellerId": 2200, "userRegDay": 800, "zhimaLevelInfo": {"levelName": "极好"}},
+    },
+}
+
+
+class StandInServer:
+    """回放录制数据的本地 mtop 接口，校验签名并模拟 token 过期后通过 Set-Cookie 下发新 token。"""
+
+    def __init__(self, responses: dict, session_expired: bool = False):
+        self.responses = responses
+        self.session_expired = session_expired
+        self.token = "fresh"
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, payload: dict, set_cookie: str = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if set_cookie:
+                    self.send_header("Set-Cookie", set_cookie)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length", 0))
+                data = dict(parse_qsl(self.rfile.read(length).decode("utf-8")))["data"]
+                server.requests.append((query["api"], json.loads(data)))
+                if server.session_expired:
+                    self._send({"ret": ["FAIL_SYS_SESSION_EXPIRED::Session过期"]})
+                    return
+                if query["sign"] != mtop_sign(server.token, query["t"], data):
+                    self._send(
+                        {"ret": ["FAIL_SYS_TOKEN_EXOIRED::令牌过期"]},
+                        set_cookie=f"_m_h5_tk={server.token}_1700000000000; Path=/",
+                    )
+                    return
+                self._send({"ret": ["SUCCESS::调用成功"], **server.responses[query["api"]]})
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture()
+def recorded_responses(load_json_fixture):
+    return {
+        "mtop.taobao.idlemtopsearch.pc.search": load_json_fixture("search_results.json"),
+        "mtop.taobao.idle.pc.detail": {"data": DETAIL_JSON["data"]},
+        "mtop.idle.web.user.page.head": load_json_fixture("user_head.json"),
+        "mtop.idle.web.xyh.item.list": {"data": {"cardList": load_json_fixture("user_items.json"), "nextPage": False}},
+        "mtop.idle.web.trade.rate.list": {"data": {"cardList": load_json_fixture("ratings.json"), "nextPage": False}},
+    }
+
+
+def _stale_token_cookies() -> httpx.Cookies:
+    cookies = httpx.Cookies()
+    cookies.set("_m_h5_tk", "stale_1600000000000")
+    return cookies
+
+
+def test_client_refreshes_token_and_feeds_existing_parsers(recorded_responses):
+    async def run():
+        with StandInServer(recorded_responses) as server:
+            async with MtopClient(base_url=server.base_url, cookies=_stale_token_cookies()) as client:
+                search_json = await client.search("sony a7m4", 2, {"sortField": "create"})
+                detail_json = await client.item_detail("123456")
+                return server.requests, client.calls, search_json, detail_json
+
+    requests, calls, search_json, detail_json = asyncio.run(run())
+
+    # 第一次因 token 过期被拒绝，使用 Set-Cookie 下发的新 token 重新签名后成功
+    assert calls == 3
+    assert [api for api, _ in requests] == [
+        "mtop.taobao.idlemtopsearch.pc.search",
+        "mtop.taobao.idlemtopsearch.pc.search",
+        "mtop.taobao.idle.pc.detail",
+    ]
+    assert requests[1][1]["pageNumber"] == 2 and requests[1][1]["sortField"] == "create"
+
+    items = asyncio.run(_parse_search_results_json(search_json, "test"))
+    assert items[0]["商品ID"] == "123456"
+    item_data = dict(items[0])
+    detail = asyncio.run(parse_item_detail(detail_json, item_data))
+    assert detail["seller_id"] == "2200"
+    assert item_data["商品图片列表"] == ["https://img.example.com/1.jpg", "https://img.example.com/2.jpg"]
+    assert item_data["浏览量"] == 345
+    assert item_data["商品描述"] == "镜头无划痕，快门数 3000"
+
+
+def test_fetch_user_profile_via_api(recorded_responses):
+    async def run():
+        with StandInServer(recorded_responses) as server:
+            async with MtopClient(base_url=server.base_url, cookies=_stale_token_cookies()) as client:
+                return await scraper.fetch_user_profile_via_api(client, "2200")
+
+    async def no_sleep(*_):
+        return None
+
+    original_sleep = scraper.random_sleep
+    scraper.random_sleep = no_sleep
+    try:
+        profile = asyncio.run(run())
+    finally:
+        scraper.random_sleep = original_sleep
+
+    assert profile["卖家昵称"] == "seller_01"
+    assert [item["商品ID"] for item in profile["卖家发布的商品列表"]] == ["10001", "10002"]
+    assert len(profile["卖家收到的评价列表"]) == 3
+    assert profile["商品列表是否完整"] and profile["评价列表是否完整"]
+    assert profile["作为卖家的好评数"] == "1/2"
+
+
+def test_session_expired_raises_and_storage_cookies_are_loaded(recorded_responses, tmp_path):
+    state_file = tmp_path / "state.json"
+    state_file.write_text(
+        json.dumps({"cookies": [{"name": "_m_h5_tk", "value": "abc_1700000000000", "domain": ".goofish.com", "path": "/"}]}),
+        encoding="utf-8",
+    )
+    assert load_storage_cookies(str(state_file)).get("_m_h5_tk") == "abc_1700000000000"
+
+    async def run():
+        with StandInServer(recorded_responses, session_expired=True) as server:
+            async with MtopClient(base_url=server.base_url, cookies=_stale_token_cookies()) as client:
+                await client.user_head("2200")
+
+    with pytest.raises(MtopSessionError):
+        asyncio.run(run())
+
+
+def test_call_mtop_in_context_resigns_with_refreshed_cookie():
+    class FakeAPIResponse:
+        ok, status = True, 200
+
+        def __init__(self, payload):
+            self.payload = payload
+
+        async def json(self):
+            return self.payload
+
+    class FakeContext:
+        def __init__(self):
+            self.token_cookie = "stale_1"
+            self.posts = []
+            self.request = self
+
+        async def cookies(self, urls=None):
+            return [{"name": "_m_h5_tk", "value": self.token_cookie}]
+
+        async def post(self, url, params=None, form=None, headers=None):
+            self.posts.append(params)
+            if params["sign"] != mtop_sign("fresh", params["t"], form["data"]):
+                # 浏览器 context 会把响应中的 Set-Cookie 写回共享的 Cookie
+                self.token_cookie = "fresh_2"
+                return FakeAPIResponse({"ret": ["FAIL_SYS_TOKEN_EXOIRED::令牌过期"]})
+            return FakeAPIResponse(DETAIL_JSON)
+
+    context = FakeContext()
+    payload = asyncio.run(call_mtop_in_context(context, "mtop.taobao.idle.pc.detail", {"itemId": "1"}))
+
+    assert payload == DETAIL_JSON
+    assert len(context.posts) == 2
+    assert context.posts[-1]["api"] == "mtop.taobao.idle.pc.detail"
@@ -1,9 +1,11 @@
 import asyncio
 
 from src.parsers import (
+    ReputationCounter,
     _parse_search_results_json,
     _parse_user_items_data,
     calculate_reputation_from_ratings,
+    merge_cards_by_id,
     parse_ratings_data,
     parse_user_head_data,
 )
@@ -42,3 +44,20 @@ def test_parse_ratings_and_reputation(load_json_fixture):
     reputation = asyncio.run(calculate_reputation_from_ratings(ratings_json))
     assert reputation["作为卖家的好评数"].startswith("1/")
     assert reputation["作为买家的好评数"].startswith("1/")
+
+
+def test_incremental_reputation_and_merge_match_full_parse(load_json_fixture):
+    ratings_json = load_json_fixture("ratings.json")
+    full = asyncio.run(calculate_reputation_from_ratings(ratings_json))
+
+    counter = ReputationCounter()
+    asyncio.run(counter.add_cards(ratings_json[:1]))
+    restored = ReputationCounter.from_state(counter.to_state())
+    asyncio.run(restored.add_cards(ratings_json[1:]))
+    assert restored.to_dict() == full
+
+    previous = [{"商品ID": "1", "商品状态": "在售"}, {"商品ID": "2", "商品状态": "在售"}]
+    fresh = [{"商品ID": "3", "商品状态": "在售"}, {"商品ID": "1", "商品状态": "已售"}]
+    merged = merge_cards_by_id(fresh, previous, "商品ID")
+    assert [entry["商品ID"] for entry in merged] == ["3", "1", "2"]
+    assert merged[1]["商品状态"] == "已售"
@@ -0,0 +1,170 @@
+import asyncio
+
+from src import scraper
+from src.parsers import ReputationCounter
+from src.scraper import ProfileLimits, scrape_user_profile
+
+
+class FakeResponse:
+    def __init__(self, url, payload):
+        self.url = url
+        self._payload = payload
+
+    async def json(self):
+        return self._payload
+
+
+class FakeLocator:
+    def __init__(self, page):
+        self.page = page
+
+    async def count(self):
+        return 1
+
+    async def click(self):
+        self.page.view = "ratings"
+        self.page.emit_next()
+
+
+class FakeProfilePage:
+    """模拟卖家主页：每次滚动返回下一页商品或评价。"""
+
+    def __init__(self, head, item_pages, rating_pages):
+        self.head = head
+        self.pages = {"items": list(item_pages), "ratings": list(rating_pages)}
+        self.view = "items"
+        self.handlers = []
+        self.served = {"items": 0, "ratings": 0}
+
+    def on(self, event, handler):
+        self.handlers.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.handlers.remove(handler)
+
+    def _emit(self, url, payload):
+        for handler in self.handlers:
+            asyncio.get_event_loop().create_task(handler(FakeResponse(url, payload)))
+
+    def emit_next(self):
+        queue = self.pages[self.view]
+        if not queue:
+            return
+        cards = queue.pop(0)
+        self.served[self.view] += 1
+        api = "mtop.idle.web.xyh.item.list" if self.view == "items" else "mtop.idle.web.trade.rate.list"
+        self._emit(f"https://h5api.m.goofish.com/{api}", {"data": {"cardList": cards, "nextPage": bool(queue)}})
+
+    async def goto(self, url, **kwargs):
+        self._emit("https://h5api.m.goofish.com/mtop.idle.web.user.page.head", self.head)
+        self.emit_next()
+
+    async def evaluate(self, script):
+        self.emit_next()
+
+    def locator(self, selector):
+        return FakeLocator(self)
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.opened = 0
+
+    async def new_page(self):
+        page = self.pages[min(self.opened, len(self.pages) - 1)]
+        self.opened += 1
+        return page
+
+
+def _item_cards(start, count):
+    return [{"cardData": {"id": str(i), "itemStatus": 0, "title": f"item {i}"}} for i in range(start, start + count)]
+
+
+def _rating_cards(start, count):
+    return [
+        {"cardData": {"rateId": f"r{i}", "rate": 1, "rateTagList": [{"text": "卖家"}]}}
+        for i in range(start, start + count)
+    ]
+
+
+def test_profile_limits_stop_scrolling_and_mark_partial(load_json_fixture, monkeypatch):
+    async def no_sleep(*args, **kwargs):
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(scraper, "random_sleep", no_sleep)
+    page = FakeProfilePage(
+        load_json_fixture("user_head.json"),
+        [_item_cards(0, 5), _item_cards(5, 5), _item_cards(10, 5)],
+        [_rating_cards(0, 4), _rating_cards(4, 4), _rating_cards(8, 4)],
+    )
+    reputation = ReputationCounter()
+    profile = asyncio.run(
+        scrape_user_profile(
+            FakeContext(page), "1001", reputation=reputation, limits=ProfileLimits(max_items=7, max_ratings=6)
+        )
+    )
+
+    assert len(profile["卖家发布的商品列表"]) == 7
+    assert len(profile["卖家收到的评价列表"]) == 6
+    assert profile["商品列表是否完整"] is False
+    assert profile["评价列表是否完整"] is False
+    assert profile["作为卖家的好评数"] == "6/6"
+    assert page.served == {"items": 2, "ratings": 2}
+    assert reputation.seller_total == 6
+
+
+def test_incremental_profile_sync_stops_at_known_cards(load_json_fixture, monkeypatch):
+    async def no_sleep(*args, **kwargs):
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(scraper, "random_sleep", no_sleep)
+    head = load_json_fixture("user_head.json")
+    first = asyncio.run(
+        scrape_user_profile(
+            FakeContext(FakeProfilePage(head, [_item_cards(0, 3)], [_rating_cards(0, 3)])), "1001"
+        )
+    )
+    assert first["评价列表是否完整"] is True
+
+    reputation = ReputationCounter(seller_total=3, seller_positive=3)
+    # 新增了两条评价，旧评价仍在后续页面中
+    page = FakeProfilePage(
+        head,
+        [_item_cards(3, 1) + _item_cards(0, 2), _item_cards(2, 1)],
+        [_rating_cards(3, 2) + _rating_cards(0, 1), _rating_cards(1, 2)],
+    )
+    profile = asyncio.run(
+        scrape_user_profile(FakeContext(page), "1001", previous_profile=first, reputation=reputation)
+    )
+
+    assert page.served == {"items": 1, "ratings": 1}
+    assert [entry["评价ID"] for entry in profile["卖家收到的评价列表"]] == ["r3", "r4", "r0", "r1", "r2"]
+    assert len(profile["卖家发布的商品列表"]) == 4
+    assert profile["作为卖家的好评数"] == "5/5"
+
+
+def test_parallel_profile_collects_items_and_ratings_on_two_pages(load_json_fixture, monkeypatch):
+    async def no_sleep(*args, **kwargs):
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(scraper, "random_sleep", no_sleep)
+    head = load_json_fixture("user_head.json")
+    item_pages = [_item_cards(0, 3), _item_cards(3, 3)]
+    rating_pages = [_rating_cards(0, 2), _rating_cards(2, 2)]
+    items_page = FakeProfilePage(head, item_pages, rating_pages)
+    ratings_page = FakeProfilePage(head, item_pages, rating_pages)
+    context = FakeContext(items_page, ratings_page)
+
+    profile = asyncio.run(scrape_user_profile(context, "1001", parallel_pages=True))
+
+    assert context.opened == 2
+    assert profile["卖家昵称"] == "seller_01"
+    # 评价页加载时返回的商品列表不会被重复收集
+    assert len(profile["卖家发布的商品列表"]) == 6
+    assert len(profile["卖家收到的评价列表"]) == 4
+    assert items_page.served["ratings"] == 0
+    assert profile["作为卖家的好评数"] == "4/4"
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from src.ai_cache import AIVerdictCache, listing_fingerprint, price_band, prompt_fingerprint
+from src.parsers import parse_item_detail
+
+ITEM = {"商品ID": "1", "商品标题": "【自用】iPhone 15 Pro 256G", "当前售价": "5200", "商品链接": "https://a/1"}
+VERDICT = {"is_recommended": True, "reason": "ok"}
+
+
+def test_listing_fingerprint_ignores_id_formatting_small_price_changes_and_image_order():
+    relisted = {**ITEM, "商品ID": "2", "商品标题": "自用 iphone15pro 256g", "当前售价": "5,150", "商品链接": "https://a/2"}
+    base = listing_fingerprint(ITEM, "seller", ["aa", "bb"])
+
+    assert listing_fingerprint(relisted, "seller", ["bb", "aa"]) == base
+    assert listing_fingerprint({**ITEM, "当前售价": "3000"}, "seller", ["aa", "bb"]) != base
+    assert listing_fingerprint(ITEM, "other", ["aa", "bb"]) != base
+    assert listing_fingerprint(ITEM, "seller", ["aa", "cc"]) != base
+    assert price_band("1.2万") == price_band("12000") and price_band("面议") == "?"
+    assert prompt_fingerprint("p1") != prompt_fingerprint("p2")
+
+
+def test_cache_hit_miss_ttl_and_saved_cost(tmp_path):
+    db_path = str(tmp_path / "ai_verdicts.db")
+    cache = AIVerdictCache(db_path=db_path, ttl_seconds=60)
+    key = AIVerdictCache.make_key(listing_fingerprint(ITEM, "seller", []), prompt_fingerprint("prompt"))
+
+    assert cache.get(key) is None
+    cache.put(key, VERDICT, tokens=1500, seconds=4.0)
+    assert cache.get(key) == VERDICT
+
+    other = AIVerdictCache(db_path=db_path, ttl_seconds=60)
+    assert other.get(key) == VERDICT
+    stats = other.stats()
+    assert stats["hit_rate"] == 1.0 and stats["tokens_saved"] == 1500 and stats["seconds_saved"] == 4.0
+    assert stats["total_hits"] == 2 and stats["total_misses"] == 1 and stats["total_tokens_saved"] == 3000
+
+    expired = AIVerdictCache(db_path=db_path, ttl_seconds=0)
+    time.sleep(0.01)
+    assert expired.get(key) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = AIVerdictCache(db_path=str(tmp_path / "ai_verdicts.db"), ttl_seconds=60, max_entries=2)
+    cache.put("a", VERDICT)
+    cache.put("b", VERDICT)
+    time.sleep(0.01)
+    assert cache.get("a") == VERDICT
+    cache.put("c", VERDICT)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == VERDICT and cache.get("c") == VERDICT
+
+
+def test_edited_description_misses_the_cache(tmp_path):
+    cache = AIVerdictCache(db_path=str(tmp_path / "ai_verdicts.db"), ttl_seconds=60)
+
+    def key_for(desc):
+        item_data = dict(ITEM)
+        detail_json = {"data": {"itemDO": {"desc": desc}, "sellerDO": {"sellerId": 1}}}
+        detail = asyncio.run(parse_item_detail(detail_json, item_data))
+        return AIVerdictCache.make_key(
+            listing_fingerprint(item_data, detail["seller_id"], []), prompt_fingerprint("prompt")
+        )
+
+    cache.put(key_for("九成新，电池健康 95%"), VERDICT)
+    assert cache.get(key_for("九成新，电池健康 95%")) == VERDICT
+    # 只改了描述也必须重新分析
+    assert cache.get(key_for("屏幕有划痕，电池健康 80%")) is None
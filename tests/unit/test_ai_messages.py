@@ -0,0 +1,73 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from src import ai_handler
+from src.ai_handler import _response_token_usage, build_ai_messages
+
+PROMPT = "分析标准：卖家信用必须极好。"
+
+
+def test_prefix_layout_shares_the_system_prefix_across_items():
+    first = build_ai_messages('{"id":1}', PROMPT, ["data:image/jpeg;base64,AA"], "prefix")
+    second = build_ai_messages('{"id":2}', PROMPT, [], "prefix")
+
+    assert first[0] == second[0] == {"role": "system", "content": PROMPT}
+    assert first[1]["content"][0]["type"] == "text" and '{"id":1}' in first[1]["content"][0]["text"]
+    assert first[1]["content"][1]["type"] == "image_url"
+
+
+def test_legacy_layout_keeps_images_first_and_criteria_last():
+    messages = build_ai_messages('{"id":1}', PROMPT, ["data:image/jpeg;base64,AA"], "legacy")
+
+    assert len(messages) == 1 and messages[0]["role"] == "user"
+    image_part, text_part = messages[0]["content"]
+    assert image_part["type"] == "image_url"
+    assert text_part["text"].startswith(ai_handler.AI_ITEM_INSTRUCTION) and text_part["text"].endswith(f"{PROMPT}\n")
+
+
+def test_response_token_usage_reads_cached_tokens_per_provider():
+    openai_style = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=1200, completion_tokens=80, prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+    )
+    deepseek_style = SimpleNamespace(
+        usage={"prompt_tokens": 1200, "completion_tokens": 80, "prompt_cache_hit_tokens": 960}
+    )
+
+    assert _response_token_usage(openai_style) == {"prompt_tokens": 1200, "completion_tokens": 80, "cached_tokens": 1024}
+    assert _response_token_usage(deepseek_style)["cached_tokens"] == 960
+    assert _response_token_usage(SimpleNamespace(usage=None))["cached_tokens"] == 0
+
+
+def test_get_ai_analysis_sends_prefix_layout_and_records_cached_tokens(tmp_path, monkeypatch):
+    sent = []
+    verdict = {
+        "prompt_version": "1",
+        "is_recommended": True,
+        "reason": "ok",
+        "risk_tags": [],
+        "criteria_analysis": {"seller_type": {}},
+    }
+
+    async def create(**params):
+        sent.append(params)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(verdict)))],
+            usage=SimpleNamespace(prompt_tokens=900, completion_tokens=50, prompt_tokens_details={"cached_tokens": 768}),
+        )
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_handler, "client", fake_client)
+    monkeypatch.setattr(ai_handler, "AI_PROMPT_LAYOUT", "prefix")
+    monkeypatch.setattr(ai_handler, "_usage_stats", {})
+    monkeypatch.chdir(tmp_path)
+    usage = {}
+
+    result = asyncio.run(
+        ai_handler.get_ai_analysis({"商品信息": {"商品ID": "1"}}, [], prompt_text=PROMPT, usage=usage)
+    )
+
+    assert result["is_recommended"] is True
+    assert sent[0]["messages"][0] == {"role": "system", "content": PROMPT}
+    assert usage["cached_tokens"] == 768 and usage["prompt_tokens"] == 900
+    assert list(ai_handler._usage_stats.values())[0]["cached_tokens"] == 768
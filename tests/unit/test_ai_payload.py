@@ -0,0 +1,83 @@
+import copy
+import json
+
+from src.ai_payload import build_ai_payload, compact_record, estimate_tokens
+
+
+def _record(items=500, ratings=500):
+    return {
+        "爬取时间": "2026-01-01T00:00:00",
+        "搜索关键字": "macbook air m1",
+        "商品信息": {
+            "商品ID": "1",
+            "商品标题": "自用 MacBook Air M1 8+256",
+            "当前售价": "3200",
+            "商品图片列表": [f"https://img.alicdn.com/{i}.jpg" for i in range(9)],
+            "商品主图链接": "https://img.alicdn.com/0.jpg",
+        },
+        "卖家信息": {
+            "卖家昵称": "seller",
+            "卖家信用等级": "卖家信用极好",
+            "卖家头像链接": "https://img.alicdn.com/avatar.jpg",
+            "卖家发布的商品列表": [
+                {
+                    "商品ID": str(i),
+                    "商品标题": f"闲置物品 {i} 号，九成新，可小刀",
+                    "商品价格": str(100 + i),
+                    "商品主图": f"https://img.alicdn.com/item/{i}.jpg",
+                    "商品状态": "已售" if i % 3 else "在售",
+                }
+                for i in range(items)
+            ],
+            "卖家收到的评价列表": [
+                {
+                    "评价ID": str(i),
+                    "评价内容": "卖家人很好，发货很快，东西和描述一致，推荐！" * 3,
+                    "评价类型": "好评" if i % 10 else "中评",
+                    "评价来源角色": "买家" if i % 2 else "卖家",
+                    "评价者昵称": f"buyer{i}",
+                    "评价时间": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                    "评价图片": [f"https://img.alicdn.com/rate/{i}.jpg"],
+                }
+                for i in range(ratings)
+            ],
+        },
+    }
+
+
+def test_compact_record_summarizes_seller_history_without_mutating_the_record():
+    record = _record(items=30, ratings=30)
+    original = copy.deepcopy(record)
+
+    compact = compact_record(record, top_n=5)
+
+    assert record == original
+    assert "商品图片列表" not in compact["商品信息"] and "爬取时间" not in compact
+    items = compact["卖家信息"]["卖家商品概况"]
+    assert items["总数"] == 30 and items["状态统计"] == {"在售": 10, "已售": 20}
+    assert items["价格统计"] == {"最低": 100.0, "中位数": 114.5, "最高": 129.0}
+    assert len(items["最近商品"]) == 5
+    ratings = compact["卖家信息"]["卖家评价概况"]
+    assert ratings["总数"] == 30 and sum(ratings["分类统计"].values()) == 30
+    assert [rating["时间"] for rating in ratings["最近评价"]] == sorted(
+        (rating["评价时间"] for rating in record["卖家信息"]["卖家收到的评价列表"]), reverse=True
+    )[:5]
+
+
+def test_payload_is_an_order_of_magnitude_smaller_and_respects_the_budget():
+    record = _record()
+    original_tokens = estimate_tokens(json.dumps(record, ensure_ascii=False, indent=2))
+
+    payload, tokens = build_ai_payload(record, token_budget=0)
+    assert json.loads(payload)["商品信息"]["商品ID"] == "1"
+    assert tokens * 10 <= original_tokens
+
+    small_payload, small_tokens = build_ai_payload(record, token_budget=800)
+    assert small_tokens <= 800 < tokens
+    assert estimate_tokens(small_payload) == small_tokens
+
+
+def test_estimate_tokens_counts_cjk_characters_individually():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("闲鱼") == 2
+    assert estimate_tokens("abcdef") == 2
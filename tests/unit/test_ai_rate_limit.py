@@ -0,0 +1,164 @@
+import asyncio
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from src.ai_rate_limit import AIRateLimited, AIRateLimiter, limited_completion, retry_after_seconds
+from src.utils import retry_on_failure
+
+
+def _rate_limit_error(headers):
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeClient:
+    base_url = "https://api.example.com/v1/"
+
+    def __init__(self, failures=0, headers=None, delay=0.0):
+        self.failures = failures
+        self.headers = headers or {}
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **params):
+        self.calls.append(time.monotonic())
+        if self.failures:
+            self.failures -= 1
+            raise _rate_limit_error(self.headers)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=42), choices=[])
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(_rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(_rate_limit_error({"retry-after": "3"})) == 3.0
+    assert 0 < retry_after_seconds(_rate_limit_error({"retry-after": "Fri, 01 Jan 2100 00:00:00 GMT"}))
+    assert retry_after_seconds(_rate_limit_error({})) is None
+
+
+def test_inflight_limit_is_shared_between_processes(tmp_path):
+    db_path = str(tmp_path / "limit.db")
+    first, second = AIRateLimiter(db_path, max_inflight=1), AIRateLimiter(db_path, max_inflight=1)
+    client = FakeClient(delay=0.2)
+
+    async def run():
+        await asyncio.gather(
+            limited_completion(first, client, 10),
+            limited_completion(second, client, 10),
+        )
+
+    asyncio.run(run())
+    assert client.peak == 1
+    assert first.max_waited_seconds + second.max_waited_seconds >= 0.15
+    assert first.stats()["total_requests"] == 2
+
+
+def test_rpm_and_tpm_windows(tmp_path):
+    db_path = str(tmp_path / "limit.db")
+
+    async def run():
+        by_requests = AIRateLimiter(db_path, rpm=2, max_inflight=0, max_wait=0.1)
+        by_requests.release(await by_requests.acquire("a"))
+        by_requests.release(await by_requests.acquire("a"))
+        with pytest.raises(AIRateLimited):
+            await by_requests.acquire("a")
+        # 其他服务不受影响
+        by_requests.release(await by_requests.acquire("b"))
+
+        by_tokens = AIRateLimiter(db_path, tpm=100, max_inflight=0, max_wait=0.1)
+        lease = await by_tokens.acquire("c", tokens=80)
+        with pytest.raises(AIRateLimited):
+            await by_tokens.acquire("c", tokens=30)
+        # 按实际用量修正后有余量
+        by_tokens.release(lease, tokens=50)
+        by_tokens.release(await by_tokens.acquire("c", tokens=30))
+
+    asyncio.run(run())
+
+
+def test_retry_after_pauses_all_processes(tmp_path):
+    db_path = str(tmp_path / "limit.db")
+    first, second = AIRateLimiter(db_path), AIRateLimiter(db_path)
+    client = FakeClient(failures=1, headers={"retry-after-ms": "300"})
+
+    response = asyncio.run(limited_completion(first, client, 10))
+    assert response.usage.total_tokens == 42
+    assert len(client.calls) == 2 and client.calls[1] - client.calls[0] >= 0.25
+    assert first.rate_limited == 1 and first.stats()["total_rate_limited"] == 1
+
+    second.back_off("api.example.com", 0.3)
+    started = time.monotonic()
+    asyncio.run(first.acquire("api.example.com"))
+    assert time.monotonic() - started >= 0.25
+
+
+def test_persistent_429_gives_up_without_outer_retries(tmp_path):
+    limiter = AIRateLimiter(str(tmp_path / "limit.db"), max_wait=0.3)
+    client = FakeClient(failures=100, headers={"retry-after": "0.2"})
+
+    @retry_on_failure(retries=3, delay=0, give_up_on=(AIRateLimited,))
+    async def analyze():
+        return await limited_completion(limiter, client, 10)
+
+    assert asyncio.run(analyze()) is None
+    assert len(client.calls) <= 3
+
+
+def test_leases_of_killed_processes_expire_while_live_ones_are_renewed(tmp_path):
+    db_path = str(tmp_path / "limit.db")
+    killed = AIRateLimiter(db_path, max_inflight=1, lease_ttl=0.3)
+    alive = AIRateLimiter(db_path, max_inflight=1, lease_ttl=0.3)
+    waiting = AIRateLimiter(db_path, max_inflight=1, lease_ttl=0.3, max_wait=0.2)
+
+    async def run():
+        # 被 SIGTERM 终止的进程不会执行 finally，租约只能等待过期
+        await killed.acquire("api.example.com")
+        started = time.monotonic()
+        async with alive.slot("api.example.com"):
+            waited = time.monotonic() - started
+            # 请求持续超过租约有效期时仍然持有租约
+            await asyncio.sleep(0.7)
+            with pytest.raises(AIRateLimited):
+                await waiting.acquire("api.example.com")
+        waiting.release(await waiting.acquire("api.example.com"))
+        return waited
+
+    assert 0.2 <= asyncio.run(run()) < 1.0
+
+
+def test_waiting_for_the_database_lock_does_not_block_the_event_loop(tmp_path):
+    db_path = str(tmp_path / "limit.db")
+    limiter = AIRateLimiter(db_path)
+    # 模拟其他进程长时间持有写锁
+    holder = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        asyncio.get_running_loop().call_later(0.3, holder.commit)
+        limiter.release(await limiter.acquire("api.example.com"))
+        ticking.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    holder.close()
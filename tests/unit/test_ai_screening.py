@@ -0,0 +1,185 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from src import ai_handler, ai_screening, utils
+from src.ai_screening import build_screening_criteria, screen_listing, tier_stats
+
+RECORD = {"商品信息": {"商品ID": "1", "商品标题": "MacBook Air M2 全新未拆封 批发", "当前售价": "5000"}}
+TASK = {"keyword": "macbook air m1", "description": "想要个人自用的 M1", "min_price": "2000", "max_price": "3500"}
+FULL_VERDICT = {
+    "prompt_version": "1",
+    "is_recommended": True,
+    "reason": "ok",
+    "risk_tags": [],
+    "criteria_analysis": {"seller_type": {}},
+}
+
+
+def _client(content, calls):
+    async def create(**params):
+        calls.append(params)
+        if isinstance(content, Exception):
+            raise content
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=300, completion_tokens=20),
+        )
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _setup(monkeypatch, tmp_path, screening_content):
+    screening_calls, full_calls = [], []
+    monkeypatch.setattr(ai_screening, "screening_client", _client(screening_content, screening_calls))
+    monkeypatch.setattr(ai_screening, "AI_SCREENING_MODEL_NAME", "cheap-text-model")
+    monkeypatch.setattr(ai_screening, "_tier_stats", {})
+    monkeypatch.setattr(ai_handler, "client", _client(json.dumps(FULL_VERDICT), full_calls))
+    monkeypatch.chdir(tmp_path)
+    return screening_calls, full_calls
+
+
+def test_build_screening_criteria():
+    criteria = build_screening_criteria({**TASK, "personal_only": True})
+    assert "macbook air m1" in criteria and "2000 - 3500" in criteria and "个人闲置" in criteria
+
+
+def test_rejected_listing_skips_the_multimodal_model(monkeypatch, tmp_path):
+    screening_calls, full_calls = _setup(
+        monkeypatch, tmp_path, '{"reject": true, "category": "model", "reason": "M2 不是 M1"}'
+    )
+    usage = {}
+
+    result = asyncio.run(
+        ai_handler.get_ai_analysis(
+            RECORD, [], prompt_text="完整标准", usage=usage, screening_criteria=build_screening_criteria(TASK)
+        )
+    )
+
+    assert full_calls == []
+    assert screening_calls[0]["model"] == "cheap-text-model"
+    assert all(part["role"] in ("system", "user") and isinstance(part["content"], str)
+               for part in screening_calls[0]["messages"])
+    assert result["is_recommended"] is False and result["screening"]["category"] == "model"
+    assert ai_handler.validate_ai_response_format(result)
+    assert usage["screening_tokens"] == 320
+    assert tier_stats()["screening"]["pass_rate"] == 0.0
+
+
+def test_passing_listing_goes_on_to_full_analysis(monkeypatch, tmp_path):
+    _, full_calls = _setup(monkeypatch, tmp_path, '{"reject": false, "category": "none", "reason": ""}')
+
+    result = asyncio.run(
+        ai_handler.get_ai_analysis(RECORD, [], prompt_text="完整标准", screening_criteria="criteria")
+    )
+
+    assert result["is_recommended"] is True and len(full_calls) == 1
+    stats = tier_stats()
+    assert stats["screening"]["passed"] == 1 and stats["full"]["passed"] == 1
+
+
+def test_retrying_the_full_analysis_does_not_screen_again(monkeypatch, tmp_path):
+    screening_calls, _ = _setup(monkeypatch, tmp_path, '{"reject": false, "category": "none", "reason": ""}')
+    full_calls = []
+
+    async def flaky_create(**params):
+        full_calls.append(params)
+        # 完整分析内部重试 3 次都失败后，由外层 retry_on_failure 再试一轮
+        if len(full_calls) <= 3:
+            raise RuntimeError("upstream error")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(FULL_VERDICT)))], usage=None
+        )
+
+    async def no_sleep(*_):
+        return None
+
+    flaky_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=flaky_create)))
+    monkeypatch.setattr(ai_handler, "client", flaky_client)
+    monkeypatch.setattr(utils, "asyncio", SimpleNamespace(sleep=no_sleep))
+
+    result = asyncio.run(ai_handler.get_ai_analysis(RECORD, [], prompt_text="完整标准", screening_criteria="criteria"))
+
+    assert result["is_recommended"] is True and len(full_calls) == 4
+    assert len(screening_calls) == 1
+    stats = tier_stats()
+    assert stats["screening"]["passed"] == 1 and stats["full"]["passed"] == 1
+
+
+def test_screening_is_gated_on_the_screening_client(monkeypatch, tmp_path):
+    screening_calls, full_calls = _setup(
+        monkeypatch, tmp_path, '{"reject": true, "category": "model", "reason": "M2 不是 M1"}'
+    )
+    # 没有多模态客户端时仍可初筛淘汰
+    monkeypatch.setattr(ai_handler, "client", None)
+    result = asyncio.run(ai_handler.get_ai_analysis(RECORD, [], prompt_text="完整标准", screening_criteria="criteria"))
+    assert result["is_recommended"] is False and len(screening_calls) == 1
+
+    # 未配置初筛模型时直接进入完整分析
+    monkeypatch.setattr(ai_screening, "screening_client", None)
+    monkeypatch.setattr(ai_handler, "client", _client(json.dumps(FULL_VERDICT), full_calls))
+    result = asyncio.run(ai_handler.get_ai_analysis(RECORD, [], prompt_text="完整标准", screening_criteria="criteria"))
+    assert result["is_recommended"] is True and len(full_calls) == 1
+
+
+def test_screening_failure_lets_the_listing_through(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, RuntimeError("boom"))
+    assert asyncio.run(screen_listing(RECORD, "criteria")) is None
+    _setup(monkeypatch, tmp_path, "not json")
+    assert asyncio.run(screen_listing(RECORD, "criteria")) is None
+
+
+def _scripted_client(responses, calls):
+    async def create(**params):
+        calls.append(params)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=responses(params)))],
+            usage=SimpleNamespace(prompt_tokens=600, completion_tokens=60),
+        )
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def _records():
+    return {key: {"商品信息": {"商品ID": key, "商品标题": f"item {key}"}} for key in ("a", "b", "c")}
+
+
+def _is_batch(params):
+    return "verdicts" in params["messages"][0]["content"]
+
+
+def test_batch_screening_uses_one_call_per_batch(monkeypatch):
+    monkeypatch.setattr(ai_screening, "_tier_stats", {})
+    calls = []
+    batch_reply = json.dumps({"verdicts": [
+        {"id": "a", "reject": True, "category": "price", "reason": "太贵"},
+        {"id": "b", "reject": False, "category": "none", "reason": ""},
+        {"id": "c", "reject": False, "category": "none", "reason": ""},
+    ]})
+    client = _scripted_client(lambda params: batch_reply, calls)
+
+    verdicts = asyncio.run(ai_screening.screen_listings_batch(_records(), "criteria", 10, client, "m"))
+
+    assert len(calls) == 1 and _is_batch(calls[0])
+    assert '"id":"b"' in calls[0]["messages"][1]["content"]
+    assert verdicts["a"]["reject"] is True and verdicts["b"]["reject"] is False
+    assert verdicts["a"]["tokens"] == 220
+    assert tier_stats()["screening"]["count"] == 3
+
+
+def test_malformed_or_partial_batch_falls_back_to_per_item_calls(monkeypatch):
+    monkeypatch.setattr(ai_screening, "_tier_stats", {})
+    single = '{"reject": false, "category": "none", "reason": ""}'
+    partial = json.dumps({"verdicts": [{"id": "a", "reject": True, "category": "model", "reason": ""},
+                                       {"id": "zzz", "reject": True}]})
+
+    malformed_calls, partial_calls = [], []
+    malformed_client = _scripted_client(lambda params: "oops" if _is_batch(params) else single, malformed_calls)
+    partial_client = _scripted_client(lambda params: partial if _is_batch(params) else single, partial_calls)
+
+    malformed = asyncio.run(ai_screening.screen_listings_batch(_records(), "criteria", 10, malformed_client, "m"))
+    mixed = asyncio.run(ai_screening.screen_listings_batch(_records(), "criteria", 10, partial_client, "m"))
+
+    assert len(malformed_calls) == 4 and all(verdict["reject"] is False for verdict in malformed.values())
+    assert len(partial_calls) == 3
+    assert mixed["a"]["reject"] is True and set(mixed) == {"a", "b", "c"}
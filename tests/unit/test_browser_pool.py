@@ -0,0 +1,21 @@
+from src.services.browser_pool_service import BrowserPoolService
+
+
+def test_select_endpoint_prefers_least_loaded_healthy_instance():
+    pool = BrowserPoolService(size=3, base_port=9400, max_contexts=2)
+    for instance in pool.instances:
+        instance.healthy = True
+    pool.instances[2].healthy = False
+
+    leases = {"http://127.0.0.1:9400": 1}
+    assert pool.select_endpoint(leases) == "http://127.0.0.1:9401"
+
+    leases = {"http://127.0.0.1:9400": 2, "http://127.0.0.1:9401": 2}
+    assert pool.select_endpoint(leases) is None
+
+
+def test_status_reports_leases():
+    pool = BrowserPoolService(size=1, base_port=9500)
+    status = pool.status({"http://127.0.0.1:9500": 3})
+    assert status.enabled is False
+    assert status.instances[0]["leases"] == 3
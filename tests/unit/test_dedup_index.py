@@ -0,0 +1,46 @@
+import asyncio
+import json
+import os
+
+from src import dedup_index
+from src.dedup_index import DedupIndex, item_key
+from src.utils import save_to_jsonl
+
+
+def _record(item_id):
+    return {"商品信息": {"商品链接": f"https://www.goofish.com/item?id={item_id}&categoryId=1"}}
+
+
+def test_item_key_uses_numeric_id_or_stable_hash():
+    assert item_key("https://www.goofish.com/item?id=123&categoryId=1") == 123
+    assert item_key("https://www.goofish.com/item?id=123") == 123
+    other = item_key("https://www.goofish.com/item?foo=bar")
+    assert other == item_key("https://www.goofish.com/item?foo=bar&x=1")
+    assert 0 <= other < 2 ** 63
+
+
+def test_index_catches_up_with_legacy_file_and_tracks_appends(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("jsonl")
+    path = os.path.join("jsonl", "sony_a7m4_full_data.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for item_id in (1, 2):
+            f.write(json.dumps(_record(item_id), ensure_ascii=False) + "\n")
+
+    index = DedupIndex(db_path=str(tmp_path / "dedup_index.db"))
+    monkeypatch.setattr(dedup_index, "_shared_index", index)
+
+    assert index.sync_file("sony a7m4") == 2
+    seen = index.view("sony a7m4")
+    assert "https://www.goofish.com/item?id=1" in seen
+    assert "https://www.goofish.com/item?id=3" not in seen
+
+    asyncio.run(save_to_jsonl(_record(3), "sony a7m4"))
+    assert "https://www.goofish.com/item?id=3" in seen
+    assert index.indexed_offset("sony a7m4") == os.path.getsize(path)
+    assert index.sync_file("sony a7m4") == 0
+    assert len(seen) == 3
+
+    os.remove(path)
+    assert index.sync_file("sony a7m4") == 0
+    assert len(seen) == 0
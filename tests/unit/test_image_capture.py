@@ -0,0 +1,155 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src import ai_handler
+from src.image_capture import (
+    DetailImageCapture,
+    image_key,
+    is_original_image,
+    is_original_image_url,
+    sniff_image_format,
+)
+
+DETAIL_URL = "https://h5api.m.goofish.com/h5/mtop.taobao.idle.pc.detail/1.0/?t=1"
+DETAIL_JSON = {
+    "data": {
+        "itemDO": {
+            "imageInfos": [
+                {"url": "http://img.alicdn.com/bao/uploaded/i1/a.jpg"},
+                {"url": "//img.alicdn.com/bao/uploaded/i2/b.png"},
+            ]
+        }
+    }
+}
+
+
+class FakeRequest:
+    def __init__(self, resource_type):
+        self.resource_type = resource_type
+
+
+class FakeResponse:
+    def __init__(self, url, resource_type="image", body=b"", payload=None):
+        self.url = url
+        self.request = FakeRequest(resource_type)
+        self.ok = True
+        self._body = body
+        self._payload = payload
+
+    async def body(self):
+        return self._body
+
+    async def json(self):
+        return self._payload
+
+
+class FakeRoute:
+    def __init__(self, url):
+        self.request = SimpleNamespace(url=url)
+        self.continued = False
+
+    async def continue_(self):
+        self.continued = True
+
+
+def test_image_key_ignores_scheme_query_and_thumbnail_suffix():
+    original = "http://img.alicdn.com/bao/uploaded/i1/a.jpg"
+    assert image_key("https://img.alicdn.com/bao/uploaded/i1/a.jpg_790x10000Q90.jpg_.webp?x=1") == image_key(original)
+    assert image_key("//img.alicdn.com/bao/uploaded/i1/a.jpg") == image_key(original)
+    assert image_key("https://img.alicdn.com/bao/uploaded/i1/other.jpg") != image_key(original)
+
+
+JPEG = b"\xff\xd8\xff\xe0original-jpeg"
+PNG = b"\x89PNG\r\n\x1a\noriginal-png"
+WEBP = b"RIFF\x00\x00\x00\x00WEBPthumbnail"
+
+
+def test_capture_keeps_only_original_images_seen_by_the_page():
+    async def run():
+        capture = DetailImageCapture()
+        await capture.on_response(FakeResponse(DETAIL_URL, "fetch", payload=DETAIL_JSON))
+        # 缩略图变体和按 Accept 返回的 WebP 内容都不能当作原图
+        await capture.on_response(
+            FakeResponse("https://img.alicdn.com/bao/uploaded/i1/a.jpg_790x10000.jpg_.webp", body=WEBP)
+        )
+        await capture.on_response(FakeResponse("https://img.alicdn.com/bao/uploaded/i1/a.jpg", body=WEBP))
+        await capture.on_response(FakeResponse("https://img.alicdn.com/recommend/c.jpg", body=JPEG))
+        # 只放行原图请求，缩略图变体仍由资源拦截挡掉
+        assert not capture._should_route("https://img.alicdn.com/bao/uploaded/i1/a.jpg_790x10000.jpg_.webp")
+        assert not capture._should_route("https://img.alicdn.com/recommend/c.jpg")
+        assert capture._should_route("https://img.alicdn.com/bao/uploaded/i1/a.jpg?x=1")
+        for url in ("https://img.alicdn.com/bao/uploaded/i1/a.jpg?x=1", "https://img.alicdn.com/bao/uploaded/i2/b.png"):
+            await capture._route(FakeRoute(url))
+        assert await capture.wait(0.01) == 0
+        await capture.on_response(FakeResponse("https://img.alicdn.com/bao/uploaded/i1/a.jpg?x=1", body=JPEG))
+        await capture.on_response(FakeResponse("https://img.alicdn.com/bao/uploaded/i2/b.png", body=PNG))
+        return capture, await capture.wait(1)
+
+    capture, count = asyncio.run(run())
+    assert count == 2
+    assert capture.images[image_key("http://img.alicdn.com/bao/uploaded/i1/a.jpg")] == JPEG
+
+
+def test_original_image_detection():
+    assert is_original_image_url("//img.alicdn.com/i1/a.jpg?x=1")
+    assert not is_original_image_url("https://img.alicdn.com/i1/a.jpg_220x10000.jpg_.webp")
+    assert sniff_image_format(JPEG) == "jpeg" and sniff_image_format(WEBP) == "webp"
+    assert sniff_image_format(b"not an image") is None
+    assert is_original_image("https://img.alicdn.com/i2/b.png", PNG)
+    assert not is_original_image("https://img.alicdn.com/i2/b.png", JPEG)
+
+
+def test_download_all_images_writes_captured_and_downloads_the_rest(tmp_path, monkeypatch):
+    downloaded = []
+
+    async def fake_download(url, save_path, deadline=None):
+        downloaded.append(url)
+        with open(save_path, "wb") as f:
+            f.write(b"downloaded")
+        return save_path
+
+    monkeypatch.setattr(ai_handler, "IMAGE_SAVE_DIR", str(tmp_path))
+    monkeypatch.setattr(ai_handler, "_download_single_image", fake_download)
+    monkeypatch.setattr(ai_handler, "get_image_store", lambda: None)
+    urls = ["http://img.alicdn.com/bao/uploaded/i1/a.jpg", "http://img.alicdn.com/bao/uploaded/i2/b.png"]
+    captured = {image_key(urls[0]): b"captured"}
+
+    paths = asyncio.run(ai_handler.download_all_images("1", urls, "t", captured=captured))
+
+    assert downloaded == [urls[1]]
+    assert [open(path, "rb").read() for path in paths] == [b"captured", b"downloaded"]
+
+
+def test_wait_returns_immediately_when_the_page_requested_no_originals():
+    async def run():
+        capture = DetailImageCapture()
+        await capture.on_response(FakeResponse(DETAIL_URL, "fetch", payload=DETAIL_JSON))
+        started = time.monotonic()
+        count = await capture.wait(5, idle=1)
+        return count, time.monotonic() - started
+
+    count, waited = asyncio.run(run())
+    assert count == 0 and waited < 0.1
+
+
+def test_wait_stops_once_requested_originals_arrive():
+    async def run():
+        capture = DetailImageCapture()
+        await capture.on_response(FakeResponse(DETAIL_URL, "fetch", payload=DETAIL_JSON))
+        url = "https://img.alicdn.com/bao/uploaded/i1/a.jpg"
+        await capture._route(FakeRoute(url))
+
+        async def arrive():
+            await asyncio.sleep(0.05)
+            await capture.on_response(FakeResponse(url, body=JPEG))
+
+        arriving = asyncio.create_task(arrive())
+        started = time.monotonic()
+        # 轮播图没有加载第二张原图，不再空等 idle 秒
+        count = await capture.wait(5, idle=1)
+        await arriving
+        return count, time.monotonic() - started
+
+    count, waited = asyncio.run(run())
+    assert count == 1 and waited < 0.5
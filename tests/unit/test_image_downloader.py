@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import ai_handler, image_downloader
+from src.image_capture import image_key
+from src.image_downloader import (
+    ByteBudget,
+    ImageBudgetExceeded,
+    ImageDownloader,
+    close_image_downloader,
+    get_image_downloader,
+    hold_image_downloader,
+)
+
+
+class ImageServer:
+    """本地静态图片服务：/flaky 第一次返回 503，/missing 返回 404，/slow 延迟返回。"""
+
+    def __init__(self):
+        self.hits = {}
+        self.active = 0
+        self.peak_active = 0
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with lock:
+                    server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                    server.active += 1
+                    server.peak_active = max(server.peak_active, server.active)
+                try:
+                    if self.path == "/missing.jpg" or (self.path == "/flaky.jpg" and server.hits[self.path] == 1):
+                        self.send_error(404 if self.path == "/missing.jpg" else 503)
+                        return
+                    time.sleep(0.5 if self.path == "/slow.jpg" else 0.05)
+                    body = self.path.encode("utf-8") * 1000
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with lock:
+                        server.active -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_downloads_concurrently_with_per_host_limit_and_retries(tmp_path):
+    async def run(server):
+        downloader = ImageDownloader(per_host=2, retries=2, retry_delay=0.01)
+        try:
+            paths = [str(tmp_path / f"{i}.jpg") for i in range(6)]
+            results = await asyncio.gather(
+                *(downloader.fetch(f"{server.base_url}/{i}.jpg", path) for i, path in enumerate(paths)),
+                downloader.fetch(f"{server.base_url}/flaky.jpg", str(tmp_path / "flaky.jpg")),
+                downloader.fetch(f"{server.base_url}/missing.jpg", str(tmp_path / "missing.jpg")),
+                return_exceptions=True,
+            )
+            return results, downloader.downloaded
+        finally:
+            await downloader.close()
+
+    with ImageServer() as server:
+        results, downloaded = asyncio.run(run(server))
+
+    assert downloaded == 7
+    assert results[:7] == [str(tmp_path / f"{i}.jpg") for i in range(6)] + [str(tmp_path / "flaky.jpg")]
+    assert (tmp_path / "0.jpg").read_bytes() == b"/0.jpg" * 1000
+    # 503 重试一次，404 不重试，且失败时不留下临时文件
+    assert server.hits["/flaky.jpg"] == 2 and server.hits["/missing.jpg"] == 1
+    assert not (tmp_path / "missing.jpg").exists() and not (tmp_path / "missing.jpg.part").exists()
+    assert server.peak_active <= 2
+
+
+def test_deadline_bounds_each_attempt(tmp_path):
+    async def run(server):
+        downloader = ImageDownloader(retries=3, retry_delay=0.01)
+        try:
+            await downloader.fetch(f"{server.base_url}/slow.jpg", str(tmp_path / "slow.jpg"), deadline=time.monotonic() + 0.1)
+        finally:
+            await downloader.close()
+
+    with ImageServer() as server:
+        started = time.monotonic()
+        with pytest.raises(Exception):
+            asyncio.run(run(server))
+        elapsed = time.monotonic() - started
+    assert elapsed < 0.4
+
+
+def test_fetch_bytes_keeps_images_in_memory_within_budget(tmp_path):
+    async def run(server):
+        downloader = ImageDownloader(per_host=1, retry_delay=0.01)
+        budget = ByteBudget(13000)
+        try:
+            return await asyncio.gather(
+                *(downloader.fetch_bytes(f"{server.base_url}/{i}.jpg", budget=budget) for i in range(3)),
+                return_exceptions=True,
+            ), budget.used
+        finally:
+            await downloader.close()
+
+    with ImageServer() as server:
+        results, used = asyncio.run(run(server))
+
+    assert results[:2] == [b"/0.jpg" * 1000, b"/1.jpg" * 1000]
+    assert isinstance(results[2], ImageBudgetExceeded)
+    assert used == 12000
+    # 超出上限不重试
+    assert server.hits["/2.jpg"] == 1
+
+
+def test_download_images_to_memory_writes_nothing_to_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_handler, "IMAGE_SAVE_DIR", str(tmp_path))
+    monkeypatch.setattr(ai_handler, "get_image_store", lambda: None)
+
+    async def run(server):
+        urls = [f"{server.base_url}/{i}.jpg" for i in range(3)]
+        try:
+            return await ai_handler.download_images_to_memory(
+                "1", urls, captured={image_key(urls[1]): b"captured"}, max_bytes=0
+            )
+        finally:
+            await close_image_downloader()
+
+    with ImageServer() as server:
+        images = asyncio.run(run(server))
+
+    assert images == [b"/0.jpg" * 1000, b"captured", b"/2.jpg" * 1000]
+    assert "/1.jpg" not in server.hits
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_shared_downloader_stays_open_until_the_last_task_finishes(tmp_path):
+    async def task(server, name, path):
+        hold_image_downloader()
+        try:
+            return await get_image_downloader().fetch(f"{server.base_url}/{path}", str(tmp_path / name))
+        finally:
+            await close_image_downloader()
+
+    async def run(server):
+        # 快任务先结束并调用 close_image_downloader，慢任务的下载不受影响
+        return await asyncio.gather(task(server, "fast.jpg", "0.jpg"), task(server, "slow.jpg", "slow.jpg"))
+
+    with ImageServer() as server:
+        results = asyncio.run(run(server))
+
+    assert results == [str(tmp_path / "fast.jpg"), str(tmp_path / "slow.jpg")]
+    assert (tmp_path / "slow.jpg").read_bytes() == b"/slow.jpg" * 1000
+
+
+def test_missing_h2_falls_back_to_http1_and_warns_once(monkeypatch, capsys):
+    monkeypatch.setattr(image_downloader, "_h2_missing_logged", False)
+    monkeypatch.setattr(image_downloader.importlib.util, "find_spec", lambda name: None)
+
+    async def run():
+        downloaders = [ImageDownloader(http2=True), ImageDownloader(http2=True)]
+        for downloader in downloaders:
+            await downloader.close()
+        return downloaders
+
+    assert [downloader.http2 for downloader in asyncio.run(run())] == [False, False]
+    assert capsys.readouterr().out.count("未安装 h2") == 1
@@ -0,0 +1,100 @@
+import io
+import os
+
+from PIL import Image
+
+from src import image_preprocess
+from src.image_preprocess import estimate_image_tokens, prepare_image, prepare_image_bytes, prepare_images, summarize
+
+
+def _write_photo(path, size=(3000, 2000)):
+    image = Image.effect_noise(size, 60).convert("RGB")
+    image.save(path, format="JPEG", quality=95)
+    return path
+
+
+def test_prepare_image_downscales_and_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_preprocess, "AI_IMAGE_CACHE_DIR", str(tmp_path / "cache"))
+    path = _write_photo(str(tmp_path / "photo.jpg"))
+
+    prepared = prepare_image(path, max_edge=1024, quality=80)
+
+    assert prepared.original_size == (3000, 2000)
+    assert prepared.size == (1024, 683)
+    assert len(prepared.data) < prepared.original_bytes
+    assert Image.open(io.BytesIO(prepared.data)).size == (1024, 683)
+    assert prepared.data_url.startswith("data:image/jpeg;base64,")
+
+    def fail_open(*args, **kwargs):
+        raise AssertionError("缓存命中时不应重新编码")
+
+    monkeypatch.setattr(image_preprocess.ImageOps, "exif_transpose", fail_open)
+    assert prepare_image(path, max_edge=1024, quality=80).data == prepared.data
+
+
+def test_prepare_image_bytes_does_not_touch_the_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(image_preprocess, "AI_IMAGE_CACHE_DIR", str(cache_dir))
+    data = open(_write_photo(str(tmp_path / "photo.jpg")), "rb").read()
+
+    prepared = prepare_images([data])
+
+    assert prepared[0].size == (1024, 683) and prepared[0].original_bytes == len(data)
+    assert prepare_image_bytes(b"raw").data == b"raw"
+    assert not cache_dir.exists()
+
+
+def test_unreadable_and_missing_files_are_passed_through_or_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_preprocess, "AI_IMAGE_CACHE_DIR", str(tmp_path / "cache"))
+    raw = tmp_path / "photo.heic"
+    raw.write_bytes(b"not-an-image-pillow-knows")
+
+    prepared = prepare_images([str(raw), str(tmp_path / "missing.jpg")])
+
+    assert len(prepared) == 1
+    assert prepared[0].data == b"not-an-image-pillow-knows"
+    assert prepared[0].size is None
+    assert "1 张图片" in summarize(prepared)
+
+
+def test_estimate_image_tokens():
+    assert estimate_image_tokens(300, 300, model="gemini-2.5-flash") == 258
+    assert estimate_image_tokens(3000, 2000, model="gemini-2.5-flash") == 258 * 4 * 3
+    assert estimate_image_tokens(1024, 683, model="gemini-2.5-flash") == 258 * 2 * 1
+    assert estimate_image_tokens(512, 512, model="gpt-4o") == 170 + 85
+    assert estimate_image_tokens(3000, 2000, model="gpt-4o") == 170 * 6 + 85
+
+
+def test_passed_through_images_keep_their_real_mime_type(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_preprocess, "AI_IMAGE_CACHE_DIR", str(tmp_path / "cache"))
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+    png = tmp_path / "small.png"
+    png.write_bytes(buffer.getvalue())
+
+    # 小图重新编码没有收益时原样发送，MIME 类型与实际格式一致
+    assert prepare_image(str(png)).mime_type == "image/png"
+    assert prepare_image_bytes(buffer.getvalue()).mime_type == "image/png"
+    assert prepare_image_bytes(b"RIFF\x00\x00\x00\x00WEBPbroken").mime_type == "image/webp"
+    assert prepare_image_bytes(b"raw").mime_type == "application/octet-stream"
+    # 重新编码后的图片始终是 JPEG
+    assert prepare_image(_write_photo(str(tmp_path / "photo.png"))).mime_type == "image/jpeg"
+
+
+def test_cache_evicts_least_recently_used_files(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(image_preprocess, "AI_IMAGE_CACHE_DIR", str(cache_dir))
+    paths = [_write_photo(str(tmp_path / f"{i}.jpg"), size=(1600, 1200)) for i in range(3)]
+    for offset, path in enumerate(paths):
+        prepare_image(path)
+        files = sorted(cache_dir.rglob("*.jpg"), key=lambda file: file.stat().st_mtime)
+        os.utime(files[-1], (1000 + offset, 1000 + offset))
+    assert len(list(cache_dir.rglob("*.jpg"))) == 3
+
+    # 命中刷新使用时间，之后按大小上限淘汰时保留最近使用的文件
+    first = prepare_image(paths[0])
+    sizes = sorted(file.stat().st_size for file in cache_dir.rglob("*.jpg"))
+    assert image_preprocess.evict_cache(max_bytes=sizes[-1] + sizes[-2]) == 1
+    assert len(list(cache_dir.rglob("*.jpg"))) == 2
+    assert prepare_image(paths[0]).data == first.data
+    assert image_preprocess.evict_cache(max_bytes=0) == 0
@@ -0,0 +1,62 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from src.image_preprocess import PreparedImage
+from src.image_select import dhash, select_images
+
+
+def _prepared(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    data = buffer.getvalue()
+    return PreparedImage(data, "image/jpeg", len(data), image.size, image.size)
+
+
+def _gradient(width=320, height=240, reverse=False):
+    image = Image.linear_gradient("L").resize((width, height))
+    if reverse:
+        image = image.transpose(Image.FLIP_TOP_BOTTOM)
+    return image.rotate(90, expand=True).convert("RGB")
+
+
+def _noise(seed_size):
+    return Image.effect_noise((seed_size, seed_size), 80).convert("RGB")
+
+
+def _flat(color):
+    image = Image.new("RGB", (320, 240), color)
+    ImageDraw.Draw(image).rectangle((100, 80, 140, 120), fill=(0, 0, 0))
+    return image
+
+
+def test_dhash_is_stable_under_resize_and_differs_for_other_images():
+    photo = _gradient()
+    assert dhash(photo) == dhash(photo.resize((160, 120)))
+    assert bin(dhash(photo) ^ dhash(_gradient(reverse=True))).count("1") > 20
+
+
+def test_near_duplicates_are_dropped_keeping_the_first():
+    images = [_prepared(_gradient()), _prepared(_gradient().resize((300, 225))), _prepared(_gradient(reverse=True))]
+
+    kept, dropped = select_images(images, budget=0)
+
+    assert kept == [images[0], images[2]]
+    assert [(item.index, item.reason) for item in dropped] == [(1, "与第1张近似")]
+    assert select_images(images, budget=0, max_distance=-1)[0] == images
+
+
+def test_budget_keeps_cover_and_most_informative_images_in_order():
+    images = [_prepared(_flat((200, 200, 200))), _prepared(_flat((90, 40, 40))), _prepared(_noise(240)),
+              _prepared(_gradient(reverse=True))]
+
+    kept, dropped = select_images(images, budget=3, max_distance=-1)
+
+    assert kept == [images[0], images[2], images[3]]
+    assert [(item.index, item.reason) for item in dropped] == [(1, "超出图片预算")]
+
+
+def test_unreadable_images_are_kept():
+    raw = PreparedImage(b"heic-bytes", "image/jpeg", 10, None, None)
+    kept, dropped = select_images([raw, raw], budget=0)
+    assert kept == [raw, raw] and dropped == []
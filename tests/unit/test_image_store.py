@@ -0,0 +1,109 @@
+import asyncio
+import os
+
+from src import ai_handler
+from src.image_store import ImageStore
+
+
+def _write(path, body: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(body)
+    return str(path)
+
+
+def test_store_links_identical_content_and_reuses_by_url(tmp_path):
+    store = ImageStore(root=str(tmp_path / "store"), db_path=str(tmp_path / "store.db"), max_bytes=0)
+    task_a, task_b = tmp_path / "task_a", tmp_path / "task_b"
+    task_a.mkdir()
+    task_b.mkdir()
+
+    first = _write(task_a / "1.jpg", b"same-bytes")
+    second = _write(task_b / "2.jpg", b"same-bytes")
+    sha = store.adopt("https://img.alicdn.com/bao/uploaded/i1/a.jpg", first)
+    assert store.adopt("https://img.alicdn.com/bao/uploaded/i9/copy.jpg", second) == sha
+    assert store.stats()["blobs"] == 1
+    assert os.path.samefile(first, second)
+
+    # 任务目录被删除后仍可从图片库复用（缩略图后缀与协议不影响命中）
+    os.remove(first)
+    dest = str(task_b / "again.jpg")
+    assert store.materialize("http://img.alicdn.com/bao/uploaded/i1/a.jpg_790x10000.jpg_.webp", dest)
+    assert open(dest, "rb").read() == b"same-bytes"
+    assert not store.materialize("https://img.alicdn.com/unknown.jpg", str(task_b / "x.jpg"))
+    store.close()
+
+
+def test_store_evicts_least_recently_used_blobs_no_task_links_to(tmp_path):
+    store = ImageStore(root=str(tmp_path / "store"), db_path=str(tmp_path / "store.db"), max_bytes=25)
+    for name in ("b", "a"):
+        store.adopt(f"https://img.example.com/{name}.jpg", _write(tmp_path / f"{name}.jpg", name.encode() * 10))
+    # a 的任务目录已清理；b 仍被任务目录（permanent_images）引用，删除它并不能释放空间
+    os.remove(tmp_path / "a.jpg")
+    store.adopt("https://img.example.com/c.jpg", _write(tmp_path / "c.jpg", b"c" * 10))
+
+    assert store.lookup("https://img.example.com/a.jpg") is None
+    assert store.lookup("https://img.example.com/b.jpg") and store.lookup("https://img.example.com/c.jpg")
+    assert store.total_bytes() == 20
+    assert open(tmp_path / "b.jpg", "rb").read() == b"b" * 10
+    store.close()
+
+
+def test_download_all_images_never_fetches_a_stored_image_twice(tmp_path, monkeypatch):
+    store = ImageStore(root=str(tmp_path / "store"), db_path=str(tmp_path / "store.db"), max_bytes=0)
+    downloads = []
+
+    async def fake_download(url, save_path, deadline=None):
+        downloads.append(url)
+        return _write(save_path, b"image")
+
+    monkeypatch.setattr(ai_handler, "IMAGE_SAVE_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(ai_handler, "_download_single_image", fake_download)
+    monkeypatch.setattr(ai_handler, "get_image_store", lambda: store)
+    url = "https://img.alicdn.com/bao/uploaded/i1/a.jpg"
+
+    first = asyncio.run(ai_handler.download_all_images("1", [url], "task_a"))
+    ai_handler.cleanup_task_images("task_a")
+    second = asyncio.run(ai_handler.download_all_images("1", [url], "task_b"))
+
+    assert downloads == [url]
+    assert open(second[0], "rb").read() == b"image" and not os.path.exists(first[0])
+    store.close()
+
+
+def test_blob_evicted_by_another_process_is_downloaded_again(tmp_path, monkeypatch):
+    store = ImageStore(root=str(tmp_path / "store"), db_path=str(tmp_path / "store.db"), max_bytes=0)
+    url = "https://img.alicdn.com/bao/uploaded/i1/a.jpg"
+    store.adopt(url, _write(tmp_path / "a.jpg", b"old"))
+    blob_path = store.lookup(url)
+    lookup = store._lookup
+
+    def lookup_then_evict(image_url):
+        # 模拟另一个进程在查询索引之后、创建链接之前淘汰了这张图片
+        found = lookup(image_url)
+        if found:
+            os.remove(found[1])
+        return found
+
+    monkeypatch.setattr(store, "_lookup", lookup_then_evict)
+    assert not store.materialize(url, str(tmp_path / "x.jpg"))
+    assert store.read(url) is None
+    monkeypatch.setattr(store, "_lookup", lookup)
+    assert store.lookup(url) is None and not os.path.exists(blob_path)
+
+    downloads = []
+
+    async def fake_download(image_url, save_path, deadline=None):
+        downloads.append(image_url)
+        return _write(save_path, b"new")
+
+    monkeypatch.setattr(ai_handler, "IMAGE_SAVE_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(ai_handler, "_download_single_image", fake_download)
+    monkeypatch.setattr(ai_handler, "get_image_store", lambda: store)
+    store.adopt(url, _write(tmp_path / "b.jpg", b"old"))
+    monkeypatch.setattr(store, "_lookup", lookup_then_evict)
+
+    paths = asyncio.run(ai_handler.download_all_images("1", [url], "task_a"))
+
+    assert downloads == [url]
+    assert len(paths) == 1 and open(paths[0], "rb").read() == b"new"
+    store.close()
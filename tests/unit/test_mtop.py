@@ -0,0 +1,51 @@
+import asyncio
+import json
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from src.mtop import SearchFilterRoute, build_search_filter, mtop_sign, response_succeeded, rewrite_mtop_request
+
+SEARCH_URL = (
+    "https://h5api.m.goofish.com/h5/mtop.taobao.idlemtopsearch.pc.search/1.0/"
+    "?jsv=2.7.2&appKey=34839810&t=1700000000000&sign=old&api=mtop.taobao.idlemtopsearch.pc.search"
+)
+
+
+def test_rewrite_search_request_applies_filters_and_resigns():
+    body = urlencode({"data": json.dumps({"pageNumber": 2, "keyword": "sony a7m4", "propValueStr": {}})})
+    url, new_body = rewrite_mtop_request(SEARCH_URL, body, build_search_filter(True, "100", "3000"), "token123")
+
+    data_text = dict(parse_qsl(new_body))["data"]
+    data = json.loads(data_text)
+    assert data["pageNumber"] == 2
+    assert data["sortField"] == "create" and data["sortValue"] == "desc"
+    assert data["propValueStr"]["searchFilter"] == "priceRange:100,3000;quickFilter:filterPersonal;"
+
+    query = dict(parse_qsl(urlparse(url).query))
+    assert query["t"] == "1700000000000"
+    assert query["sign"] == mtop_sign("token123", "1700000000000", data_text)
+    assert rewrite_mtop_request(SEARCH_URL, "", {}, "token123") is None
+
+
+def test_search_filter_route_continues_with_rewritten_request():
+    class FakeRequest:
+        url = SEARCH_URL
+        post_data = urlencode({"data": json.dumps({"pageNumber": 1, "keyword": "a7m4"})})
+
+    class FakeRoute:
+        request = FakeRequest()
+        continued = None
+
+        async def continue_(self, **kwargs):
+            self.continued = kwargs
+
+    class FakeContext:
+        async def cookies(self):
+            return [{"name": "_m_h5_tk", "value": "token123_1700000000000"}]
+
+    route = FakeRoute()
+    search_route = SearchFilterRoute(FakeContext(), build_search_filter())
+    asyncio.run(search_route.handle(route))
+    assert search_route.rewritten == 1
+    assert "sign=" in route.continued["url"]
+    assert response_succeeded({"ret": ["SUCCESS::调用成功"]})
+    assert not response_succeeded({"ret": ["FAIL_SYS_TOKEN_EXOIRED::令牌过期"]})
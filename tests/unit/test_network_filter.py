@@ -0,0 +1,75 @@
+import asyncio
+
+from src.network_filter import ResourceBlockProfile, install_resource_blocking, timed_goto
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+    async def sizes(self):
+        return {"responseBodySize": 1000, "responseHeadersSize": 24}
+
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.action = None
+
+    async def abort(self):
+        self.action = "abort"
+
+    async def continue_(self):
+        self.action = "continue"
+
+
+class FakeContext:
+    def __init__(self):
+        self.route_handler = None
+        self.listeners = {}
+
+    async def route(self, pattern, handler):
+        self.route_handler = handler
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def goto(self, url, **kwargs):
+        await asyncio.sleep(0)
+
+
+def test_block_reason_respects_allowlist():
+    profile = ResourceBlockProfile()
+    assert profile.block_reason("https://img.alicdn.com/a.jpg", "image") == "image"
+    assert profile.block_reason("https://log.mmstat.com/v.gif", "script") == "tracking"
+    assert profile.block_reason("https://g.alicdn.com/sd/nocaptcha/slide.png", "image") is None
+    assert profile.block_reason("https://h5api.m.goofish.com/h5/mtop.x", "xhr") is None
+
+
+def test_install_resource_blocking_counts_blocked_and_loaded():
+    async def run():
+        context = FakeContext()
+        stats = await install_resource_blocking(context, ResourceBlockProfile())
+        routes = [
+            FakeRoute(FakeRequest("https://img.alicdn.com/a.jpg", "image")),
+            FakeRoute(FakeRequest("https://at.alicdn.com/font.woff2", "font")),
+            FakeRoute(FakeRequest("https://h5api.m.goofish.com/h5/mtop.x", "xhr")),
+        ]
+        for route in routes:
+            await context.route_handler(route)
+        await context.listeners["requestfinished"](routes[2].request)
+        await timed_goto(FakePage(context), "https://www.goofish.com/", "首页")
+        return stats, routes
+
+    stats, routes = asyncio.run(run())
+    assert [route.action for route in routes] == ["abort", "abort", "continue"]
+    assert stats.blocked == {"image": 1, "font": 1}
+    assert stats.bytes_loaded == 1024
+    assert len(stats.page_loads["首页"]) == 1
+    assert "拦截请求 2 个" in stats.summary()
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+
+from src import scraper
+from src.scraper import _PageScheduler
+
+
+class FakePipeline:
+    def __init__(self):
+        self.failed = False
+        self.jobs = []
+
+    async def submit(self, job):
+        self.jobs.append(job)
+
+
+async def _no_sleep(*args):
+    pass
+
+
+def _item(item_id: str, published: str) -> dict:
+    return {
+        "商品链接": f"https://www.goofish.com/item?id={item_id}",
+        "商品标题": f"商品 {item_id}",
+        "发布时间": published,
+    }
+
+
+def _ts(published: str) -> float:
+    return datetime.strptime(published, "%Y-%m-%d %H:%M").timestamp()
+
+
+def test_stops_after_consecutive_all_known_pages(monkeypatch):
+    monkeypatch.setattr(scraper, "random_sleep", _no_sleep)
+    known_page = [_item("1", "2024-05-01 10:00"), _item("2", "2024-05-01 09:00")]
+    processed = {scraper.get_link_unique_key(item["商品链接"]) for item in known_page}
+    scheduler = _PageScheduler(processed, stop_after_known_pages=2)
+    pipeline = FakePipeline()
+
+    async def run():
+        return [
+            await scheduler.schedule_page(known_page, pipeline),
+            await scheduler.schedule_page([_item("3", "2024-05-01 08:00")], pipeline),
+            await scheduler.schedule_page(known_page, pipeline),
+            await scheduler.schedule_page(known_page, pipeline),
+        ]
+
+    # 中间出现新商品时重新计数
+    assert asyncio.run(run()) == [False, False, False, True]
+    assert [job.unique_key for job in pipeline.jobs] == [scraper.get_link_unique_key(_item("3", "")["商品链接"])]
+    scheduler.confirm(pipeline.jobs[0].unique_key)
+    assert scheduler.watermark_ts() == _ts("2024-05-01 10:00")
+
+
+def test_stops_on_page_older_than_watermark(monkeypatch):
+    monkeypatch.setattr(scraper, "random_sleep", _no_sleep)
+    scheduler = _PageScheduler(set(), stop_after_known_pages=0, high_water_ts=_ts("2024-05-01 12:00"))
+    pipeline = FakePipeline()
+
+    async def run():
+        newer = await scheduler.schedule_page(
+            [_item("1", "2024-05-01 13:00"), _item("2", "2024-05-01 11:00")], pipeline
+        )
+        older = await scheduler.schedule_page([_item("3", "2024-05-01 11:30")], pipeline)
+        return newer, older
+
+    assert asyncio.run(run()) == (False, True)
+    # 早于高水位的页面仍然会处理其中的新商品，只是不再继续翻页
+    assert len(pipeline.jobs) == 3
+    for job in pipeline.jobs:
+        scheduler.confirm(job.unique_key)
+    assert scheduler.watermark_ts() == _ts("2024-05-01 13:00")
+
+
+def test_debug_limit_does_not_advance_watermark(monkeypatch):
+    monkeypatch.setattr(scraper, "random_sleep", _no_sleep)
+    scheduler = _PageScheduler(set(), debug_limit=1)
+    pipeline = FakePipeline()
+    page = [_item("1", "2024-05-01 09:00"), _item("2", "2024-05-01 10:00")]
+
+    asyncio.run(scheduler.schedule_page(page, pipeline))
+
+    assert len(pipeline.jobs) == 1 and scheduler.stop_scraping
+    scheduler.confirm(pipeline.jobs[0].unique_key)
+    # 只经过了第一个商品，且本次运行被调试上限提前结束
+    assert scheduler.newest_publish_ts == _ts("2024-05-01 09:00")
+    assert scheduler.watermark_ts() is None
+
+
+def test_watermark_does_not_pass_dropped_jobs(monkeypatch):
+    monkeypatch.setattr(scraper, "random_sleep", _no_sleep)
+    scheduler = _PageScheduler(set(), stop_after_known_pages=0)
+    pipeline = FakePipeline()
+    page = [_item("1", "2024-05-01 12:00"), _item("2", "2024-05-01 10:00"), _item("3", "2024-05-01 11:00")]
+
+    asyncio.run(scheduler.schedule_page(page, pipeline))
+    assert scheduler.watermark_ts() is None
+
+    # 商品 2 在详情/AI 阶段失败，没有到达保存阶段
+    scheduler.confirm(pipeline.jobs[0].unique_key)
+    scheduler.confirm(pipeline.jobs[2].unique_key)
+    assert scheduler.watermark_ts() == _ts("2024-05-01 10:00")
+
+    # 下次运行包含失败商品的页面不会因高水位停止翻页
+    saved = {job.unique_key for job in pipeline.jobs[::2]}
+    retry = _PageScheduler(saved, stop_after_known_pages=0, high_water_ts=scheduler.watermark_ts())
+    assert asyncio.run(retry.schedule_page([page[1]], FakePipeline())) is False
@@ -0,0 +1,67 @@
+import asyncio
+
+from src.pipeline import Stage, StagePipeline
+
+
+class StopError(Exception):
+    pass
+
+
+def test_pipeline_passes_items_through_stages_and_drops_none():
+    async def run():
+        saved = []
+
+        async def double(value):
+            return value * 2
+
+        async def only_even_source(value):
+            return value if value % 4 != 0 else None
+
+        async def persist(value):
+            saved.append(value)
+
+        pipeline = StagePipeline(
+            [
+                Stage("double", double, workers=2, queue_size=2),
+                Stage("filter", only_even_source, workers=1, queue_size=1),
+                Stage("persist", persist, workers=1, queue_size=1),
+            ],
+            report_interval=0,
+        )
+        pipeline.start()
+        for value in range(1, 6):
+            await pipeline.submit(value)
+        await pipeline.join()
+        return pipeline, saved
+
+    pipeline, saved = asyncio.run(run())
+    assert sorted(saved) == [2, 6, 10]
+    assert pipeline.stages[0].stats.processed == 5
+    assert pipeline.stages[1].stats.dropped == 2
+    assert pipeline.stages[2].stats.processed == 3
+
+
+def test_pipeline_stops_on_fatal_error():
+    async def run():
+        async def explode(value):
+            if value == 2:
+                raise StopError("blocked")
+            return value
+
+        async def sink(value):
+            return None
+
+        pipeline = StagePipeline(
+            [Stage("work", explode, queue_size=5), Stage("sink", sink, queue_size=5)],
+            fatal_exceptions=(StopError,),
+            report_interval=0,
+        )
+        pipeline.start()
+        accepted = [await pipeline.submit(value) for value in range(1, 4)]
+        await pipeline.join()
+        return pipeline, accepted
+
+    pipeline, accepted = asyncio.run(run())
+    assert isinstance(pipeline.fatal_error, StopError)
+    assert pipeline.stages[0].stats.errors == 1
+    assert accepted[0] is True
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from src.politeness import AccountPolitenessLimiter
+
+
+def test_limiter_bounds_concurrency_and_spaces_starts():
+    async def run():
+        limiter = AccountPolitenessLimiter(max_concurrent=2, min_interval=0.05, max_interval=0.05)
+        active = 0
+        peak = 0
+        starts = []
+
+        async def visit():
+            nonlocal active, peak
+            async with limiter.slot():
+                starts.append(time.monotonic())
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.02)
+                active -= 1
+
+        await asyncio.gather(*(visit() for _ in range(4)))
+        return peak, starts
+
+    peak, starts = asyncio.run(run())
+    assert peak <= 2
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert all(gap >= 0.04 for gap in gaps)
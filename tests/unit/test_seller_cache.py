@@ -0,0 +1,34 @@
+import time
+
+from src.seller_cache import SellerProfileCache
+
+
+def test_seller_cache_hit_miss_and_ttl(tmp_path):
+    db_path = str(tmp_path / "seller_profiles.db")
+    cache = SellerProfileCache(db_path=db_path, ttl_seconds=60)
+
+    assert cache.get("1001") is None
+    cache.put("1001", {"卖家昵称": "seller_01"})
+    assert cache.get("1001") == {"卖家昵称": "seller_01"}
+
+    # 另一个进程（连接）共享同一份缓存与累计统计
+    other = SellerProfileCache(db_path=db_path, ttl_seconds=60)
+    assert other.get("1001") == {"卖家昵称": "seller_01"}
+    stats = other.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 0
+    assert stats["total_hits"] == 2 and stats["total_misses"] == 1
+
+    expired = SellerProfileCache(db_path=db_path, ttl_seconds=0)
+    time.sleep(0.01)
+    assert expired.get("1001") is None
+    assert expired.get_entry("1001")[0]["卖家昵称"] == "seller_01"
+
+
+def test_seller_cache_keeps_reputation_state(tmp_path):
+    cache = SellerProfileCache(db_path=str(tmp_path / "seller_profiles.db"), ttl_seconds=60)
+    cache.put("1001", {"卖家昵称": "seller_01"})
+    assert cache.get_reputation_state("1001") is None
+
+    state = {"seller_total": 3, "seller_positive": 2, "buyer_total": 0, "buyer_positive": 0}
+    cache.put("1001", {"卖家昵称": "seller_01"}, reputation_state=state)
+    assert cache.get_reputation_state("1001") == state
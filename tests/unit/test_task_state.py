@@ -0,0 +1,15 @@
+from src.task_state import TaskWatermarkStore
+
+
+def test_watermark_only_moves_forward(tmp_path):
+    store = TaskWatermarkStore(db_path=str(tmp_path / "task_state.db"))
+    assert store.get("Sony A7M4") is None
+
+    store.advance("Sony A7M4", 1700000000.0)
+    store.advance("Sony A7M4", 1600000000.0)
+    assert store.get("Sony A7M4") == 1700000000.0
+
+    other = TaskWatermarkStore(db_path=str(tmp_path / "task_state.db"))
+    other.advance("Sony A7M4", 1800000000.0)
+    assert store.get("Sony A7M4") == 1800000000.0
+    assert store.get("Other") is None